@@ -1,8 +1,12 @@
 # api/app.py
-from fastapi import FastAPI
+from fastapi import Depends, FastAPI, Header, Query, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 from pathlib import Path
+import hashlib
 import json
+import sqlite3
+import threading
 
 from etl.load_db import export_dashboard_json
 from etl.load_db import get_conn
@@ -17,8 +21,12 @@ from etl.load_db import init_db
 from etl.load_db import get_conn
 from etl.load_db import init_db
 from etl.load_db import export_dashboard_json
+from etl.load_db import build_dashboard
 
-from api.db import get_conn as api_get_conn
+from api.encoding import COMPRESS_LEVEL, COMPRESS_MIN_BYTES, JSON_MEDIA_TYPE, TABLE_MEDIA_TYPE, encode_json, encode_table, wants_table
+from api.db import (ConnectionPool, SEARCH_COLUMNS, SEARCH_TOKEN, SEARCH_WINDOW, TX_COLUMNS, search_query,
+                    search_window_query, snippet, transactions_query)
+from api.metrics import METRICS_MEDIA_TYPE, REGISTRY, MetricsMiddleware, profiled
 from api.schemas import Dashboard
 from etl.load_db import get_conn as etl_get_conn  # alias if needed
 from etl.load_db import init_db as etl_init_db
@@ -27,6 +35,58 @@ from etl.load_db import init_db as etl_init_db
 DB_PATH = Path("data/db.sqlite3")
 PROCESSED_JSON = Path("data/processed/dashboard.json")
 
+class DashboardCache:
+    """
+    Serialized /analytics body, rebuilt only when the database changes.
+
+    Changes are detected with PRAGMA data_version on a connection that never
+    writes: the value moves whenever another connection (the ETL) commits,
+    and reading it in WAL mode only touches the shared-memory index.
+    """
+
+    def __init__(self, db_path: Path | str):
+        self.db_path = db_path
+        self._conn: sqlite3.Connection | None = None
+        self._lock = threading.Lock()
+        self._version: int | None = None
+        self._body = b""
+        self._etag = ""
+        self.builds = 0
+
+    def get(self) -> tuple[bytes, str]:
+        """(JSON body, strong ETag) for the current database contents"""
+        with self._lock:
+            if self._conn is None:
+                self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+            version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+            if version != self._version:
+                body = json.dumps(build_dashboard(self._conn), separators=(",", ":")).encode("utf-8")
+                Dashboard.model_validate_json(body) # validate once per build, not per request
+                self._body, self._version = body, version
+                self._etag = '"' + hashlib.blake2b(body, digest_size=12).hexdigest() + '"'
+                self.builds += 1
+            return self._body, self._etag
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn, self._version = None, None
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = [t.strip().removeprefix("W/") for t in if_none_match.split(",")] # If-None-Match compares weakly
+    return "*" in tags or etag in tags
+
+DASHBOARD = DashboardCache(DB_PATH)
+POOL = ConnectionPool(DB_PATH)
+
+def db_conn():
+    """FastAPI dependency: borrow a pooled read-only connection for one request"""
+    with POOL.connection() as conn:
+        yield conn
+
 app = FastAPI(title="MoMo XML Analytics API")
 
 app.add_middleware(
@@ -36,32 +96,89 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# gzip for clients that accept it, once a body is worth compressing
+app.add_middleware(GZipMiddleware, minimum_size=COMPRESS_MIN_BYTES, compresslevel=COMPRESS_LEVEL)
+# added last so it is outermost: times the whole request and counts the bytes actually sent
+app.add_middleware(MetricsMiddleware, registry=REGISTRY)
 
 # optional: ensure DB schema exists when API starts
 @app.on_event("startup")
 def startup():
     conn = etl_get_conn(DB_PATH)
     etl_init_db(conn)
+    conn.close()
+
+@app.on_event("shutdown")
+def shutdown():
+    POOL.close()
+    DASHBOARD.close()
 
 @app.get("/health")
+@profiled
 def health():
     return {"ok": True}
 
 @app.get("/transactions")
-def transactions(limit: int = 50):
-    conn = api_get_conn(DB_PATH)
-    cur = conn.cursor()
-    cur.execute("""
-        SELECT date_iso, sender, counterparty, text, amount, category
-        FROM transactions
-        ORDER BY id DESC
-        LIMIT ?
-    """, (limit,))
-    cols = ["date_iso", "sender", "counterparty", "text", "amount", "category"]
-    return [dict(zip(cols, row)) for row in cur.fetchall()]
+@profiled
+def transactions(
+    limit: int = Query(50, ge=1, le=500),
+    before_id: int | None = Query(None, description="keyset cursor: the last id of the previous page"),
+    category: str | None = None,
+    date_from: str | None = Query(None, description="inclusive YYYY-MM-DD"),
+    date_to: str | None = Query(None, description="inclusive YYYY-MM-DD"),
+    counterparty: str | None = None,
+    min_amount: float | None = None,
+    max_amount: float | None = None,
+    accept: str | None = Header(default=None),
+    conn=Depends(db_conn),
+):
+    sql, params = transactions_query(limit, before_id, category, date_from, date_to, counterparty, min_amount, max_amount)
+    rows = [dict(zip(TX_COLUMNS, row)) for row in conn.execute(sql, params)]
+    # Rows are plain str/float/int, so encode them directly instead of going through jsonable_encoder
+    if wants_table(accept):
+        return Response(encode_table(rows, TX_COLUMNS), media_type=TABLE_MEDIA_TYPE, headers={"Vary": "Accept"})
+    return Response(encode_json(rows), media_type=JSON_MEDIA_TYPE, headers={"Vary": "Accept"})
+
+@app.get("/search")
+@profiled
+def search(
+    response: Response,
+    q: str = Query(..., min_length=1, description="words to find in the SMS text or counterparty"),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    before: int | None = Query(None, ge=1, description="only search matches with a smaller id (see X-Search-Next-Before)"),
+    conn=Depends(db_conn),
+):
+    # FTS5 index lookup ranked by bm25; the snippet marks the matched words.
+    # Only the newest SEARCH_WINDOW matches are ranked: when there are more,
+    # the headers say so and where the next (older) window starts.
+    tokens = SEARCH_TOKEN.findall(q)
+    if not tokens:
+        return []
+    in_window, oldest = conn.execute(*search_window_query(tokens, SEARCH_WINDOW, before)).fetchone()
+    if in_window >= SEARCH_WINDOW:
+        response.headers["X-Search-Truncated"] = "true"
+        response.headers["X-Search-Next-Before"] = str(oldest)
+    sql, params = search_query(tokens, limit, offset, SEARCH_WINDOW, before)
+    hits = []
+    for row in conn.execute(sql, params):
+        hit = dict(zip(SEARCH_COLUMNS, row))
+        hit["snippet"] = snippet(hit.pop("text"), tokens)
+        hits.append(hit)
+    return hits
 
 @app.get("/analytics", response_model=Dashboard)
-def analytics():
-    # Serve the same JSON the frontend reads from disk
-    data = json.loads(PROCESSED_JSON.read_text(encoding="utf-8"))
-    return data
\ No newline at end of file
+@profiled
+def analytics(if_none_match: str | None = Header(default=None)):
+    # Built from SQLite and cached until the next commit; clients that send
+    # back the ETag get a bodyless 304 while nothing has changed
+    body, etag = DASHBOARD.get()
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+@app.get("/metrics")
+def metrics():
+    # Prometheus text format: per-route request counts, latency histograms and bytes, plus the last ETL run
+    return Response(REGISTRY.render(), media_type=METRICS_MEDIA_TYPE)
@@ -0,0 +1,99 @@
+# api/auth.py
+import base64, hashlib, hmac, os, threading, time # stdlib only
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+PBKDF2_ITERATIONS = int(os.environ.get("API_PASS_ITERATIONS", "100000"))
+
+def hash_password(password: str, salt: Optional[bytes] = None, iterations: int = PBKDF2_ITERATIONS) -> str:
+    """Encode a password as pbkdf2_sha256$<iterations>$<salt b64>$<hash b64>"""
+    salt = salt if salt is not None else os.urandom(16)
+    digest = hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt, iterations)
+    return f"pbkdf2_sha256${iterations}${base64.b64encode(salt).decode()}${base64.b64encode(digest).decode()}"
+
+def parse_password_hash(encoded: str) -> Tuple[int, bytes, bytes]:
+    """(iterations, salt, digest) from a hash_password() string; ValueError says what is wrong with it"""
+    parts = encoded.split("$") if isinstance(encoded, str) else []
+    if len(parts) != 4 or parts[0] != "pbkdf2_sha256":
+        raise ValueError("expected pbkdf2_sha256$<iterations>$<salt b64>$<hash b64>")
+    try:
+        iterations = int(parts[1])
+        salt, digest = base64.b64decode(parts[2], validate=True), base64.b64decode(parts[3], validate=True)
+    except ValueError as e: # binascii.Error is a ValueError too
+        raise ValueError(f"bad iteration count or base64: {e}") from None
+    if iterations < 1 or not digest:
+        raise ValueError("iteration count must be positive and the hash non-empty")
+    return iterations, salt, digest
+
+def verify_password(password: str, encoded: str) -> bool:
+    """Deliberately slow check of password against a hash_password() string; False for a malformed hash"""
+    try:
+        iterations, salt, expected = parse_password_hash(encoded)
+    except ValueError:
+        return False
+    digest = hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt, iterations)
+    return hmac.compare_digest(digest, expected)
+
+def parse_basic_auth(header: str) -> Optional[Tuple[str, str]]:
+    """Return (user, password) from an "Authorization: Basic ..." value, or None"""
+    if not header or not header.startswith("Basic "):
+        return None
+    try:
+        decoded = base64.b64decode(header.split(" ", 1)[1]).decode("utf-8") # "user:pass"
+        user, pwd = decoded.split(":", 1)
+    except Exception: # bad base64, bad utf-8 or no colon
+        return None
+    return user, pwd
+
+class AuthCache:
+    """Bounded LRU + TTL map from Authorization header to verified user.
+
+    Only successful verifications are cached, so a wrong password always
+    pays the full hash cost. Keys are SHA-256 digests of the header, so the
+    cache never holds credentials in clear text.
+    """
+
+    def __init__(self, max_size: int = 1024, ttl: float = 300.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[bytes, Tuple[str, float]]" = OrderedDict() # digest -> (user, expires_at)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(header: str) -> bytes:
+        return hashlib.sha256(header.encode("utf-8")).digest()
+
+    def get(self, header: str) -> Optional[str]:
+        key = self._key(header)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            if entry is not None: # expired
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, header: str, user: str) -> None:
+        key = self._key(header)
+        with self._lock:
+            self._entries[key] = (user, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False) # least recently used
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                    "size": len(self._entries), "max_size": self.max_size, "ttl": self.ttl}
@@ -1,8 +1,234 @@
 # api/db.py
+from contextlib import contextmanager
 from pathlib import Path
+from typing import Iterator
+import html
+import queue
+import re
 import sqlite3
+import threading
+
+# Read-path tuning applied to every pooled connection
+READ_PRAGMAS = (
+    "PRAGMA query_only=ON",
+    "PRAGMA cache_size=-32768",     # negative = KiB, so 32 MiB of page cache per connection
+    "PRAGMA mmap_size=268435456",   # 256 MiB: reads come straight from the page cache, no read() copies
+    "PRAGMA temp_store=MEMORY",
+)
+STATEMENT_CACHE = 256 # compiled statements kept per connection, reused across requests
 
 def get_conn(db_path: Path | str) -> sqlite3.Connection:
     conn = sqlite3.connect(str(db_path))
     conn.row_factory = sqlite3.Row
-    return conn
\ No newline at end of file
+    return conn
+
+def connect_readonly(db_path: Path | str) -> sqlite3.Connection:
+    """
+    Read-only connection for the pool. check_same_thread is off because
+    FastAPI may run a dependency and its endpoint on different worker
+    threads; the pool makes sure one request uses a connection at a time.
+    """
+    uri = Path(db_path).resolve().as_uri() + "?mode=ro"
+    conn = sqlite3.connect(uri, uri=True, check_same_thread=False, cached_statements=STATEMENT_CACHE)
+    conn.row_factory = sqlite3.Row
+    for pragma in READ_PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+TX_COLUMNS = ["id", "date_iso", "sender", "counterparty", "text", "amount", "category"]
+
+def transactions_query(limit: int = 50, before_id: int | None = None, category: str | None = None,
+                       date_from: str | None = None, date_to: str | None = None, counterparty: str | None = None,
+                       min_amount: float | None = None, max_amount: float | None = None) -> tuple[str, list]:
+    """
+    SQL + params for one page of GET /transactions, newest first.
+
+    Paging is keyset: pass the last id of a page as before_id to get the
+    next one, so deep pages cost the same as the first. Every filter is an
+    equality or range on an indexed column (see etl.load_db.INDEXES);
+    date_from/date_to are inclusive YYYY-MM-DD bounds.
+    """
+    where, params = [], []
+    if before_id is not None:
+        where.append("id < ?")
+        params.append(before_id)
+    if category is not None:
+        where.append("category = ?")
+        params.append(category)
+    if date_from is not None:
+        where.append("date_iso >= ?")
+        params.append(date_from)
+    if date_to is not None:
+        where.append("date_iso <= ?")
+        params.append(date_to)
+    if counterparty is not None:
+        where.append("counterparty = ?")
+        params.append(counterparty)
+    if min_amount is not None:
+        where.append("amount >= ?")
+        params.append(min_amount)
+    if max_amount is not None:
+        where.append("amount <= ?")
+        params.append(max_amount)
+    sql = f"SELECT {', '.join(TX_COLUMNS)} FROM transactions"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    # With only a date/amount range, SQLite prefers walking the primary key
+    # newest-first and filtering row by row, which is a full scan when the
+    # range matches little. The unary + hides id from ORDER BY so the range
+    # index is used and just the matching rows get sorted.
+    ranged = any(v is not None for v in (date_from, date_to, min_amount, max_amount))
+    sql += f" ORDER BY {'+id' if ranged else 'id'} DESC LIMIT ?"
+    params.append(limit)
+    return sql, params
+
+SEARCH_COLUMNS = ["id", "date_iso", "counterparty", "amount", "category", "text", "rank"]
+SEARCH_TOKEN = re.compile(r"\w+")
+SEARCH_WINDOW = 10_000 # newest matches that get bm25-ranked; see search_query()
+
+def fts_match(tokens: list[str]) -> str:
+    """
+    Words -> FTS5 MATCH expression: every word must appear, each as a
+    prefix (so "7666" finds TxId 76662021700). Words are quoted, so FTS5
+    operators in user input can never cause a syntax error.
+    """
+    return " ".join(f'"{t}"*' for t in tokens)
+
+def search_query(tokens: list[str], limit: int = 20, offset: int = 0, window: int = SEARCH_WINDOW,
+                 before: int | None = None) -> tuple[str, list]:
+    """
+    SQL + params for one page of /search results, best bm25 rank first.
+
+    Only the newest `window` matches (with id < before, if given) are
+    ranked. A word that is in nearly every SMS ("balance", "RWF") would
+    otherwise make bm25 score millions of rows, while the index walk for the
+    newest matches stays cheap. search_window_query() tells whether older
+    matches were left out and where the next window starts.
+    """
+    sql = f"""
+        SELECT t.id, t.date_iso, t.counterparty, t.amount, t.category, t.text, hit.score
+        FROM (
+            SELECT rowid, bm25(transactions_fts) AS score
+            FROM transactions_fts
+            WHERE transactions_fts MATCH ?{" AND rowid < ?" if before is not None else ""}
+            ORDER BY rowid DESC
+            LIMIT ?
+        ) AS hit
+        JOIN transactions t ON t.id = hit.rowid
+        ORDER BY hit.score, t.id DESC
+        LIMIT ? OFFSET ?
+    """
+    return sql, [fts_match(tokens), *([before] if before is not None else []), window, limit, offset]
+
+def search_window_query(tokens: list[str], window: int = SEARCH_WINDOW, before: int | None = None) -> tuple[str, list]:
+    """
+    SQL + params for (matches in the window, oldest id in it) of the same
+    search. A full window means older matches exist past it; they are
+    searched by passing that oldest id as `before`.
+    """
+    sql = f"""
+        SELECT count(*), min(rowid) FROM (
+            SELECT rowid FROM transactions_fts
+            WHERE transactions_fts MATCH ?{" AND rowid < ?" if before is not None else ""}
+            ORDER BY rowid DESC
+            LIMIT ?
+        )
+    """
+    return sql, [fts_match(tokens), *([before] if before is not None else []), window]
+
+def snippet(text: str | None, tokens: list[str], width: int = 96) -> str:
+    """
+    About `width` characters of text around the first match, HTML-escaped,
+    with every word that starts with a search token wrapped in
+    <mark>...</mark>. Built here rather than with FTS5 snippet(), which
+    re-reads the whole doclist of each token for every row it decorates.
+    """
+    text = text or ""
+    words = "|".join(map(re.escape, tokens))
+    first = re.search(r"\b(?:" + words + r")\w*", text, re.IGNORECASE)
+    start = max(0, first.start() - width // 3) if first else 0
+    if start:
+        start = text.find(" ", start) + 1 or start # don't cut into a word
+    # SMS text comes from outside: escape it, then mark words in the escaped text, stepping over entities
+    marker = re.compile(r"(&#?\w+;)|\b(?:" + words + r")\w*", re.IGNORECASE)
+    piece = marker.sub(lambda m: m.group(1) or f"<mark>{m.group(0)}</mark>", html.escape(text[start:start + width]))
+    return ("…" if start else "") + piece + ("…" if start + width < len(text) else "")
+
+class PoolTimeout(RuntimeError):
+    pass
+
+class ConnectionPool:
+    """
+    Bounded pool of read-only SQLite connections.
+
+    Connections are opened lazily up to max_size and handed out LIFO, so a
+    lightly loaded API keeps reusing the same warm connection (page cache
+    and compiled statements included). Borrowers wait up to timeout seconds
+    when all max_size connections are out.
+    """
+
+    def __init__(self, db_path: Path | str, max_size: int = 8, timeout: float = 5.0):
+        self.db_path = db_path
+        self.max_size = max_size
+        self.timeout = timeout
+        self._idle: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._opened = 0
+        self._closed = False
+        self._lock = threading.Lock()
+
+    def acquire(self) -> sqlite3.Connection:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._opened < self.max_size:
+                self._opened += 1
+                open_new = True
+            else:
+                open_new = False
+        if open_new:
+            try:
+                return connect_readonly(self.db_path)
+            except BaseException:
+                with self._lock:
+                    self._opened -= 1
+                raise
+        try:
+            return self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise PoolTimeout(f"no database connection free after {self.timeout}s ({self.max_size} in use)") from None
+
+    def release(self, conn: sqlite3.Connection) -> None:
+        if conn.in_transaction: # a failed request must not pin an old read snapshot
+            conn.rollback()
+        if self._closed:
+            conn.close()
+            with self._lock:
+                self._opened -= 1
+            return
+        self._idle.put(conn)
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def close(self) -> None:
+        """Close idle connections; borrowed ones are closed when returned"""
+        self._closed = True
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+            with self._lock:
+                self._opened -= 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"opened": self._opened, "idle": self._idle.qsize(), "max_size": self.max_size}
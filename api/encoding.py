@@ -0,0 +1,67 @@
+# api/encoding.py
+# Response encodings shared by api/server.py and api/app.py (stdlib only)
+import json, os, zlib
+from typing import Any, List, Optional
+
+# One reusable encoder: no spaces after separators, no ASCII-escaping, no circular-reference checks
+JSON_ENCODER = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"), check_circular=False)
+encode_json = JSON_ENCODER.encode
+
+# Compact tabular format selected with "Accept: application/vnd.momo.table+json":
+# {"fields": [...], "rows": [[...], ...]} so the field names are sent once, not once per row
+TABLE_MEDIA_TYPE = "application/vnd.momo.table+json"
+JSON_MEDIA_TYPE = "application/json"
+
+COMPRESS_MIN_BYTES = int(os.environ.get("API_COMPRESS_MIN_BYTES", "1024")) # smaller bodies aren't worth the CPU
+COMPRESS_LEVEL = int(os.environ.get("API_COMPRESS_LEVEL", "1")) # ~8x smaller at half the CPU of level 5-6, see encoding_compare.py
+_WBITS = {"gzip": 31, "deflate": 15} # 16 + 15 = gzip container; plain 15 = zlib stream, which is HTTP "deflate"
+
+def _accepted(header: Optional[str]) -> dict:
+    """{token: q} from an Accept or Accept-Encoding header"""
+    accepted = {}
+    for part in (header or "").split(","):
+        token, _, params = part.strip().partition(";")
+        if not token:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        accepted[token.strip().lower()] = q
+    return accepted
+
+def choose_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """"gzip", "deflate" or None (identity), honouring q-values; gzip wins ties"""
+    accepted = _accepted(accept_encoding)
+    best, best_q = None, 0.0
+    for name in ("gzip", "deflate"):
+        q = accepted.get(name, accepted.get("*", 0.0))
+        if q > best_q:
+            best, best_q = name, q
+    return best
+
+def wants_table(accept: Optional[str]) -> bool:
+    return _accepted(accept).get(TABLE_MEDIA_TYPE, 0.0) > 0
+
+def compressor(encoding: str):
+    return zlib.compressobj(COMPRESS_LEVEL, zlib.DEFLATED, _WBITS[encoding])
+
+def compress(payload: bytes, encoding: str) -> bytes:
+    c = compressor(encoding)
+    return c.compress(payload) + c.flush()
+
+def table_rows(rows: List[dict], fields: List[str]) -> str:
+    """Rows as comma-joined JSON arrays in `fields` order (no surrounding brackets)"""
+    return encode_json([[row.get(f) for f in fields] for row in rows])[1:-1]
+
+def encode_table(rows: List[dict], fields: List[str]) -> str:
+    return '{"fields":' + encode_json(fields) + ',"rows":[' + table_rows(rows, fields) + "]}"
+
+def decode_table(doc: Any) -> List[dict]:
+    """Client-side inverse of encode_table"""
+    fields = doc["fields"]
+    return [dict(zip(fields, row)) for row in doc["rows"]]
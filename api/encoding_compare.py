@@ -0,0 +1,40 @@
+# api/encoding_compare.py
+# Serialize time and bytes on the wire for GET /transactions bodies, per format and content encoding.
+import json, os, time, zlib
+
+from api.encoding import COMPRESS_LEVEL, compress, encode_json, encode_table
+from api.server import TX_FIELDS
+from dsa.columnar import fake_records
+
+FORMATS = {
+    "json.dumps (old)": lambda rows: json.dumps(rows, ensure_ascii=False), # what _send_json used to do
+    "compact json": encode_json,
+    "table json": lambda rows: encode_table(rows, TX_FIELDS),
+}
+
+def timed(fn, *args, rounds=3):
+    best = float("inf")
+    for _ in range(rounds):
+        t0 = time.perf_counter()
+        out = fn(*args)
+        best = min(best, time.perf_counter() - t0)
+    return out, best * 1000
+
+if __name__ == "__main__":
+    sizes = [int(n) for n in os.environ.get("SIZES", "10000,100000").split(",")]
+    print(f"compression level {COMPRESS_LEVEL} (API_COMPRESS_LEVEL)")
+    for n in sizes:
+        rows = fake_records(n)
+        print(f"\n{n:,} rows")
+        print(f"{'format':18s} {'encoding':9s} {'serialize':>10s} {'compress':>10s} {'bytes':>12s} {'B/row':>7s}")
+        for label, encode in FORMATS.items():
+            text, encode_ms = timed(encode, rows)
+            payload = text.encode("utf-8")
+            for encoding in (None, "gzip", "deflate"):
+                if encoding is None:
+                    body, compress_ms = payload, 0.0
+                else:
+                    body, compress_ms = timed(compress, payload, encoding)
+                    assert zlib.decompress(body, 47) == payload
+                print(f"{label:18s} {encoding or 'identity':9s} {encode_ms:8.1f}ms {compress_ms:8.1f}ms "
+                      f"{len(body):12,d} {len(body) / n:7.1f}")
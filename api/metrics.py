@@ -0,0 +1,222 @@
+# api/metrics.py
+# Request metrics and opt-in per-request profiling for api/server.py and api/app.py (stdlib only).
+#
+#   GET /metrics                      Prometheus text format 0.0.4
+#   API_PROFILE=1 + "X-Profile: 1"    run that request under cProfile, dump to PROFILE_DIR/<id>.prof,
+#                                     answer with "X-Profile-Id: <id>" (python -m pstats PROFILE_DIR/<id>.prof)
+import bisect, contextvars, cProfile, functools, json, os, threading, time, uuid
+from pathlib import Path
+from typing import Optional
+
+from etl.config import ETL_STATS_PATH # written by `python -m etl.run`
+
+METRICS_MEDIA_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+# Upper bounds in seconds; one bisect per request picks the bucket
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+PROFILE_ENABLED = os.environ.get("API_PROFILE", "") == "1" # off by default: the header alone does nothing
+PROFILE_HEADER = "X-Profile"
+PROFILE_ID_HEADER = "X-Profile-Id"
+PROFILE_DIR = Path(os.environ.get("API_PROFILE_DIR", "logs/profiles"))
+
+def _labels(**labels) -> str:
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+class _Endpoint:
+    """Latency histogram, status counts and body bytes for one (method, route)"""
+    __slots__ = ("buckets", "sum", "count", "bytes", "statuses")
+
+    def __init__(self):
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1) # last one is +Inf
+        self.sum = 0.0
+        self.count = 0
+        self.bytes = 0
+        self.statuses: dict[int, int] = {}
+
+class Registry:
+    """
+    Per-process request and stage metrics. record_request() is one lock
+    round trip plus a bisect, cheap enough to run on every request.
+    Routes must be templates ("/transactions/{id}"), never raw paths, so
+    the number of series stays bounded.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._endpoints: dict[tuple[str, str], _Endpoint] = {}
+        self._stages: dict[str, tuple[float, int]] = {}
+        self.started = time.time()
+
+    def record_request(self, method: str, route: str, status: int, seconds: float, nbytes: int) -> None:
+        slot = bisect.bisect_left(LATENCY_BUCKETS, seconds)
+        with self._lock:
+            ep = self._endpoints.get((method, route))
+            if ep is None:
+                ep = self._endpoints[(method, route)] = _Endpoint()
+            ep.buckets[slot] += 1
+            ep.sum += seconds
+            ep.count += 1
+            ep.bytes += nbytes
+            ep.statuses[status] = ep.statuses.get(status, 0) + 1
+
+    def record_stage(self, stage: str, seconds: float, items: int) -> None:
+        """One-off work such as loading the backup at boot"""
+        with self._lock:
+            self._stages[stage] = (seconds, items)
+
+    def render(self, etl_stats_path: Optional[Path] = ETL_STATS_PATH) -> str:
+        with self._lock:
+            endpoints = sorted(self._endpoints.items())
+            snapshot = [(key, list(ep.buckets), ep.sum, ep.count, ep.bytes, sorted(ep.statuses.items()))
+                        for key, ep in endpoints]
+            stages = sorted(self._stages.items())
+        out = [
+            "# HELP momo_http_requests_total Requests handled, by method, route and status.",
+            "# TYPE momo_http_requests_total counter",
+        ]
+        for (method, route), _, _, _, _, statuses in snapshot:
+            for status, n in statuses:
+                out.append(f"momo_http_requests_total{_labels(method=method, route=route, status=status)} {n}")
+        out += ["# HELP momo_http_request_duration_seconds Time from request line to last body byte.",
+                "# TYPE momo_http_request_duration_seconds histogram"]
+        for (method, route), buckets, total, count, _, _ in snapshot:
+            cumulative = 0
+            for bound, n in zip(LATENCY_BUCKETS + ("+Inf",), buckets):
+                cumulative += n
+                out.append(f"momo_http_request_duration_seconds_bucket{_labels(method=method, route=route, le=bound)} {cumulative}")
+            out.append(f"momo_http_request_duration_seconds_sum{_labels(method=method, route=route)} {total:.6f}")
+            out.append(f"momo_http_request_duration_seconds_count{_labels(method=method, route=route)} {count}")
+        out += ["# HELP momo_http_response_bytes_total Response body bytes sent, after compression.",
+                "# TYPE momo_http_response_bytes_total counter"]
+        for (method, route), _, _, _, nbytes, _ in snapshot:
+            out.append(f"momo_http_response_bytes_total{_labels(method=method, route=route)} {nbytes}")
+        if stages:
+            out += ["# HELP momo_stage_seconds Duration of one-off server work such as the boot load.",
+                    "# TYPE momo_stage_seconds gauge"]
+            out += [f"momo_stage_seconds{_labels(stage=name)} {seconds:.6f}" for name, (seconds, _) in stages]
+            out += ["# HELP momo_stage_items Items processed by that work.", "# TYPE momo_stage_items gauge"]
+            out += [f"momo_stage_items{_labels(stage=name)} {items}" for name, (_, items) in stages]
+        out += ["# HELP momo_process_start_time_seconds Unix time the metrics registry was created.",
+                "# TYPE momo_process_start_time_seconds gauge", f"momo_process_start_time_seconds {self.started:.3f}"]
+        if etl_stats_path is not None:
+            out += etl_metrics(etl_stats_path)
+        return "\n".join(out) + "\n"
+
+def etl_metrics(path: Path) -> list:
+    """The last `python -m etl.run` (its stats JSON) as gauges; nothing if it never ran"""
+    try:
+        stats = json.loads(Path(path).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return []
+    out = ["# HELP momo_etl_last_run_timestamp_seconds Unix time the last ETL run finished.",
+           "# TYPE momo_etl_last_run_timestamp_seconds gauge",
+           f"momo_etl_last_run_timestamp_seconds {stats.get('finished', 0)}",
+           "# HELP momo_etl_rows_loaded Rows written by the last ETL run.", "# TYPE momo_etl_rows_loaded gauge",
+           f"momo_etl_rows_loaded {stats.get('loaded', 0)}"]
+    stages = stats.get("stages", {})
+    for name, help_text in (("busy_s", "Seconds the stage spent working in the last ETL run."),
+                            ("items_per_s", "Items per busy second of the stage in the last ETL run.")):
+        metric = "momo_etl_stage_seconds" if name == "busy_s" else "momo_etl_stage_items_per_second"
+        out += [f"# HELP {metric} {help_text}", f"# TYPE {metric} gauge"]
+        out += [f"{metric}{_labels(stage=stage)} {s.get(name, 0)}" for stage, s in stages.items()]
+        if name == "busy_s" and stats.get("export_s") is not None:
+            out.append(f"{metric}{_labels(stage='export')} {stats['export_s']}")
+    return out
+
+REGISTRY = Registry() # one per process, shared by every handler thread
+
+# ====== Profiling ======
+_PROFILE: contextvars.ContextVar = contextvars.ContextVar("momo_profile", default=None)
+
+class ProfileRun:
+    """cProfile for one request. The profiler is per-thread, so start() runs on the thread doing the work."""
+
+    def __init__(self):
+        self.id = uuid.uuid4().hex[:16]
+        self.profiler: Optional[cProfile.Profile] = None
+
+    def start(self) -> None:
+        self.profiler = cProfile.Profile()
+        self.profiler.enable()
+
+    def stop(self) -> None:
+        if self.profiler is not None:
+            self.profiler.disable()
+
+    def save(self) -> Optional[Path]:
+        if self.profiler is None:
+            return None
+        PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+        path = PROFILE_DIR / f"{self.id}.prof"
+        self.profiler.dump_stats(str(path))
+        return path
+
+def profile_requested(header_value: Optional[str]) -> Optional[ProfileRun]:
+    """A ProfileRun when profiling is enabled for this process and the request asked for it"""
+    if PROFILE_ENABLED and header_value and header_value.strip().lower() in ("1", "true", "yes"):
+        return ProfileRun()
+    return None
+
+def profiled(fn):
+    """
+    Decorator for FastAPI endpoints: sync endpoints run on a worker thread,
+    where the middleware's cProfile could not see them, so the endpoint
+    starts the profiler itself when MetricsMiddleware asked for one.
+    """
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        run = _PROFILE.get()
+        if run is None:
+            return fn(*args, **kwargs)
+        run.start()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            run.stop()
+    return wrapper
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording every HTTP request in a Registry: status from
+    http.response.start, body bytes from http.response.body, latency until
+    the last body chunk. The route label is the matched route's path
+    template, "unmatched" for 404s.
+    """
+
+    def __init__(self, app, registry: Registry = REGISTRY):
+        self.app = app
+        self.registry = registry
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        t0 = time.perf_counter()
+        state = {"status": 500, "bytes": 0}
+        run = None
+        if PROFILE_ENABLED:
+            headers = dict(scope.get("headers") or ())
+            run = profile_requested((headers.get(PROFILE_HEADER.lower().encode()) or b"").decode("latin-1"))
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                state["status"] = message["status"]
+                if run is not None:
+                    message["headers"] = list(message.get("headers", ())) + [(PROFILE_ID_HEADER.lower().encode(), run.id.encode())]
+            elif message["type"] == "http.response.body":
+                state["bytes"] += len(message.get("body", b""))
+            await send(message)
+
+        token = _PROFILE.set(run) if run is not None else None
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            if token is not None:
+                _PROFILE.reset(token)
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            self.registry.record_request(scope["method"], route, state["status"], time.perf_counter() - t0, state["bytes"])
+            if run is not None:
+                run.save()
@@ -0,0 +1,97 @@
+# api/pool_compare.py
+# Load test: GET /transactions opening a connection per request (old) vs borrowing from api.db.ConnectionPool.
+import http.client, multiprocessing, os, tempfile, threading, time
+
+import uvicorn
+from fastapi import FastAPI
+
+import api.app as app_module
+from api.db import get_conn as api_get_conn
+from etl.load_db import get_conn, init_db, insert_transactions
+
+QUERY = """
+    SELECT date_iso, sender, counterparty, text, amount, category
+    FROM transactions
+    ORDER BY id DESC
+    LIMIT ?
+"""
+COLS = ["date_iso", "sender", "counterparty", "text", "amount", "category"]
+
+def legacy_app(db_path):
+    # what api/app.py did before: a fresh sqlite3.connect per request
+    legacy = FastAPI()
+
+    @legacy.get("/transactions")
+    def transactions(limit: int = 50):
+        conn = api_get_conn(db_path)
+        cur = conn.cursor()
+        cur.execute(QUERY, (limit,))
+        return [dict(zip(COLS, row)) for row in cur.fetchall()]
+
+    return legacy
+
+def make_db(path, rows):
+    conn = get_conn(path)
+    init_db(conn)
+    insert_transactions(conn, ({"date_iso": f"2024-05-{i % 28 + 1:02d}", "sender": "M-Money", "counterparty": f"Jane {i % 500}",
+                                "text": f"TxId: {i}. Your payment of {i} RWF to Jane has been completed.",
+                                "amount": float(i % 5000), "category": "PAY"} for i in range(1, rows + 1)))
+    conn.close()
+
+def serve(kind, db_path, port_queue):
+    # Own process so the load generator does not share the server's GIL
+    if kind == "pooled":
+        app_module.POOL = app_module.ConnectionPool(db_path)
+        asgi = app_module.app
+    else:
+        asgi = legacy_app(db_path)
+    config = uvicorn.Config(asgi, host="127.0.0.1", port=0, log_level="warning", access_log=False)
+    srv = uvicorn.Server(config)
+    threading.Thread(target=lambda: report_port(srv, port_queue), daemon=True).start()
+    srv.run()
+
+def report_port(srv, port_queue):
+    while not srv.started:
+        time.sleep(0.01)
+    port_queue.put(srv.servers[0].sockets[0].getsockname()[1])
+
+def run_client(port, requests, limit, latencies):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    for _ in range(requests):
+        t0 = time.perf_counter()
+        conn.request("GET", f"/transactions?limit={limit}")
+        conn.getresponse().read()
+        latencies.append(time.perf_counter() - t0)
+    conn.close()
+
+def bench(kind, db_path, clients, requests, limit):
+    port_queue = multiprocessing.Queue()
+    proc = multiprocessing.Process(target=serve, args=(kind, db_path, port_queue), daemon=True)
+    proc.start()
+    port = port_queue.get(timeout=60)
+    run_client(port, 20, limit, []) # warm-up
+    latencies = []
+    workers = [threading.Thread(target=run_client, args=(port, requests, limit, latencies)) for _ in range(clients)]
+    t0 = time.perf_counter()
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    elapsed = time.perf_counter() - t0
+    proc.terminate()
+    proc.join()
+    ms = sorted(s * 1000 for s in latencies)
+    return len(ms) / elapsed, ms[len(ms) // 2], ms[max(int(len(ms) * 0.99) - 1, 0)]
+
+if __name__ == "__main__":
+    rows = int(os.environ.get("ROWS", "200000"))
+    clients = int(os.environ.get("CLIENTS", "8"))
+    requests = int(os.environ.get("REQUESTS", "250")) # per client
+    limit = int(os.environ.get("LIMIT", "50"))
+
+    db_path = os.path.join(tempfile.mkdtemp(), "db.sqlite3")
+    make_db(db_path, rows)
+    print(f"{clients} clients x {requests} requests of GET /transactions?limit={limit}, {rows} rows")
+    for label, kind in [("connect per request (old)", "legacy"), ("ConnectionPool", "pooled")]:
+        rps, p50, p99 = bench(kind, db_path, clients, requests, limit)
+        print(f"{label:28s} {rps:8.0f} req/s   p50 {p50:6.2f} ms   p99 {p99:6.2f} ms")
@@ -1,70 +1,249 @@
 # api/server.py
-from http.server import BaseHTTPRequestHandler, HTTPServer # simple http server to help us focus on API logic without external deps (django, flask, fastapi, etc)
-from urllib.parse import urlparse # parse URL paths and query params ( no external deps )
-import json, base64, os, time # stdlib only
-from typing import Dict, Any, List
-from dsa.parse_xml import parse_momo_xml 
-import hashlib # for hashing passwords
+from http.server import BaseHTTPRequestHandler, HTTPServer, ThreadingHTTPServer # simple http server to help us focus on API logic without external deps (django, flask, fastapi, etc)
+from urllib.parse import urlparse, parse_qs # parse URL paths and query params ( no external deps )
+import json, bisect, hmac, os, time # stdlib only
+from typing import Dict, Any
+from dsa.parse_cache import file_fingerprint, load_transactions, load_transactions_lazy
+from dsa.transaction_store import TransactionStore
+from api.auth import AuthCache, hash_password, parse_basic_auth, parse_password_hash, verify_password
+from api.encoding import (COMPRESS_MIN_BYTES, JSON_MEDIA_TYPE, TABLE_MEDIA_TYPE, choose_encoding, compress,
+                          compressor, encode_json, table_rows, wants_table)
+from api.metrics import METRICS_MEDIA_TYPE, PROFILE_HEADER, PROFILE_ID_HEADER, REGISTRY, profile_requested
+from api.wal import DurableStore
 
 # ====== Config ======
 HOST = "127.0.0.1"
 PORT = 8008
 XML_PATH = os.environ.get("MOMO_XML", "modified_sms_v2.xml")
+SERVER_MODE = os.environ.get("API_SERVER_MODE", "threaded") # "threaded" (one thread per connection) or "single"
+STREAM_BATCH = 500 # rows encoded per lock acquisition / per chunk when streaming GET /transactions
+TX_FIELDS = ["id", "type", "amount", "currency", "sender", "receiver", "timestamp", "transaction_id", "raw_text"]
+# Lazy raw_text: the store keeps SMS bodies as byte spans into the mmapped XML (dsa/raw_text.py) and decodes
+# one only for GET /transactions/{id} or a list that asks for it with ?fields=...,raw_text
+LAZY_RAW_TEXT = os.environ.get("API_LAZY_RAW_TEXT", "") == "1"
+# Write-ahead log + snapshots (api/wal.py): writes survive restarts and boot replays them instead of
+# re-parsing the XML. The XML is only imported while the directory is empty (boot warns when it changed
+# since); "" turns durability off.
+WAL_DIR = os.environ.get("API_WAL_DIR", "data/wal")
+WAL_FSYNC = os.environ.get("API_WAL_FSYNC", "1") != "0" # 0: survive a process crash but not a power cut
 
 # Basic Auth credentials (for demo; DO NOT hardcode in production)
 BASIC_USER = os.environ.get("API_USER", "admin")
 BASIC_PASS = os.environ.get("API_PASS", "group8")
+# Only the PBKDF2 hash is checked at runtime; set API_PASS_HASH (api.auth.hash_password output) to keep the plain password out of the env
+BASIC_PASS_HASH = os.environ.get("API_PASS_HASH") or hash_password(BASIC_PASS)
+try: # fail at startup, not with a 500 on every request
+    parse_password_hash(BASIC_PASS_HASH)
+except ValueError as e:
+    raise SystemExit(f"API_PASS_HASH is not a valid api.auth.hash_password() string: {e}") from None
+# Header value -> verified user, so repeat requests skip the base64 decode and the slow hash
+AUTH_CACHE = AuthCache(max_size=int(os.environ.get("AUTH_CACHE_SIZE", "1024")), ttl=float(os.environ.get("AUTH_CACHE_TTL", "300")))
 
 # ====== In-memory store ======
-# We keep two structures for DSA comparison and fast lookups:
-#   - transactions_list: list of dicts
-#   - transactions_index: dict[id] = dict
-transactions_list: List[Dict[str, Any]] = []  # list of transactions (for GET /transactions)
-transactions_index: Dict[int, Dict[str, Any]] = {} # id -> transaction mapping for fast lookup for GET/PUT/DELETE by id
-next_id = 1 # intial ID for new transactions (created via POST)
+# TransactionStore (dsa/transaction_store.py) keeps rows in insertion order with
+# O(1) get/insert/update/delete by id, and does its own locking so every
+# handler thread can share it.
+store = TransactionStore()
+raw_texts = None # RawTextIndex of the loaded backup in lazy mode
+wal = None # DurableStore over store once load_data() opened WAL_DIR; handlers write through writer()
+
+def writer():
+    """Where POST/PUT/DELETE go: the durable wrapper if there is one, else the bare store (same methods)"""
+    return wal if wal is not None else store
 
 def load_data():
-    global transactions_list, transactions_index, next_id
-    if os.environ.exists(XML_PATH):
-        transactions_list = parse_momo_xml(XML_PATH)
+    global raw_texts, wal
+    t0 = time.perf_counter()
+    if WAL_DIR:
+        wal = DurableStore(WAL_DIR, store, fsync=WAL_FSYNC)
+        if wal.recover():
+            raw_texts = wal.extra.get("raw_texts")
+            problem = raw_text_problem()
+            if problem is not None: # every GET by id would fail: refuse to boot instead
+                raise RuntimeError(f"{WAL_DIR} keeps raw_text as spans into an XML file that can't be read: {problem}. "
+                                   f"Restore that file, or delete {WAL_DIR} to re-import {XML_PATH} (API writes are lost)")
+            warn_if_xml_changed(wal.extra.get("source"))
+            elapsed_ms = (time.perf_counter() - t0) * 1000
+            REGISTRY.record_stage("boot_load", elapsed_ms / 1000, len(store))
+            print(f"[boot] replayed snapshot + log from {WAL_DIR}: {len(store)} transactions in {elapsed_ms:.1f} ms"
+                  + (" (lazy raw_text)" if raw_texts is not None else ""))
+            return
+    if os.path.exists(XML_PATH) and LAZY_RAW_TEXT:
+        transactions, raw_texts, cache_hit = load_transactions_lazy(XML_PATH)
+    elif os.path.exists(XML_PATH):
+        transactions, cache_hit = load_transactions(XML_PATH) # parse cache keyed on path/size/mtime/sha256
     else:
-        transctions_list = []
+        transactions, cache_hit = [], False
+
+    store.load(transactions)
+    elapsed_ms = (time.perf_counter() - t0) * 1000
+    REGISTRY.record_stage("boot_load", elapsed_ms / 1000, len(store))
+    print(f"[boot] parse cache {'hit' if cache_hit else 'miss'}: loaded {len(store)} transactions from {XML_PATH} in {elapsed_ms:.1f} ms"
+          + (" (lazy raw_text)" if raw_texts is not None else ""))
+    if wal is not None: # the import becomes the first snapshot, so the next boot starts from it
+        wal.extra = {"source": file_fingerprint(XML_PATH) if os.path.exists(XML_PATH) else None}
+        if raw_texts is not None:
+            wal.extra["raw_texts"] = raw_texts
+        wal.snapshot()
+
+def warn_if_xml_changed(source):
+    """Boot from WAL_DIR ignores XML_PATH; say so loudly if it is not the file that was imported"""
+    if not os.path.exists(XML_PATH):
+        return
+    current = file_fingerprint(XML_PATH)
+    if source is None or any(source.get(k) != current[k] for k in ("path", "size", "mtime_ns")):
+        print(f"[boot] WARNING: {XML_PATH} differs from the backup imported into {WAL_DIR} and is NOT loaded; "
+              f"serving the stored data. Delete {WAL_DIR} to re-import it (API writes are lost)")
+
+def raw_text_problem():
+    """Why lazy raw_text can't be read from the XML (moved, deleted, replaced), or None. Once mapped it stays readable."""
+    if raw_texts is None:
+        return None
+    try:
+        raw_texts.open()
+    except (OSError, RuntimeError) as e:
+        return str(e)
+    return None
+
+def with_raw_text(row: Dict[str, Any]) -> Dict[str, Any]:
+    """row with raw_text filled in from the XML if the store only has its span (lazy mode)"""
+    if raw_texts is None or "raw_text" in row:
+        return row
+    return {**row, "raw_text": raw_texts.get(row["id"])}
 
-    transactions_index = {int(t["t"]): t for t in transactions_list } 
-    next_id = (max(transactions_index.keys())+1) if transactions_index else 1
+def list_fields(fields):
+    """Fields a list response carries: the requested ones, else all of them but the lazy raw_text"""
+    if fields is None and raw_texts is not None:
+        return [f for f in TX_FIELDS if f != "raw_text"]
+    return fields
     
+def send_unauthorized(handler: BaseHTTPRequestHandler):
+    payload = b'{"error":"Unauthorized"}'
+    discard_body(handler) # keep-alive: unread request bytes would be parsed as the next request
+    handler.send_response(401)
+    handler.send_header("Content-Type", "application/json") # specify content type for clarity example
+    handler.send_header("WWW-Authenticate", 'Basic realm="momo"') # to help ask for credentials
+    handler.send_header("Content-Length", str(len(payload)))
+    handler.end_headers()
+    handler.wfile.write(payload)
+    handler.response_bytes += len(payload)
+
 def ensure_auth(handler: BaseHTTPRequestHandler) -> bool: 
     auth = handler.headers.get("Authorization")
     if not auth or not auth.startswith("Basic "):  # no auth provided or not basic then return 401
-        handler.send_response(401)
-        handler.send_header("Content-Type", "application/json") # specify content type for clarity example
-        handler.send_header("WWW-Authenticate", 'Basic realm="momo"') # to help ask for credentials
-        handler.end_headers()
-        handler.wfile.write(b'{"error":"Unauthorized"}')
+        send_unauthorized(handler)
         return False
 
-    try:
-        b64 = auth.split(" ", 1)[1] # get base64 part after "Basic "
-        decoded = base64.b64decode(b64).decode("utf-8") # decode base64 to "user:pass"
-        user, pwd = decoded.split(":", 1) # split into user and pass
-    except Exception: # any error in decoding or splitting then return 401
-        handler.send_response(401) 
-        handler.send_header("WWW-Authenticate", 'Basic realm="momo"')
-        handler.end_headers()
-        handler.wfile.write(b'{"error":"Unauthorized"}')
+    if AUTH_CACHE.get(auth) is not None: # seen and verified recently
+        return True
+
+    creds = parse_basic_auth(auth) # None if the base64 / "user:pass" split fails
+    if creds is None:
+        send_unauthorized(handler)
         return False
 
-    if user == BASIC_USER and pwd == BASIC_PASS:
+    user, pwd = creds
+    # constant-time compares so response timing doesn't leak how much of the user/password matched
+    user_ok = hmac.compare_digest(user.encode("utf-8"), BASIC_USER.encode("utf-8"))
+    if verify_password(pwd, BASIC_PASS_HASH) and user_ok:
+        AUTH_CACHE.put(auth, user)
         return True
-    handler.send_response(401)
-    handler.send_header("WWW-Authenticate", 'Basic realm="momo"')
-    handler.end_headers() 
-    handler.wfile.write(b'{"error":"Unauthorized"}')
+    send_unauthorized(handler)
     return False
 
-def read_body_json(handler: BaseHTTPRequestHandler):
+def parse_list_query(query: str) -> Dict[str, Any]:
+    """Validate GET /transactions query parameters (raises ValueError)"""
+    params = parse_qs(query)
+    opts: Dict[str, Any] = {"limit": None, "offset": 0, "cursor": 0, "fields": None,
+                            "filters": {}, "from": None, "to": None}
+    for name in ("limit", "offset", "cursor"):
+        if name in params:
+            value = int(params[name][-1]) # ValueError on junk
+            if value < 0:
+                raise ValueError(f"{name} must be >= 0")
+            opts[name] = value
+    if "fields" in params:
+        fields = [f for f in params["fields"][-1].split(",") if f]
+        unknown = [f for f in fields if f not in TX_FIELDS]
+        if unknown:
+            raise ValueError(f"unknown fields {unknown}, allowed={TX_FIELDS}")
+        opts["fields"] = fields
+    for name in TransactionStore.INDEXED_FIELDS:
+        if name in params:
+            opts["filters"][name] = params[name][-1]
+    for name in ("from", "to"):
+        if name in params:
+            opts[name] = params[name][-1]
+    return opts
+
+def iter_transaction_batches(opts: Dict[str, Any], table: bool = False):
+    """Yield encoded batches of the rows selected by parse_list_query options.
+
+    Batches are ","-joined row encodings, JSON objects by default or arrays
+    in field order for the table format, ready to be joined into one array.
+    """
+    fields = list_fields(opts["fields"])
+    for batch in iter_row_batches(opts["cursor"], opts["offset"], opts["limit"], opts["filters"], opts["from"], opts["to"]):
+        if raw_texts is not None and fields is not None and "raw_text" in fields:
+            batch = [with_raw_text(row) for row in batch]
+        if table:
+            yield table_rows(batch, fields or TX_FIELDS)
+            continue
+        if fields is not None:
+            batch = [{f: row.get(f) for f in fields} for row in batch]
+        yield encode_json(batch)[1:-1]
+
+def iter_row_batches(cursor: int, offset: int, limit, filters, ts_from, ts_to):
+    """Yield lists of rows with id > cursor, skipping offset rows.
+
+    Each batch is one short store call, so a long response never blocks
+    writers for more than one batch and never copies the whole store.
+    Filtered requests resolve matching ids through the secondary indexes
+    and only then fetch rows.
+    """
+    if filters or ts_from is not None or ts_to is not None:
+        ids = store.find_ids(filters, ts_from, ts_to)
+        start = bisect.bisect_right(ids, cursor) + offset
+        ids = ids[start:] if limit is None else ids[start:start + limit]
+        for i in range(0, len(ids), STREAM_BATCH):
+            batch = store.get_many(ids[i:i + STREAM_BATCH])
+            if batch:
+                yield batch
+        return
+
+    sent = 0
+    while limit is None or sent < limit:
+        size = STREAM_BATCH if limit is None else min(STREAM_BATCH, limit - sent)
+        batch = store.page(cursor, offset, size)
+        if not batch:
+            return
+        cursor = batch[-1]["id"]
+        offset = 0
+        sent += len(batch)
+        yield batch
+
+ROUTES = {"/transactions", "/transactions/{id}", "/auth/stats", "/metrics"}
+
+def route_of(path: str) -> str:
+    """Metrics label for a request path: its route template, "unmatched" for anything else"""
+    parts = [p for p in urlparse(path).path.split("/") if p]
+    if len(parts) == 2 and parts[0] == "transactions":
+        parts[1] = "{id}"
+    route = "/" + "/".join(parts)
+    return route if route in ROUTES else "unmatched"
+
+def read_body(handler: BaseHTTPRequestHandler) -> bytes:
+    if handler.body_read:
+        return b""
+    handler.body_read = True
     length = int(handler.headers.get("Content-Length", "0")) 
-    raw = handler.rfile.read(length) if length > 0 else b""
+    return handler.rfile.read(length) if length > 0 else b""
+
+def discard_body(handler: BaseHTTPRequestHandler):
+    read_body(handler)
+
+def read_body_json(handler: BaseHTTPRequestHandler):
+    raw = read_body(handler)
     if not raw:
         return None
     try:
@@ -73,23 +252,156 @@ def read_body_json(handler: BaseHTTPRequestHandler):
         return None
 
 class App(BaseHTTPRequestHandler): # our main API handler class (extends BaseHTTPRequestHandler) for CRUD operations
+    protocol_version = "HTTP/1.1" # keep-alive: clients reuse one connection for many requests
+    disable_nagle_algorithm = True # headers and body go out as separate writes; don't stall on delayed ACKs
+
+    # Metrics: the clock starts once the request line is in, so keep-alive idle time is not counted
+    def parse_request(self):
+        self.body_read = False # reset per request, the handler lives as long as the connection
+        self.request_start = time.perf_counter()
+        ok = super().parse_request()
+        self.profile = profile_requested(self.headers.get(PROFILE_HEADER)) if ok else None
+        if self.profile:
+            self.profile.start()
+        return ok
+
+    def handle_one_request(self):
+        self.status, self.response_bytes, self.profile, self.command = None, 0, None, None
+        self.request_start = time.perf_counter() # reset by parse_request; this covers a request line rejected before it
+        try:
+            super().handle_one_request()
+        finally:
+            if self.profile:
+                self.profile.stop()
+        if self.status is None:
+            return # connection closed or timed out before a request arrived
+        if self.profile:
+            self.profile.save()
+        REGISTRY.record_request(self.command or "-", route_of(self.path) if self.command else "unmatched", self.status,
+                                time.perf_counter() - self.request_start, self.response_bytes)
+
+    def send_response(self, code, message=None):
+        self.status = code
+        super().send_response(code, message)
+
+    def end_headers(self):
+        if self.profile:
+            self.send_header(PROFILE_ID_HEADER, self.profile.id)
+        super().end_headers()
+
     def _send_json(self, obj, status=200):
-        payload = json.dumps(obj, ensure_ascii=False).encode("utf-8")
+        self._send_payload(encode_json(obj).encode("utf-8"), status)
+
+    def _content_encoding(self):
+        return choose_encoding(self.headers.get("Accept-Encoding"))
+
+    def _send_stream(self, pieces, status=200, head="[", tail="]", content_type=JSON_MEDIA_TYPE):
+        """Send head + ","-joined already-encoded str pieces + tail, compressed if the client allows"""
+        discard_body(self)
+        chunked = self.request_version == "HTTP/1.1" and self.protocol_version == "HTTP/1.1"
+        encoding = self._content_encoding() # lists are assumed big enough to be worth compressing
+        self.send_response(status)
+        self.send_header("Content-Type", content_type + "; charset=utf-8")
+        if encoding:
+            self.send_header("Content-Encoding", encoding)
+        self.send_header("Vary", "Accept, Accept-Encoding")
+        if chunked:
+            self.send_header("Transfer-Encoding", "chunked")
+        else:
+            self.close_connection = True # HTTP/1.0: the end of the body is the end of the connection
+        self.end_headers()
+
+        def write_raw(data: bytes):
+            if not data:
+                return # a zero-length chunk would end the chunked body
+            self.response_bytes += len(data)
+            if chunked:
+                self.wfile.write(b"%X\r\n%s\r\n" % (len(data), data))
+            else:
+                self.wfile.write(data)
+
+        if encoding:
+            zstream = compressor(encoding)
+            write = lambda data: write_raw(zstream.compress(data))
+        else:
+            write = write_raw
+
+        sep = ""
+        write(head.encode("utf-8"))
+        for piece in pieces:
+            write((sep + piece).encode("utf-8"))
+            sep = ","
+        write(tail.encode("utf-8"))
+        if encoding:
+            write_raw(zstream.flush())
+        if chunked:
+            self.wfile.write(b"0\r\n\r\n")
+
+    def _send_payload(self, payload, status=200):
+        discard_body(self)
+        encoding = self._content_encoding() if len(payload) >= COMPRESS_MIN_BYTES else None
+        if encoding:
+            payload = compress(payload, encoding)
         self.send_response(status)
         self.send_header("Content-Type", "application/json; charset=utf-8")
+        if encoding:
+            self.send_header("Content-Encoding", encoding)
+        self.send_header("Vary", "Accept-Encoding")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+        self.response_bytes += len(payload)
+
+    def _send_text(self, text, content_type, status=200):
+        discard_body(self)
+        payload = text.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
         self.send_header("Content-Length", str(len(payload)))
         self.end_headers()
         self.wfile.write(payload)
+        self.response_bytes += len(payload)
 
     # CRUD Handlers
+    def _raw_text_unavailable(self):
+        # 500 with a JSON error instead of an exception that drops the connection
+        problem = raw_text_problem()
+        if problem is not None:
+            discard_body(self)
+            self._send_json({"error": f"raw_text unavailable: {problem}"}, 500)
+        return problem is not None
+
     def do_GET(self):
         if not ensure_auth(self):
             return
         parsed = urlparse(self.path)
         parts = [p for p in parsed.path.split("/") if p]
         # /transactions
+        # /auth/stats: auth cache counters, for sizing AUTH_CACHE_SIZE / AUTH_CACHE_TTL
+        if parts == ["auth", "stats"]:
+            self._send_json(AUTH_CACHE.stats())
+            return
+        # /metrics: request counts, latency histograms and bytes per route, Prometheus text format
+        if parts == ["metrics"]:
+            self._send_text(REGISTRY.render(), METRICS_MEDIA_TYPE)
+            return
+        # ?limit=&offset= for offset paging, ?cursor=<last id seen> for keyset paging, ?fields=id,amount,...
+        # ?type=&sender=&receiver=&transaction_id= exact-match filters, ?from=&to= timestamp range (to is an inclusive prefix)
         if parts == ["transactions"]:
-            self._send_json(transactions_list)
+            try:
+                opts = parse_list_query(parsed.query)
+            except ValueError as e:
+                self._send_json({"error": str(e)}, 400)
+                return
+            if "raw_text" in (opts["fields"] or ()) and self._raw_text_unavailable():
+                return
+            # Accept: application/vnd.momo.table+json -> {"fields": [...], "rows": [[...], ...]}
+            if wants_table(self.headers.get("Accept")):
+                head = '{"fields":' + encode_json(list_fields(opts["fields"]) or TX_FIELDS) + ',"rows":['
+                self._send_stream(iter_transaction_batches(opts, table=True), head=head, tail="]}",
+                                  content_type=TABLE_MEDIA_TYPE)
+            else:
+                self._send_stream(iter_transaction_batches(opts))
             return
         # /transactions/{id}
         if len(parts) == 2 and parts[0] == "transactions":
@@ -98,11 +410,13 @@ class App(BaseHTTPRequestHandler): # our main API handler class (extends BaseHTT
             except ValueError:
                 self._send_json({"error": "invalid id"}, 400)
                 return
-            tx = transactions_index.get(tx_id)
+            tx = store.get(tx_id)
             if not tx:
                 self._send_json({"error": "not found"}, 404)
                 return
-            self._send_json(tx)
+            if self._raw_text_unavailable():
+                return
+            self._send_json(with_raw_text(tx))
             return
         self._send_json({"error": "unknown endpoint"}, 404)
 
@@ -121,9 +435,7 @@ class App(BaseHTTPRequestHandler): # our main API handler class (extends BaseHTT
         if any(k not in body for k in required):
             self._send_json({"error": f"missing fields, required={required}"}, 400)
             return
-        global next_id
         tx = {
-            "id": next_id,
             "type": body["type"],
             "amount": float(body["amount"]),
             "currency": body.get("currency", "RWF"),
@@ -132,9 +444,11 @@ class App(BaseHTTPRequestHandler): # our main API handler class (extends BaseHTT
             "timestamp": body["timestamp"],
             "raw_text": body.get("raw_text", ""),
         }
-        transactions_list.append(tx)
-        transactions_index[tx["id"]] = tx
-        next_id += 1
+        try:
+            tx = writer().insert(tx) # durable (group-committed to the log) before the 201 goes out
+        except OSError as e: # the write-ahead log failed: nothing can be made durable
+            self._send_json({"error": f"write not saved: {e}"}, 503)
+            return
         self._send_json(tx, 201)
 
     def do_PUT(self):
@@ -150,8 +464,7 @@ class App(BaseHTTPRequestHandler): # our main API handler class (extends BaseHTT
         except ValueError:
             self._send_json({"error": "invalid id"}, 400)
             return
-        existing = transactions_index.get(tx_id)
-        if not existing:
+        if tx_id not in store:
             self._send_json({"error": "not found"}, 404)
             return
         body = read_body_json(self)
@@ -159,10 +472,21 @@ class App(BaseHTTPRequestHandler): # our main API handler class (extends BaseHTT
             self._send_json({"error": "invalid json"}, 400)
             return
         # Patch allowed fields
+        patch = {}
         for k in ["type", "amount", "currency", "sender", "receiver", "timestamp", "raw_text"]:
             if k in body:
-                existing[k] = body[k] if k != "amount" else float(body[k])
-        self._send_json(existing)
+                patch[k] = body[k] if k != "amount" else float(body[k])
+        if self._raw_text_unavailable(): # checked before writing: the response needs it
+            return
+        try:
+            updated = writer().update(tx_id, patch)
+        except OSError as e:
+            self._send_json({"error": f"write not saved: {e}"}, 503)
+            return
+        if not updated: # deleted by another request in the meantime
+            self._send_json({"error": "not found"}, 404)
+            return
+        self._send_json(with_raw_text(updated))
 
     def do_DELETE(self):
         if not ensure_auth(self):
@@ -177,27 +501,28 @@ class App(BaseHTTPRequestHandler): # our main API handler class (extends BaseHTT
         except ValueError:
             self._send_json({"error": "invalid id"}, 400)
             return
-        if tx_id not in transactions_index:
+        try:
+            tx = writer().delete(tx_id) # O(1): tombstone + periodic compaction
+        except OSError as e:
+            self._send_json({"error": f"write not saved: {e}"}, 503)
+            return
+        if not tx:
             self._send_json({"error": "not found"}, 404)
             return
-        # delete from dict + list
-        tx = transactions_index.pop(tx_id)
-        for i, row in enumerate(transactions_list):
-            if row["id"] == tx_id:
-                transactions_list.pop(i)
-                break
         self._send_json({"status": "deleted", "id": tx_id})
 
 def main():
     load_data()
-    print(f"[boot] loaded {len(transactions_list)} transactions from {XML_PATH}")
-    srv = HTTPServer((HOST, PORT), App)
-    print(f"[listen] http://{HOST}:{PORT}  (Basic Auth user={BASIC_USER})")
+    server_cls = ThreadingHTTPServer if SERVER_MODE == "threaded" else HTTPServer
+    srv = server_cls((HOST, PORT), App)
+    print(f"[listen] http://{HOST}:{PORT}  ({SERVER_MODE}, Basic Auth user={BASIC_USER})")
     try:
         srv.serve_forever()
     except KeyboardInterrupt:
         print("\n[shutdown]")
         srv.server_close()
+        if wal is not None:
+            wal.close()
 
 if __name__ == "__main__":
     main()
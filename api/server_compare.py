@@ -0,0 +1,81 @@
+# api/server_compare.py
+# Load test: the old single-threaded HTTP/1.0 server vs the threaded keep-alive one.
+import base64, http.client, multiprocessing, os, random, threading, time # stdlib only
+from http.server import HTTPServer, ThreadingHTTPServer
+
+import api.server as server
+
+AUTH = "Basic " + base64.b64encode(f"{server.BASIC_USER}:{server.BASIC_PASS}".encode()).decode()
+
+class QuietApp(server.App):
+    def log_message(self, format, *args): # stderr access logging would dominate the timings
+        pass
+
+class LegacyApp(QuietApp): # what api/server.py served before: one request per connection
+    protocol_version = "HTTP/1.0"
+
+def fake_rows(n):
+    return [{"id": i, "type": "received", "amount": float(i), "currency": "RWF", "sender": "Jane Smith",
+             "receiver": None, "timestamp": "2024-05-10 16:30:58", "transaction_id": str(i),
+             "raw_text": "You have received 2000 RWF from Jane Smith (*********013)."} for i in range(1, n + 1)]
+
+def serve(server_cls, handler, rows, ready):
+    # Runs in its own process so the load generator does not share the server's GIL
+    server.store.load(fake_rows(rows))
+    server_cls.request_queue_size = 128
+    srv = server_cls(("127.0.0.1", 0), handler)
+    ready.put(srv.server_address[1])
+    srv.serve_forever()
+
+def run_client(port, keep_alive, rows, requests, list_every, latencies, errors):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    rng = random.Random()
+    for n in range(requests):
+        kind = "list" if n % list_every == 0 else "get"
+        path = "/transactions" if kind == "list" else f"/transactions/{rng.randint(1, rows)}"
+        t0 = time.perf_counter()
+        try:
+            conn.request("GET", path, headers={"Authorization": AUTH})
+            conn.getresponse().read()
+        except (OSError, http.client.HTTPException):
+            errors.append(path)
+            conn.close()
+        latencies.append((kind, time.perf_counter() - t0))
+        if not keep_alive:
+            conn.close()
+    conn.close()
+
+def bench(server_cls, handler, rows, clients, requests, list_every):
+    ready = multiprocessing.Queue()
+    proc = multiprocessing.Process(target=serve, args=(server_cls, handler, rows, ready), daemon=True)
+    proc.start()
+    port = ready.get(timeout=60)
+    latencies, errors = [], []
+    keep_alive = handler.protocol_version == "HTTP/1.1"
+    workers = [threading.Thread(target=run_client, args=(port, keep_alive, rows, requests, list_every, latencies, errors))
+               for _ in range(clients)]
+    t0 = time.perf_counter()
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    elapsed = time.perf_counter() - t0
+    proc.terminate()
+    proc.join()
+    return len(latencies) / elapsed, p99(latencies), p99(l for l in latencies if l[0] == "get"), len(errors)
+
+def p99(latencies):
+    ms = sorted(seconds * 1000 for _, seconds in latencies)
+    return ms[max(int(len(ms) * 0.99) - 1, 0)]
+
+if __name__ == "__main__":
+    rows = int(os.environ.get("ROWS", "5000"))
+    clients = int(os.environ.get("CLIENTS", "16"))
+    requests = int(os.environ.get("REQUESTS", "200")) # per client
+    list_every = int(os.environ.get("LIST_EVERY", "50")) # every Nth request is a full GET /transactions
+
+    print(f"{clients} clients x {requests} requests, {rows} rows, 1 in {list_every} is GET /transactions")
+    for label, server_cls, handler in [("HTTPServer, HTTP/1.0 (old)", HTTPServer, LegacyApp),
+                                       ("ThreadingHTTPServer, keep-alive", ThreadingHTTPServer, QuietApp)]:
+        rps, p99_all, p99_get, errors = bench(server_cls, handler, rows, clients, requests, list_every)
+        print(f"{label:34s} {rps:8,.0f} req/s   p99 {p99_all:8.2f} ms   p99 by-id {p99_get:8.2f} ms   errors {errors}")
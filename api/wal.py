@@ -0,0 +1,340 @@
+# api/wal.py
+# Durable writes for the api/server.py store: an append-only mutation log with group commit,
+# periodic snapshots, and recovery = latest snapshot + log tail (stdlib only).
+#
+#   <dir>/wal-<first lsn>.log        frames of <u32 length><u32 crc32><JSON record>, one per mutation
+#   <dir>/snapshot-<lsn>.pickle      every row as of record <lsn>, plus the next id and caller extras
+#
+# Records carry a log sequence number (lsn) that grows by one per mutation.
+# A snapshot at lsn L makes every segment holding only records <= L
+# redundant, so taking one also starts a new segment and deletes the old.
+import glob, json, os, pickle, struct, threading, zlib
+from typing import Any, Dict, List, Optional, Tuple
+
+from api.encoding import encode_json
+from dsa.transaction_store import TransactionStore
+
+SNAPSHOT_EVERY = int(os.environ.get("API_WAL_SNAPSHOT_EVERY", "100000")) # records between automatic snapshots
+_FRAME = struct.Struct("<II") # payload length, crc32 of the payload
+
+class WalCorrupt(Exception):
+    """A log segment is damaged somewhere other than its torn tail"""
+
+def _fsync_dir(directory: str) -> None:
+    # makes a create/rename/unlink in directory durable; not possible (or needed) everywhere
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except (OSError, AttributeError):
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+def _segment_path(directory: str, first_lsn: int) -> str:
+    return os.path.join(directory, f"wal-{first_lsn:016d}.log")
+
+def _snapshot_path(directory: str, lsn: int) -> str:
+    return os.path.join(directory, f"snapshot-{lsn:016d}.pickle")
+
+def _numbered(directory: str, prefix: str, suffix: str) -> List[Tuple[int, str]]:
+    """(number, path) of <prefix><number><suffix> files in directory, ascending"""
+    found = []
+    for path in glob.glob(os.path.join(directory, f"{prefix}*{suffix}")):
+        name = os.path.basename(path)[len(prefix):-len(suffix)]
+        if name.isdigit():
+            found.append((int(name), path))
+    return sorted(found)
+
+def read_segment(path: str) -> Tuple[List[Dict[str, Any]], int, bool]:
+    """(records, bytes of whole frames, clean) for one segment; clean is False when a torn or bad frame ends it"""
+    with open(path, "rb") as f:
+        data = f.read()
+    records, pos = [], 0
+    while pos < len(data):
+        if pos + _FRAME.size > len(data):
+            return records, pos, False
+        length, crc = _FRAME.unpack_from(data, pos)
+        payload = data[pos + _FRAME.size:pos + _FRAME.size + length]
+        if len(payload) < length or zlib.crc32(payload) != crc:
+            return records, pos, False
+        records.append(json.loads(payload))
+        pos += _FRAME.size + length
+    return records, pos, True
+
+class MutationLog:
+    """
+    Append-only log with group commit.
+
+    submit() only frames the record into an in-memory buffer and returns
+    its lsn; wait(lsn) returns once that record is on disk. The first
+    waiter to find nothing flushing becomes the leader: it writes
+    everything buffered so far with one write() and one fsync() while the
+    others sleep, then wakes them all. Records submitted while an fsync is
+    in flight ride the next one, so N concurrent writers pay for roughly
+    one fsync per batch instead of one each.
+
+    group_commit=False flushes every record on its own, which is the
+    one-fsync-per-request baseline wal_compare.py measures against.
+    """
+
+    def __init__(self, directory: str, next_lsn: int = 1, fsync: bool = True, group_commit: bool = True):
+        self.directory = directory
+        self.fsync = fsync
+        self.group_commit = group_commit
+        os.makedirs(directory, exist_ok=True)
+        self._cond = threading.Condition(threading.Lock())
+        self._buffer: List[bytes] = []
+        self._flushing = False
+        self._failed: Optional[BaseException] = None # a failed write loses its batch, so nothing after it may be acknowledged
+        self.lsn = next_lsn - 1 # last lsn handed out
+        self.durable_lsn = self.lsn
+        self.flushes = 0 # fsync batches, for stats
+        self._file = self._open_segment(next_lsn)
+
+    def _open_segment(self, first_lsn: int):
+        f = open(_segment_path(self.directory, first_lsn), "ab", buffering=0)
+        _fsync_dir(self.directory)
+        return f
+
+    def submit(self, record: Dict[str, Any]) -> int:
+        """Buffer record under the next lsn and return it. Callers submit in the order they applied the writes."""
+        with self._cond:
+            self.check()
+            payload = encode_json({**record, "lsn": self.lsn + 1}).encode("utf-8") # may raise: no lsn is used up
+            self._buffer.append(_FRAME.pack(len(payload), zlib.crc32(payload)) + payload)
+            self.lsn += 1
+            return self.lsn
+
+    def wait(self, lsn: int) -> None:
+        """Block until record lsn is durable"""
+        cond = self._cond
+        cond.acquire()
+        try:
+            while self.durable_lsn < lsn:
+                self.check()
+                if self._flushing:
+                    cond.wait()
+                    continue
+                self._flushing = True
+                if self.group_commit:
+                    data, upto = b"".join(self._buffer), self.lsn
+                    self._buffer.clear()
+                else: # only the oldest pending record
+                    data, upto = self._buffer.pop(0), self.durable_lsn + 1
+                f = self._file
+                cond.release()
+                try:
+                    f.write(data)
+                    if self.fsync:
+                        os.fsync(f.fileno())
+                except BaseException as e:
+                    self._failed = e
+                    raise
+                finally:
+                    cond.acquire()
+                    self._flushing = False
+                    cond.notify_all()
+                self.durable_lsn = upto
+                self.flushes += 1
+        finally:
+            cond.release()
+
+    def check(self) -> None:
+        """Raise OSError if an earlier write failed: the log accepts nothing after a lost batch"""
+        if self._failed is not None:
+            raise OSError(f"mutation log in {self.directory} failed earlier: {self._failed!r}") from self._failed
+
+    def append(self, record: Dict[str, Any]) -> int:
+        lsn = self.submit(record)
+        self.wait(lsn)
+        return lsn
+
+    def rotate(self) -> int:
+        """Flush everything, then start a new segment; returns the last lsn of the old one"""
+        with self._cond:
+            while self._flushing:
+                self._cond.wait()
+            if self._buffer:
+                self._file.write(b"".join(self._buffer))
+                self._buffer.clear()
+            if self.fsync:
+                os.fsync(self._file.fileno())
+            self.durable_lsn = self.lsn
+            self._file.close()
+            self._file = self._open_segment(self.lsn + 1)
+            self._cond.notify_all()
+            return self.lsn
+
+    def drop_segments_through(self, lsn: int) -> None:
+        """Delete segments whose records are all <= lsn (a snapshot covers them)"""
+        segments = _numbered(self.directory, "wal-", ".log")
+        for (first, path), (next_first, _) in zip(segments, segments[1:]):
+            if next_first - 1 <= lsn:
+                os.remove(path)
+        _fsync_dir(self.directory)
+
+    def close(self) -> None:
+        with self._cond:
+            while self._flushing:
+                self._cond.wait()
+            if self._buffer:
+                self._file.write(b"".join(self._buffer))
+                self._buffer.clear()
+                if self.fsync:
+                    os.fsync(self._file.fileno())
+                self.durable_lsn = self.lsn
+            self._file.close()
+
+def write_snapshot(directory: str, lsn: int, next_id: int, rows: List[Dict[str, Any]], extra: Optional[dict] = None) -> str:
+    path = _snapshot_path(directory, lsn)
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        pickle.dump({"lsn": lsn, "next_id": next_id, "extra": extra or {}}, f, protocol=pickle.HIGHEST_PROTOCOL)
+        pickle.dump(rows, f, protocol=pickle.HIGHEST_PROTOCOL)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path) # atomic: a crash leaves the old snapshot or the new one, never half of one
+    _fsync_dir(directory)
+    return path
+
+def read_snapshot(path: str) -> Tuple[dict, List[Dict[str, Any]]]:
+    with open(path, "rb") as f:
+        head = pickle.load(f)
+        return head, pickle.load(f)
+
+def replay(directory: str) -> Tuple[int, int, List[Dict[str, Any]], dict]:
+    """
+    (last lsn, next id, rows in id order, snapshot extras) from the newest
+    readable snapshot plus every later log record. A torn last frame (a
+    crash mid-write) is cut off; damage anywhere else raises WalCorrupt.
+    """
+    head, rows = {"lsn": 0, "next_id": 1, "extra": {}}, []
+    for lsn, path in reversed(_numbered(directory, "snapshot-", ".pickle")):
+        try:
+            head, rows = read_snapshot(path)
+            break
+        except (OSError, EOFError, pickle.UnpicklingError):
+            continue # fall back to an older snapshot; its segments are only deleted once a newer one exists
+    by_id = {row["id"]: row for row in rows}
+    lsn, next_id = head["lsn"], head["next_id"]
+
+    segments = _numbered(directory, "wal-", ".log")
+    for i, (first, path) in enumerate(segments):
+        records, good_bytes, clean = read_segment(path)
+        if not clean:
+            if i != len(segments) - 1:
+                raise WalCorrupt(f"{path}: damaged frame at byte {good_bytes}")
+            with open(path, "r+b") as f: # torn tail from a crash mid-write: those writes were never acknowledged
+                f.truncate(good_bytes)
+                os.fsync(f.fileno())
+        for record in records:
+            if record["lsn"] <= lsn:
+                continue # already in the snapshot
+            if record["lsn"] != lsn + 1:
+                raise WalCorrupt(f"{path}: expected lsn {lsn + 1}, found {record['lsn']}")
+            lsn = record["lsn"]
+            op = record["op"]
+            if op == "insert":
+                row = record["row"]
+                by_id[row["id"]] = row
+                next_id = max(next_id, row["id"] + 1)
+            elif op == "update":
+                old = by_id.get(record["id"])
+                if old is not None:
+                    by_id[record["id"]] = {**old, **record["patch"], "id": record["id"]}
+            elif op == "delete":
+                by_id.pop(record["id"], None)
+    return lsn, next_id, list(by_id.values()), head.get("extra") or {}
+
+class DurableStore:
+    """
+    TransactionStore writes made durable through a MutationLog.
+
+    insert/update/delete have the store's signatures: each applies the
+    write and submits its log record under the store lock (so log order is
+    apply order), then waits for group commit outside the lock, so readers
+    and other writers are never held up by an fsync. A write is visible to
+    readers a moment before it is durable, but is only acknowledged after.
+    Once a log write has failed, writes raise OSError before touching the
+    store.
+
+    Every snapshot_every records a snapshot is written on a background
+    thread; rows are never mutated in place, so copying the row list under
+    the lock is enough for a consistent view.
+    """
+
+    def __init__(self, directory: str, store: TransactionStore, fsync: bool = True, group_commit: bool = True,
+                 snapshot_every: int = SNAPSHOT_EVERY):
+        self.directory = directory
+        self.store = store
+        self.fsync = fsync
+        self.group_commit = group_commit
+        self.snapshot_every = snapshot_every
+        self.extra: dict = {}
+        self.log: Optional[MutationLog] = None
+        self.snapshot_lsn = 0
+        self._snapshotting = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def recover(self) -> bool:
+        """Load the snapshot + log tail into the store; False if the directory holds nothing yet"""
+        has_data = bool(_numbered(self.directory, "snapshot-", ".pickle") or _numbered(self.directory, "wal-", ".log"))
+        lsn, next_id, rows, self.extra = replay(self.directory)
+        if has_data:
+            self.store.load(rows)
+            self.store.next_id = max(self.store.next_id, next_id) # ids of deleted tail rows are never reused
+        self.snapshot_lsn = max((n for n, _ in _numbered(self.directory, "snapshot-", ".pickle")), default=0)
+        self.log = MutationLog(self.directory, next_lsn=lsn + 1, fsync=self.fsync, group_commit=self.group_commit)
+        return has_data
+
+    def _write(self, apply, record_for):
+        with self.store.lock:
+            self.log.check() # a failed log takes no more writes, so don't let the store take them either
+            result = apply()
+            lsn = self.log.submit(record_for(result)) if result is not None else None
+        if lsn is not None:
+            self.log.wait(lsn)
+            if self.snapshot_every and lsn - self.snapshot_lsn >= self.snapshot_every:
+                self.snapshot_in_background()
+        return result
+
+    def insert(self, fields: Dict[str, Any]) -> Dict[str, Any]:
+        return self._write(lambda: self.store.insert(fields), lambda row: {"op": "insert", "row": row})
+
+    def update(self, tx_id: int, patch: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        return self._write(lambda: self.store.update(tx_id, patch), lambda _: {"op": "update", "id": tx_id, "patch": patch})
+
+    def delete(self, tx_id: int) -> Optional[Dict[str, Any]]:
+        return self._write(lambda: self.store.delete(tx_id), lambda _: {"op": "delete", "id": tx_id})
+
+    def snapshot(self) -> Optional[str]:
+        """Write a snapshot of the store now and drop the log segments it covers; None if one is already running"""
+        if not self._snapshotting.acquire(blocking=False):
+            return None
+        try:
+            with self.store.lock: # a consistent cut: no write can land between the copy and the rotate
+                rows = list(self.store)
+                next_id = self.store.next_id
+                lsn = self.log.rotate()
+            path = write_snapshot(self.directory, lsn, next_id, rows, self.extra)
+            self.snapshot_lsn = lsn
+            for old_lsn, old in _numbered(self.directory, "snapshot-", ".pickle"):
+                if old_lsn < lsn:
+                    os.remove(old)
+            self.log.drop_segments_through(lsn)
+            return path
+        finally:
+            self._snapshotting.release()
+
+    def snapshot_in_background(self) -> None:
+        if not self._snapshotting.locked():
+            threading.Thread(target=self.snapshot, name="wal-snapshot", daemon=True).start()
+
+    def close(self) -> None:
+        with self._snapshotting: # let a running snapshot finish
+            pass
+        if self.log is not None:
+            self.log.close()
@@ -0,0 +1,97 @@
+# api/wal_compare.py
+# api/wal.py at 1M records: write throughput (fsync per request vs group commit) and boot/recovery time
+# (re-parsing the XML vs the parse cache vs snapshot + log tail vs replaying a log with no snapshot).
+import os, random, shutil, tempfile, threading, time
+
+from api.wal import DurableStore, MutationLog
+from bench.generate import write_backup
+from dsa.parse_cache import load_transactions
+from dsa.parse_xml import parse_momo_xml
+from dsa.transaction_store import TransactionStore
+
+ROWS = int(os.environ.get("ROWS", "1000000"))
+WRITES = int(os.environ.get("WRITES", "4000")) # per (mode, clients) run
+TAIL = int(os.environ.get("TAIL", "100000")) # log records after the snapshot in the recovery run
+
+def timed(fn, *args, **kwargs):
+    t0 = time.perf_counter()
+    out = fn(*args, **kwargs)
+    return out, time.perf_counter() - t0
+
+def write_load(writer, n_rows, clients, writes):
+    """writes/s of clients threads splitting writes between them: 1/2 inserts, 1/2 updates of random rows"""
+    def client(seed):
+        rng = random.Random(seed)
+        for i in range(writes // clients):
+            if i % 2:
+                writer.update(rng.randint(1, n_rows), {"amount": float(i)})
+            else:
+                writer.insert({"type": "sent", "amount": float(i), "currency": "RWF", "sender": "Bench",
+                               "receiver": "Shop", "timestamp": "2100-01-01 00:00:00", "raw_text": "typed in"})
+                # newer than every generated message, like a real POST, so the time index appends
+    threads = [threading.Thread(target=client, args=(seed,)) for seed in range(clients)]
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return writes // clients * clients / (time.perf_counter() - t0)
+
+if __name__ == "__main__":
+    tmp = tempfile.mkdtemp()
+    xml = str(write_backup(os.path.join(tmp, "sms.xml"), ROWS))
+    print(f"{ROWS:,} messages, {os.path.getsize(xml) / 1e6:.0f} MB XML, temp dir {tmp}")
+
+    # ---- recovery ----
+    rows, parse_s = timed(parse_momo_xml, xml)
+    _, load_s = timed(TransactionStore, rows)
+    print(f"\nboot: re-parse XML (old)        {parse_s + load_s:7.2f} s")
+    cache = os.path.join(tmp, "cache")
+    load_transactions(xml, cache_dir=cache)
+    (cached, _), cache_s = timed(load_transactions, xml, cache_dir=cache)
+    _, load_s = timed(TransactionStore, cached)
+    print(f"boot: parse cache hit           {cache_s + load_s:7.2f} s")
+    del cached
+
+    wal_dir = os.path.join(tmp, "wal")
+    store = TransactionStore(rows)
+    durable = DurableStore(wal_dir, store, fsync=False, snapshot_every=0)
+    durable.recover()
+    snapshot, snap_s = timed(durable.snapshot)
+    rng = random.Random(0)
+    for i in range(TAIL):
+        durable.update(rng.randint(1, ROWS), {"amount": float(i)})
+    durable.close()
+    print(f"snapshot write                  {snap_s:7.2f} s  {os.path.getsize(snapshot) / 1e6:.0f} MB")
+    fresh = TransactionStore()
+    _, recover_s = timed(DurableStore(wal_dir, fresh, fsync=False).recover)
+    assert len(fresh) == ROWS
+    print(f"boot: snapshot + {TAIL:,} log     {recover_s:7.2f} s")
+    del fresh
+
+    log_dir = os.path.join(tmp, "log_only")
+    log = MutationLog(log_dir, fsync=False)
+    for row in rows:
+        log.submit({"op": "insert", "row": row})
+    log.close()
+    fresh = TransactionStore()
+    _, replay_s = timed(DurableStore(log_dir, fresh, fsync=False).recover)
+    assert len(fresh) == ROWS
+    print(f"boot: {ROWS:,} log records, no snapshot {replay_s:7.2f} s")
+    del fresh
+    shutil.rmtree(log_dir)
+
+    # ---- write throughput on the 1M-row store ----
+    print(f"\nwrites/s, {WRITES:,} writes (half inserts, half updates) per run")
+    for clients in (1, 16):
+        print(f"  {clients:2d} client(s): memory only {write_load(store, ROWS, clients, WRITES):9,.0f}", end="")
+        for label, group_commit in (("fsync per request", False), ("group commit", True)):
+            d = os.path.join(tmp, f"w_{clients}_{group_commit}")
+            durable = DurableStore(d, store, fsync=True, group_commit=group_commit, snapshot_every=0)
+            durable.recover() # empty dir: leaves the store alone
+            rate = write_load(durable, ROWS, clients, WRITES)
+            durable.close()
+            print(f"  {label} {rate:8,.0f} ({durable.log.flushes:,} fsyncs)", end="")
+            shutil.rmtree(d)
+        print()
+    shutil.rmtree(tmp)
@@ -0,0 +1,92 @@
+# bench/generate.py
+# Synthetic MoMo SMS backups in the modified_sms_v2.xml format, for benchmarks at any size.
+#   python -m bench.generate 1000000 -o data/raw/synthetic_1m.xml
+import argparse, random, time, uuid
+from datetime import datetime
+from xml.sax.saxutils import escape
+
+NAMES = ["Jane Smith", "Samuel Carter", "Alex Doe", "Robert Brown", "Linda Green"]
+START_MS = 1715351458724 # first message of the sample backup, 2024-05-10
+PROMO = "Kanda*182*16# wiyandikishe muri poromosiyo ya BivaMoMotima, ugire amahirwe yo gutsindira ibihembo bishimishije."
+
+# (weight, template) with roughly the sample backup's mix of message kinds
+TEMPLATES = [
+    (40, "TxId: {txid}. Your payment of {amount:,} RWF to {name} {code} has been completed at {at}. "
+         "Your new balance: {balance:,} RWF. Fee was 0 RWF." + PROMO),
+    (35, "*165*S*{amount} RWF transferred to {name} (2507{phone}) from 36521838 at {at} . Fee was: 100 RWF. "
+         "New balance: {balance} RWF. Kugura ama inite cg interineti kuri MoMo, Kanda *182*2*1# .*EN#"),
+    (15, "*113*R*A bank deposit of {amount} RWF has been added to your mobile money account at {at}. "
+         "Your NEW BALANCE :{balance} RWF. Cash Deposit::CASH::::0::2507{phone}.Thank you for using MTN MobileMoney.*EN#"),
+    (3, "*162*TxId:{txid}*S*Your payment of {amount} RWF to Bundles and Packs with token  has been completed at {at}. "
+        "Fee was 0 RWF. Your new balance: {balance} RWF . Message: - -. *EN#"),
+    (2, "You have received {amount} RWF from {name} (*********{code3}) on your mobile money account at {at}. "
+        "Message from sender: . Your new balance:{balance} RWF. Financial Transaction Id: {txid}."),
+    (2, "*164*S*Y'ello,A transaction of {amount} RWF by Data Bundle MTN on your MOMO account was successfully completed "
+        "at {at}. Message from debit receiver: . Your new balance:{balance} RWF. Fee was 0 RWF. "
+        "Financial Transaction Id: {txid}. External Transaction Id: {txid}{code}.*EN#"),
+    (1, "You Abebe Chala CHEBUDIE (*********036) have via agent: Agent Sophia (2507{phone}), withdrawn {amount} RWF "
+        "from your mobile money account: 36521838 at {at} and you can now collect your money in cash. "
+        "Your new balance: {balance} RWF. Fee paid: 350 RWF. Message from agent: 1. Financial Transaction Id: {txid}."),
+    (1, "Yello!Umaze kugura {amount}Rwf(1GB)/30days igura {amount:,} RWF"),
+    (1, "<#> Dear Customer, your MTN MoMo application one-time password is :{code4}.MTN MoMo does not recommend that "
+        "you share or expose your one-time password with anyone. Be Vigilant. RdbS6eMOXvx N/RywfrtIZL>."),
+    (1, "*143*R*Y'ello, the transaction with amount {amount} RWF for ESICIA LTD with message: {txid}{code} failed at "
+        "{at} .Please Contact MobileMoney HelpLine for Assistance.Thank you for using MTN MobileMoney.*EN#"),
+]
+
+def iter_sms(count, seed=0, start_ms=START_MS):
+    """
+    Yield (date_ms, body) for count messages, dates strictly increasing and
+    transaction ids unique. Like a real backup, the few kinds without an id
+    or a timestamp in the text (bundle purchases, one-time passwords) can
+    repeat word for word within a day.
+    """
+    rng = random.Random(seed)
+    weights = [w for w, _ in TEMPLATES]
+    templates = [t for _, t in TEMPLATES]
+    date_ms, balance = start_ms, 50_000
+    for i in range(count):
+        date_ms += rng.randint(1_000, 3_600_000)
+        amount = rng.choice((50, 100, 500, 600, 1000, 2000, 2500, 3500, 5000, 10000, 20000, 40000))
+        balance = max(0, balance + rng.randint(-amount, amount))
+        body = rng.choices(templates, weights)[0].format(
+            txid=10**10 + i * 9 + rng.randint(0, 8), amount=amount, balance=balance, name=rng.choice(NAMES),
+            code=rng.randint(10000, 99999), code3=rng.randint(100, 999), code4=rng.randint(1000, 9999),
+            phone=rng.randint(80000000, 99999999), at=datetime.fromtimestamp(date_ms / 1000).strftime("%Y-%m-%d %H:%M:%S"))
+        yield date_ms, body
+
+def sms_element(date_ms, body):
+    """One <sms .../> line with the attributes a real Android SMS backup writes"""
+    sent = date_ms - date_ms % 1000 - 7000
+    dt = datetime.fromtimestamp(date_ms / 1000)
+    readable = f"{dt.day} {dt:%b %Y} {dt.hour % 12 or 12}:{dt:%M:%S %p}" # "10 May 2024 4:30:58 PM"
+    return (f'  <sms protocol="0" address="M-Money" date="{date_ms}" type="1" subject="null" '
+            f'body="{escape(body, {chr(34): "&quot;"})}" toa="null" sc_toa="null" service_center="+250788110381" '
+            f'read="1" status="-1" locked="0" date_sent="{sent}" sub_id="6" readable_date="{readable}" '
+            f'contact_name="(Unknown)" />\n')
+
+def write_backup(path, count, seed=0, backup_set=None):
+    """Stream a count-message <smses> backup to path; memory use does not depend on count"""
+    backup_set = backup_set or str(uuid.UUID(int=random.Random(seed).getrandbits(128)))
+    with open(path, "w", encoding="utf-8", newline="\n") as f:
+        f.write("<?xml version='1.0' encoding='utf-8'?>\n")
+        f.write(f'<smses count="{count}" backup_set="{backup_set}" backup_date="{int(time.time() * 1000)}" type="full">\n')
+        batch = []
+        for date_ms, body in iter_sms(count, seed):
+            batch.append(sms_element(date_ms, body))
+            if len(batch) == 10_000:
+                f.writelines(batch)
+                batch = []
+        f.writelines(batch)
+        f.write("</smses>")
+    return path
+
+if __name__ == "__main__":
+    cli = argparse.ArgumentParser(description="Write a synthetic MoMo SMS backup")
+    cli.add_argument("count", type=int)
+    cli.add_argument("-o", "--out", required=True)
+    cli.add_argument("--seed", type=int, default=0)
+    args = cli.parse_args()
+    t0 = time.perf_counter()
+    write_backup(args.out, args.count, args.seed)
+    print(f"wrote {args.count:,} messages to {args.out} in {time.perf_counter() - t0:.1f}s")
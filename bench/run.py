@@ -0,0 +1,245 @@
+# bench/run.py
+# End-to-end benchmark: parse, ETL load, dashboard export and both HTTP servers over synthetic backups.
+#   python -m bench.run --sizes 10000,100000            # compare against bench/baseline.json
+#   python -m bench.run --sizes 10000 --save-baseline   # record a new baseline
+#
+# Results are written as JSON (--out) and every throughput/latency metric is
+# compared with the baseline; anything worse by more than --tolerance is
+# reported and the exit status is 1, so a CI job can fail on slowdowns.
+# Baselines only mean something on the machine that recorded them.
+import argparse, copy, http.client, json, multiprocessing, os, platform, subprocess, sys, tempfile, threading, time
+from datetime import datetime, timezone
+from http.server import ThreadingHTTPServer
+from pathlib import Path
+
+if __package__ in (None, ""): # allow `python bench/run.py`
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from bench.generate import write_backup
+from dsa.parse_xml import parse_momo_xml
+from etl.load_db import export_dashboard_json
+from etl.run import run as run_etl
+
+BASELINE_PATH = Path(__file__).with_name("baseline.json")
+RESULTS_DIR = Path(__file__).with_name("results")
+REPEAT = 3 # runs per size; every metric keeps its best value, which is far steadier than one run
+TOLERANCE = 0.20 # a metric may be this much worse than the baseline before it counts as a regression
+NOISE_FLOOR_S = 0.02 # durations this short in both runs are timer noise, not regressions
+HTTP_MAX_MESSAGES = 1_000_000 # both servers hold or query the whole backup; bigger sizes skip the HTTP stages
+CLIENTS = 8
+REQUESTS = 200 # per client
+LIST_EVERY = 50 # stdlib server: every Nth request is a full GET /transactions, the rest are by id
+LIMIT = 50 # FastAPI server: GET /transactions?limit=
+
+def timed(fn, *args, **kwargs):
+    t0 = time.perf_counter()
+    out = fn(*args, **kwargs)
+    return out, time.perf_counter() - t0
+
+def percentile(ms, p):
+    return ms[max(int(len(ms) * p) - 1, 0)]
+
+def serve_stdlib(xml_path, ready):
+    # Own process so the load generator does not share the server's GIL
+    import api.server as server
+    from api.server_compare import QuietApp
+    server.store.load(parse_momo_xml(xml_path))
+    ThreadingHTTPServer.request_queue_size = 128
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), QuietApp)
+    ready.put(srv.server_address[1])
+    srv.serve_forever()
+
+def serve_fastapi(db_path, ready):
+    import api.app as app_module
+    from api.pool_compare import serve
+    app_module.DB_PATH = db_path # startup() runs init_db on it; never touch data/db.sqlite3
+    app_module.DASHBOARD = app_module.DashboardCache(db_path)
+    serve("pooled", str(db_path), ready)
+
+def load_test(target, args, paths, headers, clients=CLIENTS, requests=REQUESTS):
+    """Start target(*args, ready) in a process, then have clients keep-alive connections each GET requests paths"""
+    ready = multiprocessing.Queue()
+    proc = multiprocessing.Process(target=target, args=(*args, ready), daemon=True)
+    proc.start()
+    try:
+        port = ready.get(timeout=600)
+        latencies, errors = [], []
+
+        def client(offset):
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+            for n in range(requests):
+                path = paths[(offset + n) % len(paths)]
+                t0 = time.perf_counter()
+                try:
+                    conn.request("GET", path, headers=headers)
+                    resp = conn.getresponse()
+                    resp.read()
+                    if resp.status != 200:
+                        errors.append(path)
+                except (OSError, http.client.HTTPException):
+                    errors.append(path)
+                    conn.close()
+                latencies.append(time.perf_counter() - t0)
+            conn.close()
+
+        client(0) # warm-up
+        latencies.clear()
+        workers = [threading.Thread(target=client, args=(i * requests,)) for i in range(clients)]
+        t0 = time.perf_counter()
+        for w in workers:
+            w.start()
+        for w in workers:
+            w.join()
+        elapsed = time.perf_counter() - t0
+    finally:
+        proc.terminate()
+        proc.join()
+    ms = sorted(s * 1000 for s in latencies)
+    return {"requests": len(ms), "req_per_s": round(len(ms) / elapsed, 1), "p50_ms": round(percentile(ms, 0.50), 3),
+            "p99_ms": round(percentile(ms, 0.99), 3), "errors": len(errors)}
+
+def bench_size(n, workdir, http=True):
+    """One run of every stage for one backup size, in workdir"""
+    xml, db, dashboard = workdir / f"sms_{n}.xml", workdir / f"db_{n}.sqlite3", workdir / f"dashboard_{n}.json"
+    _, gen_s = timed(write_backup, xml, n)
+    out = {"messages": n, "xml_bytes": xml.stat().st_size, "generate_s": round(gen_s, 3)}
+
+    txs, parse_s = timed(parse_momo_xml, str(xml))
+    assert len(txs) == n, f"parse_momo_xml returned {len(txs)} of {n} messages"
+    del txs
+    out["parse"] = {"seconds": round(parse_s, 3), "msgs_per_s": round(n / parse_s)}
+
+    stats, etl_s = timed(run_etl, xml, db)
+    load = stats["stages"]["load"] # the writer's time inside insert_transactions, not waiting on the pipeline
+    out["etl"] = {"seconds": round(etl_s, 3), "msgs_per_s": round(n / etl_s), "loaded": stats["loaded"],
+                  "insert_s": load["busy_s"], "insert_rows_per_s": load["items_per_s"]}
+
+    _, export_s = timed(export_dashboard_json, db, dashboard)
+    out["export"] = {"seconds": round(export_s, 4)}
+
+    if http and n <= HTTP_MAX_MESSAGES:
+        from api.server_compare import AUTH
+        step = max(1, n // 997)
+        by_id = [f"/transactions/{i}" for i in range(1, n + 1, step)]
+        paths = ["/transactions" if i % LIST_EVERY == 0 else p for i, p in enumerate(by_id)]
+        out["http_stdlib"] = load_test(serve_stdlib, (str(xml),), paths, {"Authorization": AUTH})
+        out["http_fastapi"] = load_test(serve_fastapi, (db,), [f"/transactions?limit={LIMIT}"], {})
+    return out
+
+def machine():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=Path(__file__).parent).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {"python": platform.python_version(), "platform": platform.platform(), "machine": platform.machine(),
+            "cpus": os.cpu_count(), "commit": commit}
+
+def higher_is_better(metric):
+    return metric.endswith("_per_s")
+
+def best_of(runs):
+    """Merge repeated bench_size results keeping each metric's best value, as timeit's best-of-N does"""
+    merged = copy.deepcopy(runs[0])
+    for other in runs[1:]:
+        for stage, metrics in other.items():
+            if not isinstance(metrics, dict):
+                continue
+            for metric, value in metrics.items():
+                if metric.endswith(("_per_s", "seconds", "_s", "_ms")):
+                    pick = max if higher_is_better(metric) else min
+                    merged[stage][metric] = pick(merged[stage][metric], value)
+    return merged
+
+def run(sizes, http=True, workdir=None, repeat=REPEAT):
+    results = {}
+    for n in sizes:
+        runs = []
+        for _ in range(max(1, repeat)):
+            with tempfile.TemporaryDirectory(dir=workdir) as tmp:
+                runs.append(bench_size(n, Path(tmp), http=http))
+        results[str(n)] = best_of(runs)
+    return {"created": datetime.now(timezone.utc).isoformat(timespec="seconds"), "machine": machine(),
+            "repeat": max(1, repeat), "results": results}
+
+def flatten(results):
+    """{"10000/parse/msgs_per_s": value, ...} for every comparable metric"""
+    flat = {}
+    for size, stages in results.items():
+        for stage, metrics in stages.items():
+            if isinstance(metrics, dict):
+                for metric, value in metrics.items():
+                    if metric.endswith(("_per_s", "seconds", "_s", "_ms")) and isinstance(value, (int, float)):
+                        flat[f"{size}/{stage}/{metric}"] = value
+    return flat
+
+def compare(current, baseline, tolerance=TOLERANCE):
+    """
+    One entry per metric present in both runs:
+    {"metric", "baseline", "current", "change", "regression"}. change is
+    the relative change in the metric's good direction, so negative means
+    slower whatever the unit.
+    """
+    base, cur = flatten(baseline["results"]), flatten(current["results"])
+    rows = []
+    for key in sorted(base.keys() & cur.keys(), key=lambda k: (int(k.split("/")[0]), k)):
+        b, c = base[key], cur[key]
+        if not b or not c:
+            continue
+        if key.endswith(("seconds", "_s")) and not higher_is_better(key) and max(b, c) < NOISE_FLOOR_S:
+            continue
+        change = c / b - 1 if higher_is_better(key) else b / c - 1
+        rows.append({"metric": key, "baseline": b, "current": c, "change": round(change, 4),
+                     "regression": change < -tolerance})
+    return rows
+
+def print_report(current, comparison):
+    for size, stages in current["results"].items():
+        print(f"\n{int(size):,} messages ({stages['xml_bytes'] / 1e6:.1f} MB XML)")
+        for stage, metrics in stages.items():
+            if isinstance(metrics, dict):
+                print(f"  {stage:13s} " + "  ".join(f"{k} {v:,}" for k, v in metrics.items()))
+    if comparison is None:
+        return
+    print(f"\n{'metric':40s} {'baseline':>12s} {'current':>12s} {'change':>8s}")
+    for row in comparison:
+        flag = "  REGRESSION" if row["regression"] else ""
+        print(f"{row['metric']:40s} {row['baseline']:12,} {row['current']:12,} {row['change']:+8.1%}{flag}")
+
+def main(argv=None):
+    cli = argparse.ArgumentParser(description="Benchmark parse, ETL load, export and the HTTP servers")
+    cli.add_argument("--sizes", default="10000", help="comma-separated message counts, e.g. 10000,100000,1000000,10000000")
+    cli.add_argument("--out", help=f"results JSON (default: {RESULTS_DIR.name}/bench-<timestamp>.json next to this file)")
+    cli.add_argument("--baseline", default=str(BASELINE_PATH))
+    cli.add_argument("--save-baseline", action="store_true", help="write these results as the new baseline")
+    cli.add_argument("--tolerance", type=float, default=TOLERANCE)
+    cli.add_argument("--repeat", type=int, default=REPEAT, help="runs per size, best value per metric is kept")
+    cli.add_argument("--no-http", action="store_true", help="skip the HTTP server stages")
+    cli.add_argument("--workdir", help="where the synthetic backups and databases go (default: system temp)")
+    args = cli.parse_args(argv)
+
+    current = run([int(n) for n in args.sizes.split(",")], http=not args.no_http, workdir=args.workdir,
+                  repeat=args.repeat)
+    out = Path(args.out) if args.out else RESULTS_DIR / f"bench-{datetime.now():%Y%m%d-%H%M%S}.json"
+    baseline_path = Path(args.baseline)
+    baseline = json.loads(baseline_path.read_text()) if baseline_path.exists() and not args.save_baseline else None
+    comparison = compare(current, baseline, args.tolerance) if baseline else None
+    if comparison is not None:
+        current["comparison"] = {"baseline": str(baseline_path), "tolerance": args.tolerance, "metrics": comparison}
+        if baseline.get("machine", {}).get("platform") != current["machine"]["platform"]:
+            print(f"warning: baseline was recorded on {baseline.get('machine', {}).get('platform')}", file=sys.stderr)
+
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(current, indent=2) + "\n", encoding="utf-8")
+    if args.save_baseline:
+        baseline_path.write_text(json.dumps(current, indent=2) + "\n", encoding="utf-8")
+    print_report(current, comparison)
+    print(f"\nresults: {out}" + (f"\nbaseline saved: {baseline_path}" if args.save_baseline else ""))
+    regressions = [row["metric"] for row in comparison or () if row["regression"]]
+    if regressions:
+        print(f"{len(regressions)} metric(s) regressed by more than {args.tolerance:.0%}: {', '.join(regressions)}")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
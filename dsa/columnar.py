@@ -0,0 +1,184 @@
+# dsa/columnar.py
+# Column-oriented copy of the parsed transactions for analytics (needs numpy).
+import os, random, time, tracemalloc
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+
+NO_TIME = np.iinfo(np.int64).min # epoch column sentinel for a missing/unparseable timestamp
+
+class StringTable:
+    """Interns strings to dense int32 codes; None is stored as -1"""
+
+    def __init__(self, values: Iterable[str] = ()):
+        self.values: List[str] = []
+        self._codes: Dict[str, int] = {}
+        for value in values:
+            self.code(value)
+
+    def code(self, value: Optional[str]) -> int:
+        if value is None:
+            return -1
+        code = self._codes.get(value)
+        if code is None:
+            code = self._codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def encode(self, values: Iterable[Optional[str]]) -> np.ndarray:
+        return np.fromiter((self.code(v) for v in values), dtype=np.int32)
+
+    def decode(self, code: int) -> Optional[str]:
+        return self.values[code] if code >= 0 else None
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+def to_epoch(timestamps: List[Optional[str]]) -> np.ndarray:
+    """'YYYY-MM-DD HH:MM:SS' wall-clock strings -> int64 seconds, no timezone shift.
+
+    Keeping the wall clock means epoch // 86400 is the same calendar day as
+    the string, which is what daily volume groups on.
+    """
+    try:
+        parsed = np.array(timestamps, dtype="datetime64[s]")
+    except (ValueError, TypeError): # POSTed rows can carry anything; fall back per value
+        parsed = np.array([_parse_one(ts) for ts in timestamps], dtype="datetime64[s]")
+    epoch = parsed.astype(np.int64)
+    epoch[np.isnat(parsed)] = NO_TIME
+    return epoch
+
+def _parse_one(ts: Any) -> np.datetime64:
+    try:
+        return np.datetime64(ts, "s")
+    except (ValueError, TypeError):
+        return np.datetime64("NaT")
+
+class TransactionTable:
+    """Columnar transactions: one NumPy array per field instead of a dict per row.
+
+    amount is float64, timestamps are int64 epoch seconds, and type (a
+    missing one counted as "unknown"), sender and receiver are int32 codes
+    into interned StringTables. raw_text is deliberately left out.
+    """
+
+    def __init__(self, ids: np.ndarray, amount: np.ndarray, epoch: np.ndarray, type_code: np.ndarray,
+                 sender: np.ndarray, receiver: np.ndarray, types: StringTable, names: StringTable):
+        self.ids = ids
+        self.amount = amount
+        self.epoch = epoch
+        self.type_code = type_code
+        self.sender = sender
+        self.receiver = receiver
+        self.types = types
+        self.names = names # one table for senders and receivers, they overlap heavily
+
+    @classmethod
+    def from_records(cls, records: List[Dict[str, Any]]) -> "TransactionTable":
+        types = StringTable(["received", "sent", "unknown"])
+        names = StringTable()
+        return cls(
+            ids=np.fromiter((r["id"] for r in records), dtype=np.int64, count=len(records)),
+            amount=np.fromiter((r.get("amount") or 0.0 for r in records), dtype=np.float64, count=len(records)),
+            epoch=to_epoch([r.get("timestamp") for r in records]),
+            type_code=types.encode(r.get("type") or "unknown" for r in records), # int32: POSTed rows can bring any number of types
+            sender=names.encode(r.get("sender") for r in records),
+            receiver=names.encode(r.get("receiver") for r in records),
+            types=types,
+            names=names,
+        )
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def nbytes(self) -> int:
+        """Array bytes plus a rough size of the interned string tables"""
+        arrays = (self.ids, self.amount, self.epoch, self.type_code, self.sender, self.receiver)
+        strings = sum(len(v) + 49 for v in self.names.values + self.types.values) # 49 = empty str object overhead
+        return sum(a.nbytes for a in arrays) + strings
+
+    def group_by_type(self) -> Dict[str, Dict[str, float]]:
+        """{type: {"count": n, "volume": sum(amount)}}"""
+        n = len(self.types)
+        counts = np.bincount(self.type_code, minlength=n)
+        volumes = np.bincount(self.type_code, weights=self.amount, minlength=n)
+        return {self.types.values[i]: {"count": int(counts[i]), "volume": float(volumes[i])}
+                for i in range(n) if counts[i]}
+
+    def totals(self) -> Dict[str, float]:
+        """Overall count/volume plus the received/sent/net figures parse_xml prints"""
+        by_type = self.group_by_type()
+        received = by_type.get("received", {}).get("volume", 0.0)
+        sent = by_type.get("sent", {}).get("volume", 0.0)
+        return {"count": len(self), "volume": float(self.amount.sum()),
+                "received": received, "sent": sent, "net": received - sent}
+
+    def daily_volume(self) -> List[Dict[str, Any]]:
+        """[{"date": "YYYY-MM-DD", "count": n, "volume": v}] in date order, rows without a timestamp skipped"""
+        has_time = self.epoch != NO_TIME
+        days = self.epoch[has_time] // 86400
+        if not len(days):
+            return []
+        first = days.min()
+        offset = days - first # dense day buckets: bincount instead of a sort-based unique
+        counts = np.bincount(offset)
+        volumes = np.bincount(offset, weights=self.amount[has_time])
+        present = np.flatnonzero(counts)
+        dates = (present + first).astype("datetime64[D]").astype(str)
+        return [{"date": d, "count": int(c), "volume": float(v)} for d, c, v in zip(dates, counts[present], volumes[present])]
+
+# Reference implementations over the list of dicts, for the benchmark below
+def dict_group_by_type(records):
+    out: Dict[str, Dict[str, float]] = {}
+    for r in records:
+        g = out.setdefault(r["type"], {"count": 0, "volume": 0.0})
+        g["count"] += 1
+        g["volume"] += r["amount"]
+    return out
+
+def dict_daily_volume(records):
+    out: Dict[str, float] = {}
+    for r in records:
+        if r["timestamp"]:
+            day = r["timestamp"][:10]
+            out[day] = out.get(day, 0.0) + r["amount"]
+    return sorted(out.items())
+
+def fake_records(n, seed=8):
+    rng = random.Random(seed)
+    names = [f"Name {i}" for i in range(2000)]
+    return [{"id": i, "type": rng.choice(("received", "sent", "sent", "unknown")), "amount": float(rng.randint(100, 50000)),
+             "currency": "RWF", "sender": rng.choice(names), "receiver": rng.choice(names),
+             "timestamp": f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d} {rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}:00",
+             "transaction_id": str(70000000000 + i),
+             "raw_text": f"TxId: {70000000000 + i}. Your payment of {i} RWF to Name {i % 2000} has been completed."}
+            for i in range(1, n + 1)]
+
+def timed(fn, *args, rounds=5):
+    t0 = time.perf_counter()
+    for _ in range(rounds):
+        fn(*args)
+    return (time.perf_counter() - t0) / rounds * 1000
+
+if __name__ == "__main__":
+    n = int(os.environ.get("ROWS", "1000000"))
+
+    tracemalloc.start()
+    records = fake_records(n)
+    dict_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    t0 = time.perf_counter()
+    table = TransactionTable.from_records(records)
+    build_ms = (time.perf_counter() - t0) * 1000
+
+    print(f"{n:,} transactions")
+    print(f"list of dicts:     {dict_bytes / 1e6:8.1f} MB ({dict_bytes / n:.0f} B/row, incl. raw_text)")
+    print(f"TransactionTable:  {table.nbytes / 1e6:8.1f} MB ({table.nbytes / n:.0f} B/row), built in {build_ms:.0f} ms")
+    print()
+    received = lambda rs: sum(t["amount"] for t in rs if t["type"] == "received")
+    print(f"{'aggregate':18s} {'dict-list':>10s} {'columnar':>10s}")
+    print(f"{'received total':18s} {timed(received, records):8.1f}ms {timed(table.totals):8.1f}ms")
+    print(f"{'group by type':18s} {timed(dict_group_by_type, records):8.1f}ms {timed(table.group_by_type):8.1f}ms")
+    print(f"{'daily volume':18s} {timed(dict_daily_volume, records):8.1f}ms {timed(table.daily_volume):8.1f}ms")
@@ -0,0 +1,51 @@
+# dsa/extract_compare.py
+import os, time # stdlib only
+import xml.etree.ElementTree as ET
+
+from dsa.parse_xml import (
+    EXTRACTOR,
+    extract_amount,
+    extract_receiver,
+    extract_sender,
+    extract_transaction_id,
+    extract_transaction_type,
+)
+
+def extract_per_field(body): # the original path: one re.search (or two) per field
+    return {
+        "type": extract_transaction_type(body),
+        "amount": extract_amount(body),
+        "sender": extract_sender(body),
+        "receiver": extract_receiver(body),
+        "transaction_id": extract_transaction_id(body),
+    }
+
+def load_bodies(xml_path):
+    return [sms.get("body", "") for sms in ET.parse(xml_path).getroot().findall("sms")]
+
+def check_parity(bodies):
+    """Return the bodies where the extractor disagrees with the per-field functions"""
+    return [b for b in bodies if EXTRACTOR.extract(b) != extract_per_field(b)]
+
+def messages_per_sec(fn, bodies, rounds):
+    t0 = time.perf_counter()
+    for _ in range(rounds):
+        for body in bodies:
+            fn(body)
+    return (len(bodies) * rounds) / (time.perf_counter() - t0)
+
+if __name__ == "__main__":
+    xml_path = os.environ.get("MOMO_XML", "data/raw/modified_sms_v2.xml")
+    rounds = int(os.environ.get("ROUNDS", "20"))
+    bodies = load_bodies(xml_path)
+
+    mismatches = check_parity(bodies)
+    print(f"Parity: {len(bodies) - len(mismatches)}/{len(bodies)} bodies identical")
+    if mismatches:
+        print(f"First mismatch: {mismatches[0]!r}")
+        exit(1)
+
+    old = messages_per_sec(extract_per_field, bodies, rounds)
+    new = messages_per_sec(EXTRACTOR.extract, bodies, rounds)
+    print(f"Per-field regex functions: {old:,.0f} messages/sec")
+    print(f"TransactionExtractor:      {new:,.0f} messages/sec ({new / old:.1f}x)")
@@ -0,0 +1,79 @@
+# dsa/parse_cache.py
+import hashlib, os, pickle # stdlib only
+
+from dsa.parse_xml import parse_momo_xml, parse_momo_xml_lazy
+
+CACHE_DIR = os.environ.get("MOMO_CACHE_DIR", "data/cache")
+CACHE_VERSION = 2 # bump whenever the transaction dict shape changes
+
+def file_fingerprint(xml_path):
+    """Cheap identity of the source file: absolute path, size and mtime"""
+    st = os.stat(xml_path)
+    return {"path": os.path.abspath(xml_path), "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+def file_sha256(xml_path, block_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(xml_path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def cache_path_for(xml_path, cache_dir=CACHE_DIR, variant=""):
+    name = hashlib.sha1(os.path.abspath(xml_path).encode("utf-8")).hexdigest()[:16]
+    return os.path.join(cache_dir, f"{name}{variant}.pickle")
+
+def read_cache(cache_path):
+    """Return (key, transactions) from a cache file, or (None, None) if unreadable"""
+    try:
+        with open(cache_path, "rb") as f:
+            key = pickle.load(f) # small header first so a stale cache is rejected without loading rows
+            if key.get("version") != CACHE_VERSION:
+                return key, None
+            return key, pickle.load(f)
+    except Exception: # corrupt, truncated or from older code: any failure just means re-parse
+        return None, None
+
+def write_cache(cache_path, key, transactions):
+    os.makedirs(os.path.dirname(cache_path) or ".", exist_ok=True)
+    tmp = f"{cache_path}.tmp"
+    with open(tmp, "wb") as f:
+        pickle.dump(key, f, protocol=pickle.HIGHEST_PROTOCOL)
+        pickle.dump(transactions, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, cache_path) # atomic swap, readers never see a half-written file
+
+def load_transactions(xml_path, cache_dir=CACHE_DIR, workers=1):
+    """Load parsed transactions for xml_path, re-parsing only when the XML changed.
+
+    Returns (transactions, hit). A matching path/size/mtime is trusted as-is;
+    if only the mtime moved (copy, touch, redeploy) the content hash decides.
+    """
+    return _load_cached(xml_path, cache_path_for(xml_path, cache_dir), lambda: parse_momo_xml(xml_path, workers=workers))
+
+def load_transactions_lazy(xml_path, cache_dir=CACHE_DIR):
+    """load_transactions without raw_text: returns (transactions, RawTextIndex, hit).
+
+    The cache holds only the rows and the body spans, so a hit reads no
+    message text at all.
+    """
+    (transactions, raw_texts), hit = _load_cached(xml_path, cache_path_for(xml_path, cache_dir, "-lazy"),
+                                                  lambda: parse_momo_xml_lazy(xml_path), empty=lambda p: not p[0])
+    if hit:
+        raw_texts.restamp() # a hit means same stat or same sha256, so the spans still fit the file
+    return transactions, raw_texts, hit
+
+def _load_cached(xml_path, cache_path, parse, empty=lambda payload: not payload):
+    fingerprint = file_fingerprint(xml_path)
+    key, payload = read_cache(cache_path)
+
+    if payload is not None and all(key.get(k) == v for k, v in fingerprint.items()):
+        return payload, True
+
+    new_key = {**fingerprint, "sha256": file_sha256(xml_path), "version": CACHE_VERSION}
+    if payload is not None and key.get("path") == new_key["path"] and key.get("sha256") == new_key["sha256"]:
+        write_cache(cache_path, new_key, payload) # refresh the stat fields for next boot
+        return payload, True
+
+    payload = parse()
+    if not empty(payload): # a failed parse returns nothing; don't cache that
+        write_cache(cache_path, new_key, payload)
+    return payload, False
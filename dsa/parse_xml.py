@@ -1,11 +1,24 @@
 import xml.etree.ElementTree as ET
+import mmap
 import re
 import json
 import os
+import argparse
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
+from xml.parsers import expat
 
-def parse_momo_xml(xml_path):
-    """Parse MoMo SMS XML and extract transaction data"""
+from dsa.raw_text import RawTextIndex
+
+CHUNK_SIZE = 5000 # <sms> records handed to a worker process at a time
+
+def parse_momo_xml(xml_path, workers=1):
+    """Parse MoMo SMS XML and extract transaction data.
+
+    workers > 1 fans field extraction out over that many processes
+    (0 means one per CPU); output order and ids are the same either way.
+    """
     try:
         # Check if file exists
         if not os.path.exists(xml_path):
@@ -16,34 +29,8 @@ def parse_momo_xml(xml_path):
         
         print(f"Parsing XML from: {xml_path}")
         
-        # Parse XML
-        tree = ET.parse(xml_path)
-        root = tree.getroot()
-        
-        print(f"Root element: {root.tag}")
-        print(f"Total SMS count: {root.get('count', 'unknown')}")
-        
-        transactions = []
-        sms_elements = root.findall('sms')
-        print(f"Found {len(sms_elements)} SMS elements")
-        
-        for idx, sms in enumerate(sms_elements, start=1):
-            body = sms.get('body', '')
-            date = sms.get('date', '')
-            
-            transaction = {
-                "id": idx,
-                "type": extract_transaction_type(body),
-                "amount": extract_amount(body),
-                "currency": "RWF",
-                "sender": extract_sender(body),
-                "receiver": extract_receiver(body),
-                "timestamp": convert_timestamp(date),
-                "transaction_id": extract_transaction_id(body),
-                "raw_text": body
-            }
-            
-            transactions.append(transaction)
+        # Thin wrapper: drain the streaming parser into a list
+        transactions = list(iter_momo_xml(xml_path, workers=workers))
         
         print(f"Successfully parsed {len(transactions)} transactions")
         return transactions
@@ -57,6 +44,217 @@ def parse_momo_xml(xml_path):
         traceback.print_exc()
         return []
 
+def iter_momo_xml(xml_path, workers=1, chunk_size=CHUNK_SIZE, min_date_ms=None):
+    """Stream MoMo SMS XML and yield one transaction dict per <sms> element.
+
+    Uses incremental parsing and clears every processed element, so memory
+    stays constant no matter how large the backup is. With workers > 1 the
+    records are extracted in chunks on a process pool and yielded back in
+    document order. min_date_ms skips older messages before extraction;
+    ids still count every <sms> so they match a full parse.
+    """
+    if workers == 0:
+        workers = os.cpu_count() or 1
+    if workers > 1:
+        yield from _iter_parallel(xml_path, workers, chunk_size, min_date_ms)
+        return
+    for idx, body, date, _ in iter_sms_records(xml_path, min_date_ms):
+        yield build_transaction(idx, body, date)
+
+def iter_sms_records(xml_path, min_date_ms=None):
+    """Yield (idx, body, date, address) for every <sms> element, idx counting from 1.
+
+    With min_date_ms, elements whose date attribute is older are skipped
+    with a single int compare (unparseable dates are kept).
+    """
+    context = ET.iterparse(xml_path, events=("start", "end"))
+    _, root = next(context) # first event is the <smses> root opening tag
+    
+    idx = 0
+    for event, elem in context:
+        if event != "end" or elem.tag != "sms":
+            continue
+        idx += 1
+        date = elem.get('date', '')
+        if min_date_ms is None or not date.isdigit() or int(date) >= min_date_ms:
+            yield idx, elem.get('body', ''), date, elem.get('address')
+        root.clear() # drop processed <sms> elements so the tree never grows
+
+SPAN_READ_SIZE = 1 << 20 # bytes handed to expat at a time by iter_sms_spans
+_TAG_NAME = re.compile(rb"<[^\s/>]+")
+_ATTR = re.compile(rb"""\s+([^\s=/>]+)\s*=\s*(?:"([^"]*)"|'([^']*)')""") # one name="value" pair, matched in place
+
+def _attr_span(buf, tag_start, wanted):
+    """(start, end) of attribute wanted's raw value in the start tag at tag_start, walking the attributes
+    one by one so text inside another attribute's value is never taken for it"""
+    pos = _TAG_NAME.match(buf, tag_start).end()
+    while True:
+        match = _ATTR.match(buf, pos)
+        if match is None:
+            return None
+        if match.group(1) == wanted:
+            return match.span(2) if match.group(2) is not None else match.span(3)
+        pos = match.end()
+
+def iter_sms_spans(xml_path):
+    """Yield (idx, body, date, offset, length) for every <sms> element, idx counting from 1.
+
+    offset/length locate the raw (still escaped) body attribute value in the
+    file's bytes, for RawTextIndex. Uses expat directly because it reports
+    the byte position of each start tag, which iterparse does not.
+    """
+    with open(xml_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        parser = expat.ParserCreate()
+        found = []
+        state = {"idx": 0}
+
+        def start(name, attrs):
+            if name != "sms":
+                return
+            state["idx"] += 1
+            body = attrs.get("body")
+            if body is None:
+                found.append((state["idx"], "", attrs.get("date", ""), -1, 0))
+                return
+            start_byte, end_byte = _attr_span(mm, parser.CurrentByteIndex, b"body")
+            found.append((state["idx"], body, attrs.get("date", ""), start_byte, end_byte - start_byte))
+
+        parser.StartElementHandler = start
+        for pos in range(0, len(mm), SPAN_READ_SIZE):
+            parser.Parse(mm[pos:pos + SPAN_READ_SIZE], False)
+            yield from found
+            found.clear()
+        parser.Parse(b"", True)
+        yield from found
+
+def parse_momo_xml_lazy(xml_path):
+    """parse_momo_xml without raw_text in the rows.
+
+    Returns (transactions, RawTextIndex); index.get(tx["id"]) decodes a
+    body from the file when it is actually needed.
+    """
+    index = RawTextIndex(xml_path)
+    transactions = []
+    shared = {} # names and amounts repeat across messages: keep one object per value
+    for idx, body, date, offset, length in iter_sms_spans(xml_path):
+        tx = build_transaction(idx, body, date)
+        del tx["raw_text"]
+        for field in ("amount", "sender", "receiver"):
+            value = tx[field]
+            if value is not None:
+                tx[field] = shared.setdefault((field, value), value)
+        transactions.append(tx)
+        if offset >= 0:
+            index.add(idx, offset, length)
+    return transactions, index
+
+def read_backup_info(xml_path):
+    """Attributes of the <smses> root (count, backup_set, backup_date, type) without reading the rest"""
+    for _, root in ET.iterparse(xml_path, events=("start",)):
+        return dict(root.attrib)
+    return {}
+
+def _iter_parallel(xml_path, workers, chunk_size, min_date_ms=None):
+    # Keep at most 2 chunks per worker in flight so memory stays bounded,
+    # and collect futures FIFO so ids and ordering match the serial path
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        chunk = []
+        for idx, body, date, _ in iter_sms_records(xml_path, min_date_ms):
+            chunk.append((idx, body, date))
+            if len(chunk) < chunk_size:
+                continue
+            pending.append(pool.submit(_extract_chunk, chunk))
+            chunk = []
+            if len(pending) >= workers * 2:
+                yield from pending.popleft().result()
+        if chunk:
+            pending.append(pool.submit(_extract_chunk, chunk))
+        while pending:
+            yield from pending.popleft().result()
+
+def _extract_chunk(records):
+    """Worker entry point: build transactions for one chunk of (idx, body, date)"""
+    return [build_transaction(idx, body, date) for idx, body, date in records]
+
+def build_transaction(idx, body, date):
+    """Build the transaction dict for one SMS body/date pair"""
+    fields = EXTRACTOR.extract(body)
+    return {
+        "id": idx,
+        "type": fields["type"],
+        "amount": fields["amount"],
+        "currency": "RWF",
+        "sender": fields["sender"],
+        "receiver": fields["receiver"],
+        "timestamp": convert_timestamp(date),
+        "transaction_id": fields["transaction_id"],
+        "raw_text": body
+    }
+
+class TransactionExtractor:
+    """Pull every field out of an SMS body in one pass.
+
+    The patterns are the same ones the extract_* functions below use, but
+    compiled once. The body is lowercased a single time and that copy is
+    used both for the type check and to skip any pattern whose literal
+    keyword is not in the message, so a typical SMS runs 2-3 regexes
+    instead of 7.
+    """
+
+    def __init__(self):
+        flags = re.IGNORECASE
+        self.amount_received = re.compile(r'received\s+([\d,]+(?:\.\d+)?)\s*RWF', flags)
+        self.amount_payment = re.compile(r'payment of\s+([\d,]+(?:\.\d+)?)\s*RWF', flags)
+        self.sender = re.compile(r'from\s+([^(]+)\s*\(', flags)
+        self.receiver = re.compile(r'to\s+([A-Za-z\s]+)\s+\d', flags)
+        self.txid = re.compile(r'TxId:\s*(\d+)', flags)
+        self.financial_txid = re.compile(r'Financial Transaction Id:\s*(\d+)', flags)
+
+    def extract(self, body):
+        """Return type, amount, sender, receiver and transaction_id for a body"""
+        body_lower = body.lower()
+        # IGNORECASE folds a few non-ASCII letters (e.g. U+017F) onto ASCII
+        # ones, so the keyword gates are only exact for ASCII bodies
+        gated = body.isascii()
+
+        if 'received' in body_lower:
+            tx_type = 'received'
+        elif 'payment' in body_lower or 'paid' in body_lower:
+            tx_type = 'sent'
+        else:
+            tx_type = 'unknown'
+
+        match = None
+        if not gated or 'received' in body_lower:
+            match = self.amount_received.search(body)
+        if match is None and (not gated or 'payment of' in body_lower):
+            match = self.amount_payment.search(body)
+        amount = float(match.group(1).replace(',', '')) if match else 0.0
+
+        match = self.sender.search(body) if not gated or 'from' in body_lower else None
+        sender = match.group(1).strip() if match else None
+
+        match = self.receiver.search(body) if not gated or 'to' in body_lower else None
+        receiver = match.group(1).strip() if match else None
+
+        match = None
+        if not gated or 'txid' in body_lower:
+            match = self.txid.search(body)
+        if match is None and (not gated or 'financial transaction id' in body_lower):
+            match = self.financial_txid.search(body)
+        transaction_id = match.group(1) if match else None
+
+        return {
+            "type": tx_type,
+            "amount": amount,
+            "sender": sender,
+            "receiver": receiver,
+            "transaction_id": transaction_id,
+        }
+
+EXTRACTOR = TransactionExtractor() # shared instance, patterns compiled at import
+
 def extract_transaction_type(body):
     """Determine if it's a received payment or sent payment"""
     body_lower = body.lower()
@@ -131,11 +329,15 @@ if __name__ == "__main__":
     print("MoMo XML Parser")
     print("=" * 50)
     
-    # Get XML path
-    xml_path = os.environ.get("MOMO_XML", "data/raw/modified_sms_v2.xml")
+    # Get XML path and worker count
+    cli = argparse.ArgumentParser(description="Parse a MoMo SMS backup into examples/json_schemas.json")
+    cli.add_argument("--xml", default=os.environ.get("MOMO_XML", "data/raw/modified_sms_v2.xml"))
+    cli.add_argument("--workers", type=int, default=1, help="extraction processes (0 = one per CPU)")
+    args = cli.parse_args()
+    xml_path = args.xml
     
     # Parse the XML
-    data = parse_momo_xml(xml_path)
+    data = parse_momo_xml(xml_path, workers=args.workers)
     
     # Check if parsing was successful
     if not data:
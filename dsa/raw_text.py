@@ -0,0 +1,110 @@
+# dsa/raw_text.py
+import mmap, os, re, threading # stdlib only
+from array import array
+from typing import Optional
+
+_ENTITY = re.compile(r"&(#x[0-9a-fA-F]+|#[0-9]+|lt|gt|amp|quot|apos);")
+_NAMED = {"lt": "<", "gt": ">", "amp": "&", "quot": '"', "apos": "'"}
+_ATTR_WS = str.maketrans({"\t": " ", "\n": " "})
+
+def _entity(match: "re.Match[str]") -> str:
+    name = match.group(1)
+    if name[0] != "#":
+        return _NAMED[name]
+    return chr(int(name[2:], 16) if name[1] in "xX" else int(name[1:]))
+
+def unescape_attr(raw: str) -> str:
+    """An XML attribute value as a parser reports it: line ends and tabs become spaces, then entities expand"""
+    if "\r" in raw:
+        raw = raw.replace("\r\n", "\n").replace("\r", "\n")
+    raw = raw.translate(_ATTR_WS)
+    return _ENTITY.sub(_entity, raw) if "&" in raw else raw
+
+class RawTextIndex:
+    """SMS bodies kept as (offset, length) byte spans into the source XML instead of strings.
+
+    Two int64 array slots per message (16 bytes) replace a few hundred
+    bytes of str, and loading a cached index copies no message text at
+    all. get() slices the memory-mapped file and decodes/unescapes that one
+    body. Spans are indexed by transaction id (the parser's 1-based <sms>
+    number), so lookups are O(1).
+
+    The file must not change under the index: open() refuses a file whose
+    size or mtime differs from the one that was indexed.
+    """
+
+    def __init__(self, xml_path: str):
+        self.xml_path = os.path.abspath(xml_path)
+        st = os.stat(xml_path)
+        self.size, self.mtime_ns = st.st_size, st.st_mtime_ns
+        self._offsets = array("q")
+        self._lengths = array("q")
+        self._mm: Optional[mmap.mmap] = None
+        self._lock = threading.Lock()
+
+    def add(self, tx_id: int, offset: int, length: int) -> None:
+        missing = tx_id - 1 - len(self._offsets)
+        if missing < 0:
+            raise ValueError(f"id {tx_id} is not greater than every indexed id")
+        self._offsets.extend([-1] * (missing + 1))
+        self._lengths.extend([0] * (missing + 1))
+        self._offsets[tx_id - 1] = offset
+        self._lengths[tx_id - 1] = length
+
+    def __len__(self) -> int:
+        return sum(1 for offset in self._offsets if offset >= 0)
+
+    def __contains__(self, tx_id: int) -> bool:
+        return 0 < tx_id <= len(self._offsets) and self._offsets[tx_id - 1] >= 0
+
+    def span(self, tx_id: int) -> Optional[tuple]:
+        if tx_id not in self:
+            return None
+        return self._offsets[tx_id - 1], self._lengths[tx_id - 1]
+
+    def nbytes(self) -> int:
+        return (len(self._offsets) + len(self._lengths)) * self._offsets.itemsize
+
+    def open(self) -> mmap.mmap:
+        with self._lock:
+            if self._mm is None:
+                with open(self.xml_path, "rb") as f:
+                    st = os.fstat(f.fileno())
+                    if (st.st_size, st.st_mtime_ns) != (self.size, self.mtime_ns):
+                        raise RuntimeError(f"{self.xml_path} changed since it was indexed "
+                                           f"({self.size} -> {st.st_size} bytes, mtime {self.mtime_ns} -> {st.st_mtime_ns})")
+                    self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) # the map outlives the fd
+            return self._mm
+
+    def restamp(self) -> None:
+        """Accept the file's current size/mtime: for callers that verified its content is unchanged (same sha256)"""
+        st = os.stat(self.xml_path)
+        with self._lock:
+            self.size, self.mtime_ns = st.st_size, st.st_mtime_ns
+
+    def get(self, tx_id: int) -> Optional[str]:
+        """The body of message tx_id exactly as ElementTree would return it, or None"""
+        span = self.span(tx_id)
+        if span is None:
+            return None
+        offset, length = span
+        return unescape_attr(self.open()[offset:offset + length].decode("utf-8"))
+
+    def close(self) -> None:
+        with self._lock:
+            if self._mm is not None:
+                self._mm.close()
+                self._mm = None
+
+    # Pickled by the parse cache: spans and identity only, the map is reopened on first get()
+    def __getstate__(self):
+        return {"xml_path": self.xml_path, "size": self.size, "mtime_ns": self.mtime_ns,
+                "offsets": self._offsets.tobytes(), "lengths": self._lengths.tobytes()}
+
+    def __setstate__(self, state):
+        self.xml_path, self.size, self.mtime_ns = state["xml_path"], state["size"], state["mtime_ns"]
+        self._offsets, self._lengths = array("q"), array("q")
+        self._offsets.frombytes(state["offsets"])
+        self._lengths.frombytes(state["lengths"])
+        self._mm = None
+        self._lock = threading.Lock()
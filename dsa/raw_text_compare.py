@@ -0,0 +1,46 @@
+# dsa/raw_text_compare.py
+# Memory and boot time of the api/server.py store: raw_text strings (old) vs RawTextIndex spans into the mmapped XML.
+import gc, os, random, tempfile, time, tracemalloc
+
+from bench.generate import write_backup
+from dsa.parse_cache import load_transactions, load_transactions_lazy
+from dsa.transaction_store import TransactionStore
+
+def measure(load):
+    """(store, retained bytes, seconds) for building a TransactionStore from load()"""
+    gc.collect()
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    store, extra = load()
+    seconds = time.perf_counter() - t0
+    gc.collect()
+    retained = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return store, extra, retained, seconds
+
+if __name__ == "__main__":
+    n = int(os.environ.get("ROWS", "100000"))
+    tmp = tempfile.mkdtemp()
+    xml = str(write_backup(os.path.join(tmp, "sms.xml"), n))
+    cache = os.path.join(tmp, "cache")
+    load_transactions(xml, cache_dir=cache) # warm both caches, the numbers below are cache-hit boots
+    load_transactions_lazy(xml, cache_dir=cache)
+
+    def eager():
+        rows, _ = load_transactions(xml, cache_dir=cache)
+        return TransactionStore(rows), None
+
+    def lazy():
+        rows, index, _ = load_transactions_lazy(xml, cache_dir=cache)
+        return TransactionStore(rows), index
+
+    print(f"{n:,} messages, {os.path.getsize(xml) / 1e6:.1f} MB XML, boot from the parse cache")
+    for label, load in [("raw_text strings (old)", eager), ("RawTextIndex", lazy)]:
+        store, index, retained, seconds = measure(load)
+        print(f"{label:24s} {retained / 1e6:8.1f} MB retained {retained / n:6.0f} B/row  boot {seconds * 1000:7.1f} ms")
+        ids = random.Random(1).sample(range(1, n + 1), 10_000)
+        t0 = time.perf_counter()
+        for tx_id in ids:
+            text = index.get(tx_id) if index is not None else store.get(tx_id)["raw_text"]
+        print(f"{'':24s} raw_text lookup {(time.perf_counter() - t0) / len(ids) * 1e6:.2f} us")
+        del store, index
@@ -1,5 +1,7 @@
 # dsa/search_compare.py
-import time, random, json # stdlib only
+import time, random, json, os # stdlib only
+
+from dsa.transaction_store import TransactionStore
 
 def linear_find(records, target_id): 
     for rec in records: 
@@ -10,6 +12,81 @@ def linear_find(records, target_id):
 def dict_find(index, target_id): # index is a dict mapping id -> record
     return index.get(target_id) # O(1) expected-time lookup 
 
+class ListDictStore: # the original api/server.py layout: list for ordering + dict for lookups
+    def __init__(self, rows):
+        self.rows = list(rows)
+        self.index = {r["id"]: r for r in self.rows}
+        self.next_id = len(self.rows) + 1
+
+    def get(self, tx_id):
+        return self.index.get(tx_id)
+
+    def insert(self, fields):
+        row = {"id": self.next_id, **fields}
+        self.rows.append(row)
+        self.index[row["id"]] = row
+        self.next_id += 1
+        return row
+
+    def update(self, tx_id, patch):
+        row = self.index.get(tx_id)
+        if row:
+            row.update(patch)
+        return row
+
+    def delete(self, tx_id):
+        row = self.index.pop(tx_id, None)
+        if row:
+            for i, r in enumerate(self.rows): # O(n) scan + shift, as in do_DELETE
+                if r["id"] == tx_id:
+                    self.rows.pop(i)
+                    break
+        return row
+
+def make_rows(n):
+    return [{"id": i, "type": ("received", "sent")[i % 2], "amount": float(i), "currency": "RWF",
+             "sender": f"Sender {i % 1000}", "receiver": f"Receiver {i % 5000}", "transaction_id": str(70000000 + i),
+             "timestamp": f"2025-{i % 12 + 1:02d}-{i % 28 + 1:02d} {i % 24:02d}:00:00", "raw_text": ""} for i in range(1, n + 1)]
+
+def scan_query(rows, sender=None, ts_from=None, ts_to=None): # what a client has to do today: filter everything
+    return [r["id"] for r in rows
+            if (sender is None or r["sender"] == sender)
+            and (ts_from is None or r["timestamp"] >= ts_from)
+            and (ts_to is None or r["timestamp"][:len(ts_to)] <= ts_to)]
+
+def crud_ops(n, count, seed=8):
+    """Mixed workload: 50% get, 20% insert, 15% update, 15% delete of random live ids"""
+    rng = random.Random(seed)
+    live, next_id, ops = list(range(1, n + 1)), n + 1, []
+    for _ in range(count):
+        roll = rng.random()
+        if roll < 0.5:
+            ops.append(("get", rng.choice(live)))
+        elif roll < 0.7:
+            ops.append(("insert", next_id))
+            live.append(next_id)
+            next_id += 1
+        elif roll < 0.85:
+            ops.append(("update", rng.choice(live)))
+        else:
+            i = rng.randrange(len(live))
+            live[i], live[-1] = live[-1], live[i]
+            ops.append(("delete", live.pop()))
+    return ops
+
+def run_crud(store, ops):
+    t0 = time.perf_counter()
+    for op, tx_id in ops:
+        if op == "get":
+            store.get(tx_id)
+        elif op == "insert":
+            store.insert({"type": "sent", "amount": 1.0})
+        elif op == "update":
+            store.update(tx_id, {"amount": 2.0})
+        else:
+            store.delete(tx_id)
+    return time.perf_counter() - t0
+
 if __name__ == "__main__":
     # Load what parse_xml produced (or fabricate ~20 if file missing)
     try:
@@ -35,4 +112,42 @@ if __name__ == "__main__":
     print(f"Dict lookup took:   {(t2 - t1)*1000:.3f} ms for {len(random_ids)} lookups")
     print("Dict is faster on average because it uses hash table O(1) expected-time lookups,\n"
           "while linear scan is O(n) and scales poorly as records grow.")
-    
\ No newline at end of file
+
+    # Mixed CRUD workload: list+dict (old server) vs TransactionStore
+    sizes = [int(x) for x in os.environ.get("SIZES", "10000,100000,1000000").split(",")]
+    op_count = int(os.environ.get("OPS", "2000"))
+    print(f"\nMixed CRUD, {op_count} ops (50% get / 20% insert / 15% update / 15% delete)")
+    for n in sizes:
+        ops = crud_ops(n, op_count)
+        rows = make_rows(n)
+        old = run_crud(ListDictStore(rows), ops)
+        rows = make_rows(n)
+        new = run_crud(TransactionStore(rows), ops)
+        print(f"n={n:>9,}  list+dict {op_count / old:>12,.0f} ops/s   TransactionStore {op_count / new:>12,.0f} ops/s")
+
+    # Secondary indexes: filtered queries at the largest size
+    n = sizes[-1]
+    rows = make_rows(n)
+    store = TransactionStore(rows)
+    queries = [
+        ("sender=Sender 7", {"sender": "Sender 7"}, None, None),
+        ("transaction_id", {"transaction_id": str(70000000 + n // 2)}, None, None),
+        ("1-day timestamp range", {}, "2025-03-03", "2025-03-03"),
+        ("sender + range", {"sender": "Sender 7"}, "2025-01-01", "2025-06-30"),
+    ]
+    print(f"\nFiltered queries at n={n:,} (mean of 20 runs)")
+    for label, filters, ts_from, ts_to in queries:
+        sender = filters.get("sender")
+        t0 = time.perf_counter()
+        for _ in range(20):
+            if "transaction_id" in filters:
+                expected = [r["id"] for r in rows if r["transaction_id"] == filters["transaction_id"]]
+            else:
+                expected = scan_query(rows, sender, ts_from, ts_to)
+        t1 = time.perf_counter()
+        for _ in range(20):
+            got = store.find_ids(filters, ts_from, ts_to)
+        t2 = time.perf_counter()
+        assert got == expected, label
+        print(f"{label:24s} full scan {(t1 - t0) / 20 * 1000:9.2f} ms   indexed {(t2 - t1) / 20 * 1000:8.3f} ms   ({len(got)} rows)")
+
@@ -0,0 +1,227 @@
+# dsa/transaction_store.py
+import bisect, itertools, threading # stdlib only
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+class TransactionStore:
+    """Insertion-ordered id -> transaction store with O(1) get/insert/update/delete.
+
+    Rows live in a slot list in insertion (= ascending id) order. Deleting a
+    row leaves a None tombstone instead of shifting the list, and the slots
+    are compacted once tombstones outnumber live rows, so delete is O(1)
+    amortized. A parallel id list keeps ids of tombstones too, which lets
+    cursor pagination bisect straight to "first row after id N".
+
+    Rows are never mutated in place: update() swaps in a patched copy, so a
+    reader that grabbed a row can encode it without holding the lock.
+
+    Secondary indexes are kept in sync by every write: a hash map per
+    INDEXED_FIELDS value (value -> insertion-ordered set of ids) and a
+    sorted (timestamp, id) list for range lookups via bisect. Removing an
+    entry from the middle of the sorted list would cost O(n), so deletes and
+    timestamp updates leave it stale instead; readers skip entries that no
+    longer match their row, and the list is rebuilt once half of it is stale.
+    """
+
+    INDEXED_FIELDS = ("type", "sender", "receiver", "transaction_id")
+
+    def __init__(self, rows: Iterable[Dict[str, Any]] = ()):
+        self.lock = threading.RLock()
+        self.load(rows)
+
+    def load(self, rows: Iterable[Dict[str, Any]]) -> None:
+        """Replace the contents with rows (which must be in ascending id order)"""
+        with self.lock:
+            self._slots: List[Optional[Dict[str, Any]]] = []
+            self._ids: List[int] = []
+            self._pos: Dict[int, int] = {} # id -> slot
+            self._dead = 0
+            self.next_id = 1
+            self._by_field: Dict[str, Dict[Any, Dict[int, None]]] = {f: {} for f in self.INDEXED_FIELDS}
+            self._by_time: List[Tuple[str, int]] = []
+            self._stale_time = 0
+            for row in rows:
+                self._append(row)
+                self._index(row, self.INDEXED_FIELDS)
+            self._rebuild_time_index()
+
+    def _append(self, row: Dict[str, Any]) -> None:
+        tx_id = int(row["id"])
+        if tx_id < self.next_id:
+            raise ValueError(f"id {tx_id} is not greater than every stored id")
+        self._pos[tx_id] = len(self._slots)
+        self._slots.append(row)
+        self._ids.append(tx_id)
+        self.next_id = tx_id + 1
+
+    def _index(self, row: Dict[str, Any], fields: Iterable[str]) -> None:
+        tx_id = row["id"]
+        for field in fields:
+            value = row.get(field)
+            if isinstance(value, (str, int, float)): # None and unhashable POSTed values are not indexed
+                self._by_field[field].setdefault(value, {})[tx_id] = None
+
+    def _unindex(self, row: Dict[str, Any], fields: Iterable[str]) -> None:
+        tx_id = row["id"]
+        for field in fields:
+            value = row.get(field)
+            index = self._by_field[field]
+            ids = index.get(value) if isinstance(value, (str, int, float)) else None
+            if ids is not None:
+                ids.pop(tx_id, None)
+                if not ids:
+                    del index[value]
+
+    def _time_key(self, row: Optional[Dict[str, Any]]) -> Optional[str]:
+        if row is None or row.get("timestamp") is None:
+            return None
+        return str(row["timestamp"])
+
+    def _index_time(self, row: Dict[str, Any]) -> None:
+        ts = self._time_key(row)
+        if ts is not None:
+            bisect.insort(self._by_time, (ts, row["id"])) # appends in O(1) for the usual "newest last" POST
+
+    def _mark_time_stale(self, row: Dict[str, Any]) -> None:
+        if self._time_key(row) is None:
+            return
+        self._stale_time += 1
+        if self._stale_time * 2 > len(self._by_time):
+            self._rebuild_time_index()
+
+    def _rebuild_time_index(self) -> None:
+        self._by_time = sorted((ts, row["id"]) for row in self._slots if (ts := self._time_key(row)) is not None)
+        self._stale_time = 0
+
+    def _time_entry_live(self, ts: str, tx_id: int) -> bool:
+        slot = self._pos.get(tx_id)
+        return slot is not None and self._time_key(self._slots[slot]) == ts
+
+    def __len__(self) -> int:
+        return len(self._pos)
+
+    def __contains__(self, tx_id: int) -> bool:
+        return tx_id in self._pos
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        with self.lock:
+            rows = [row for row in self._slots if row is not None]
+        return iter(rows)
+
+    def get(self, tx_id: int) -> Optional[Dict[str, Any]]:
+        with self.lock:
+            slot = self._pos.get(tx_id)
+            return self._slots[slot] if slot is not None else None
+
+    def get_many(self, tx_ids: Iterable[int]) -> List[Dict[str, Any]]:
+        """Rows for tx_ids in the given order, skipping ids that no longer exist"""
+        with self.lock:
+            slots = [self._pos.get(tx_id) for tx_id in tx_ids]
+            return [self._slots[slot] for slot in slots if slot is not None]
+
+    def insert(self, fields: Dict[str, Any]) -> Dict[str, Any]:
+        """Store fields under the next id and return the new row"""
+        with self.lock:
+            row = {"id": self.next_id, **fields}
+            self._append(row)
+            self._index(row, self.INDEXED_FIELDS)
+            self._index_time(row)
+            return row
+
+    def update(self, tx_id: int, patch: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Apply patch to a row, returning the new row (None if the id is unknown)"""
+        with self.lock:
+            slot = self._pos.get(tx_id)
+            if slot is None:
+                return None
+            old = self._slots[slot]
+            row = {**old, **patch, "id": tx_id}
+            changed = [f for f in self.INDEXED_FIELDS if old.get(f) != row.get(f)]
+            self._unindex(old, changed)
+            self._slots[slot] = row
+            self._index(row, changed)
+            if self._time_key(old) != self._time_key(row):
+                self._mark_time_stale(old)
+                self._index_time(row)
+            return row
+
+    def delete(self, tx_id: int) -> Optional[Dict[str, Any]]:
+        """Remove a row and return it (None if the id is unknown)"""
+        with self.lock:
+            slot = self._pos.pop(tx_id, None)
+            if slot is None:
+                return None
+            row = self._slots[slot]
+            self._unindex(row, self.INDEXED_FIELDS)
+            self._slots[slot] = None # tombstone
+            self._dead += 1
+            if self._dead > len(self._pos):
+                self._compact()
+            self._mark_time_stale(row)
+            return row
+
+    def _compact(self) -> None:
+        live = [row for row in self._slots if row is not None]
+        self._slots = live
+        self._ids = [row["id"] for row in live]
+        self._pos = {tx_id: slot for slot, tx_id in enumerate(self._ids)}
+        self._dead = 0
+
+    def page(self, cursor: int = 0, offset: int = 0, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Rows with id > cursor, in order, after skipping offset of them"""
+        with self.lock:
+            slot = bisect.bisect_right(self._ids, cursor)
+            if not self._dead:
+                stop = None if limit is None else slot + offset + limit
+                return self._slots[slot + offset:stop]
+            out: List[Dict[str, Any]] = []
+            for row in itertools.islice(self._slots, slot, None):
+                if row is None:
+                    continue
+                if offset:
+                    offset -= 1
+                    continue
+                out.append(row)
+                if limit is not None and len(out) >= limit:
+                    break
+            return out
+
+    def find_ids(self, filters: Optional[Dict[str, Any]] = None, ts_from: Optional[str] = None,
+                 ts_to: Optional[str] = None) -> List[int]:
+        """Ascending ids of rows matching every equality filter and the timestamp range.
+
+        filters maps INDEXED_FIELDS names to values. ts_from is inclusive and
+        ts_to is an inclusive prefix, so ts_to="2024-05-10" covers that whole day.
+        """
+        with self.lock:
+            sets: List[Dict[int, None]] = []
+            for field, value in (filters or {}).items():
+                if field not in self._by_field:
+                    raise KeyError(f"{field} is not indexed")
+                sets.append(self._by_field[field].get(value, {}))
+            ranged = ts_from is not None or ts_to is not None
+            if not sets and not ranged:
+                return list(self._pos)
+
+            upper = None if ts_to is None else ts_to + "\uffff"
+            if ranged:
+                lo = 0 if ts_from is None else bisect.bisect_left(self._by_time, (ts_from,))
+                hi = len(self._by_time) if upper is None else bisect.bisect_right(self._by_time, (upper,))
+            # Start from the most selective candidate set; the range only gets
+            # materialized when it is smaller than every equality match
+            if ranged and (not sets or hi - lo < min(len(ids) for ids in sets)):
+                if not sets and not self._stale_time: # pure range over a clean index: no set needed
+                    return sorted(tx_id for _, tx_id in self._by_time[lo:hi])
+                ids = {tx_id for ts, tx_id in self._by_time[lo:hi] if self._time_entry_live(ts, tx_id)}
+                ranged = False
+            else:
+                sets.sort(key=len)
+                ids = set(sets.pop(0))
+            for other in sets:
+                if not ids:
+                    break
+                ids.intersection_update(other)
+            if ranged:
+                ids = {tx_id for tx_id in ids
+                       if (ts := self._time_key(self._slots[self._pos[tx_id]])) is not None
+                       and (ts_from is None or ts >= ts_from) and (upper is None or ts < upper)}
+            return sorted(ids)
@@ -0,0 +1,99 @@
+# etl/categorize.py
+from __future__ import annotations
+import re
+from collections import deque
+from typing import Iterable
+
+from etl.config import CATEGORY_RULES, DEFAULT_CATEGORY
+
+class AhoCorasick:
+    """
+    Multi-keyword matcher: one left-to-right pass over the text finds every
+    keyword occurrence, however many keywords there are.
+
+    Each keyword carries an integer value; best(text) returns the largest
+    value among the keywords found (-1 if none), which is all the
+    categorizer needs, so per-state outputs are pre-reduced to their max.
+    """
+
+    def __init__(self, keywords: Iterable[tuple[str, int]]):
+        self.goto: list[dict[str, int]] = [{}]
+        self.fail: list[int] = [0]
+        self.out: list[int] = [-1]
+        for word, value in keywords:
+            state = 0
+            for ch in word:
+                nxt = self.goto[state].get(ch)
+                if nxt is None:
+                    nxt = self.goto[state][ch] = len(self.goto)
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.out.append(-1)
+                state = nxt
+            self.out[state] = max(self.out[state], value)
+
+        # Breadth-first, so a state's failure target is always finished before it
+        pending = deque(self.goto[0].values())
+        while pending:
+            state = pending.popleft()
+            for ch, nxt in self.goto[state].items():
+                pending.append(nxt)
+                f = self.fail[state]
+                while f and ch not in self.goto[f]:
+                    f = self.fail[f]
+                target = self.goto[f].get(ch, 0)
+                self.fail[nxt] = target if target != nxt else 0
+                self.out[nxt] = max(self.out[nxt], self.out[self.fail[nxt]]) # keywords that end inside this one
+
+    def best(self, text: str) -> int:
+        goto, fail, out = self.goto, self.fail, self.out
+        state, best = 0, -1
+        for ch in text:
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if out[state] > best:
+                best = out[state]
+        return best
+
+class RuleCategorizer:
+    """
+    CATEGORY_RULES compiled into one Aho-Corasick automaton for the keywords
+    plus one alternation regex for the regexes, so a message costs one pass
+    of each no matter how many rules there are. Rules are ranked by
+    (priority, earlier in the table) and the best-ranked match wins.
+    """
+
+    def __init__(self, rules: list[dict], default: str = DEFAULT_CATEGORY):
+        order = sorted(range(len(rules)), key=lambda i: (rules[i]["priority"], -i))
+        rank = {rule_index: r for r, rule_index in enumerate(order)} # higher rank wins
+        self.categories = [rules[i]["category"] for i in order]
+        self.default = default
+        self.keywords = AhoCorasick((kw.lower(), rank[i]) for i, rule in enumerate(rules) for kw in rule.get("keywords", ()))
+        # Highest rank first, each alternative inside a zero-width lookahead: every start position is
+        # tried (matches can't hide overlapping ones) and the first alternative to match there is its best
+        regexes = sorted(((rx, rank[i]) for i, rule in enumerate(rules) for rx in rule.get("regexes", ())),
+                         key=lambda pair: -pair[1])
+        self.regex_rank = {f"g{n}": r for n, (_, r) in enumerate(regexes)} # group name -> rule rank
+        self.top_regex_rank = regexes[0][1] if regexes else -1
+        self.regex = re.compile("|".join(f"(?=(?P<g{n}>{rx}))" for n, (rx, _) in enumerate(regexes))) if regexes else None
+
+    def rank(self, text: str) -> int:
+        text = text.lower()
+        best = self.keywords.best(text)
+        if self.regex is not None and best < self.top_regex_rank:
+            for match in self.regex.finditer(text):
+                best = max(best, self.regex_rank[match.lastgroup])
+                if best == self.top_regex_rank:
+                    break
+        return best
+
+    def __call__(self, text: str | None) -> str:
+        r = self.rank(text or "")
+        return self.categories[r] if r >= 0 else self.default
+
+CATEGORIZER = RuleCategorizer(CATEGORY_RULES)
+
+def categorize(row: dict) -> str:
+    """Pick one of config.CATEGORIES from the SMS text"""
+    return CATEGORIZER(row.get("text"))
@@ -0,0 +1,82 @@
+# etl/categorize_compare.py
+# Rules vs throughput: a per-rule substring loop, one big regex alternation, and the compiled RuleCategorizer.
+import os, random, re, string, time
+
+from dsa.parse_xml import iter_sms_records
+from etl.config import CATEGORY_RULES, DEFAULT_CATEGORY, XML_PATH
+from etl.categorize import RuleCategorizer
+
+ALTERNATION_MAX_RULES = 50 # past this one re with hundreds of named groups takes minutes per pass
+
+def make_rules(n, seed=20):
+    """The real rules plus n - len(CATEGORY_RULES) synthetic merchant-style keyword rules"""
+    rng = random.Random(seed)
+    rules = list(CATEGORY_RULES)
+    for i in range(max(0, n - len(rules))):
+        words = ["".join(rng.choices(string.ascii_lowercase, k=rng.randint(5, 10))) for _ in range(2)]
+        rules.append({"category": rng.choice(["PAY", "CASHOUT", "FEES"]), "priority": rng.randint(1, 60), "keywords": words})
+    return rules
+
+def loop_categorizer(rules):
+    """What etl/categorize.py did, generalized: try rules best-first, substring by substring"""
+    ordered = sorted(enumerate(rules), key=lambda ir: (-ir[1]["priority"], ir[0]))
+    compiled = [(r["category"], [k.lower() for k in r.get("keywords", ())], [re.compile(x) for x in r.get("regexes", ())])
+                for _, r in ordered]
+
+    def categorize(text):
+        text = text.lower()
+        for category, keywords, regexes in compiled:
+            if any(k in text for k in keywords) or any(x.search(text) for x in regexes):
+                return category
+        return DEFAULT_CATEGORY
+    return categorize
+
+def alternation_categorizer(rules):
+    """Every keyword and regex in one re alternation; the rule of each match is looked up by group name"""
+    patterns, ranks = [], {}
+    for i, rule in enumerate(rules):
+        for p in [re.escape(k.lower()) for k in rule.get("keywords", ())] + list(rule.get("regexes", ())):
+            ranks[f"g{len(patterns)}"] = (rule["priority"], -i, rule["category"])
+            patterns.append(f"(?P<g{len(patterns)}>{p})")
+    big = re.compile("|".join(patterns))
+
+    def categorize(text):
+        best = None
+        for m in big.finditer(text.lower()):
+            r = ranks[m.lastgroup]
+            if best is None or r > best:
+                best = r
+        return best[2] if best else DEFAULT_CATEGORY
+    return categorize
+
+def throughput(fn, bodies, rounds=3):
+    best = float("inf")
+    for _ in range(rounds):
+        t0 = time.perf_counter()
+        for body in bodies:
+            fn(body)
+        best = min(best, time.perf_counter() - t0)
+    return len(bodies) / best
+
+if __name__ == "__main__":
+    bodies = [body for _, body, _, _ in iter_sms_records(str(XML_PATH))]
+    counts = [int(n) for n in os.environ.get("RULES", "5,50,500,5000").split(",")]
+    print(f"{len(bodies)} SMS bodies, messages/second (best of 3)")
+    print(f"{'rules':>6s} {'keywords':>9s} {'rule loop':>11s} {'alternation':>12s} {'compiled':>10s} {'build ms':>9s}")
+    for n in counts:
+        rules = make_rules(n)
+        t0 = time.perf_counter()
+        compiled = RuleCategorizer(rules)
+        build_ms = (time.perf_counter() - t0) * 1000
+        loop = loop_categorizer(rules)
+        expected = [loop(b) for b in bodies]
+        assert [compiled(b) for b in bodies] == expected
+        if len(rules) <= ALTERNATION_MAX_RULES:
+            alternation = alternation_categorizer(rules)
+            assert [alternation(b) for b in bodies] == expected
+            alt = f"{throughput(alternation, bodies):12,.0f}"
+        else:
+            alt = f"{'-':>12s}"
+        keywords = sum(len(r.get("keywords", ())) for r in rules)
+        print(f"{len(rules):6d} {keywords:9d} {throughput(loop, bodies):11,.0f} {alt} "
+              f"{throughput(compiled, bodies):10,.0f} {build_ms:9.1f}")
@@ -0,0 +1,26 @@
+# etl/clean_normalize.py
+from __future__ import annotations
+import re
+
+# dsa.parse_xml only reads amounts after "received"/"payment of"; fall back to
+# the first "<n> RWF" so transfers, deposits and withdrawals get one too
+FIRST_AMOUNT = re.compile(r'([\d,]+(?:\.\d+)?)\s*RWF')
+
+def normalize_amount(tx: dict) -> float:
+    if tx.get("amount"):
+        return float(tx["amount"])
+    match = FIRST_AMOUNT.search(tx.get("raw_text") or "")
+    return float(match.group(1).replace(",", "")) if match else 0.0
+
+def to_row(tx: dict) -> dict:
+    """Map a parsed transaction onto the transactions table columns (category filled in later)"""
+    timestamp = tx.get("timestamp")
+    return {
+        "date_iso": timestamp[:10] if timestamp else None,
+        "date_ms": tx.get("date_ms"), # not stored; keeps same-day identical messages apart in row_key()
+        "sender": tx.get("address"),
+        "counterparty": tx.get("sender") or tx.get("receiver"),
+        "text": tx.get("raw_text"),
+        "amount": normalize_amount(tx),
+        "category": None,
+    }
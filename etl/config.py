@@ -0,0 +1,29 @@
+# etl/config.py
+import os
+from pathlib import Path
+
+# Paths (override with env vars so scripts/ and the API can point elsewhere)
+XML_PATH = Path(os.environ.get("MOMO_XML", "data/raw/modified_sms_v2.xml"))
+DB_PATH = Path(os.environ.get("MOMO_DB", "data/db.sqlite3"))
+DASHBOARD_JSON = Path(os.environ.get("MOMO_DASHBOARD", "data/processed/dashboard.json"))
+LOG_PATH = Path(os.environ.get("MOMO_ETL_LOG", "logs/etl.log"))
+ETL_STATS_PATH = Path(os.environ.get("MOMO_ETL_STATS", "logs/etl_last_run.json")) # last run's stage timings, read by GET /metrics
+
+# Categories the transactions.category column uses
+CATEGORIES = ["CASHIN", "CASHOUT", "PAY", "FEES", "OTHER"]
+
+# Categorization rules (etl/categorize.py compiles them into one matcher).
+# A message gets the category of the highest-priority rule with a keyword
+# or regex found in its lowercased text, or OTHER when nothing matches.
+# Keywords are plain substrings; regexes are matched against the same
+# lowercased text.
+CATEGORY_RULES = [
+    {"category": "OTHER", "priority": 50, "keywords": ["one-time password"],
+     "regexes": [r"\bfailed at \d{4}-\d{2}-\d{2}"]},                      # failed payments move no money
+    {"category": "CASHIN", "priority": 40, "keywords": ["received", "deposit"]},
+    {"category": "CASHOUT", "priority": 30, "keywords": ["withdrawn"]},
+    {"category": "PAY", "priority": 20, "keywords": ["payment", "transferred", "transaction of"],
+     "regexes": [r"umaze kugura [\d,]+\s*frw"]},                          # airtime / bundle purchases
+    {"category": "FEES", "priority": 10, "keywords": ["fee"]},
+]
+DEFAULT_CATEGORY = "OTHER"
@@ -1,6 +1,11 @@
 # etl/load_db.py
 from __future__ import annotations
 from pathlib import Path
+from typing import Iterable, Iterator
+import hashlib
+import itertools
+import operator
+import re
 import sqlite3
 import json
 
@@ -14,13 +19,129 @@ CREATE TABLE IF NOT EXISTS transactions (
   counterparty TEXT,                -- phone or merchant id if parsed
   text         TEXT,                -- original SMS text
   amount       REAL,                -- numeric amount
-  category     TEXT                 -- CASHIN/CASHOUT/PAY/FEES/OTHER/OTHER
+  category     TEXT,                -- CASHIN/CASHOUT/PAY/FEES/OTHER/OTHER
+  dedup_key    TEXT                 -- see row_key(); makes re-running the ETL idempotent
 );
 
+-- Incremental ETL: newest SMS `date` (ms) already ingested, per source backup
+CREATE TABLE IF NOT EXISTS etl_state (
+  source       TEXT PRIMARY KEY,    -- resolved XML path unless run.py --source says otherwise
+  backup_set   TEXT,                -- <smses backup_set=...> of the last run
+  max_date_ms  INTEGER,             -- high-water mark
+  rows_loaded  INTEGER,             -- rows written by the last run
+  updated_at   TEXT
+);
+
+-- Dashboard aggregates so an export reads O(days + categories) rows instead
+-- of scanning transactions. insert_transactions() adds each batch's new rows
+-- in the same transaction (a per-row INSERT trigger doubled bulk-load time);
+-- the triggers below cover UPDATE (incl. upserts) and DELETE from any writer.
+-- Rows whose tx_count drops to 0 are left in place and filtered on read.
+CREATE TABLE IF NOT EXISTS kpi_totals (
+  id           INTEGER PRIMARY KEY CHECK (id = 1),
+  tx_count     INTEGER NOT NULL,    -- COUNT(*)
+  amount_count INTEGER NOT NULL,    -- COUNT(amount), the AVG denominator
+  volume       REAL NOT NULL        -- SUM(amount)
+);
+CREATE TABLE IF NOT EXISTS category_totals (
+  category     TEXT NOT NULL,       -- '' for NULL too, told apart by is_null so a real '' category stays separate
+  is_null      INTEGER NOT NULL,    -- 1: the row counts transactions whose category IS NULL
+  tx_count     INTEGER NOT NULL,
+  volume       REAL NOT NULL,
+  PRIMARY KEY (category, is_null)
+);
+CREATE TABLE IF NOT EXISTS daily_totals (
+  date_iso     TEXT PRIMARY KEY,    -- rows with a NULL date_iso are not charted
+  tx_count     INTEGER NOT NULL,
+  volume       REAL NOT NULL
+);
+
+CREATE TRIGGER IF NOT EXISTS trg_tx_summary_del AFTER DELETE ON transactions BEGIN
+  UPDATE kpi_totals SET tx_count = tx_count - 1, amount_count = amount_count - (OLD.amount IS NOT NULL),
+                        volume = volume - IFNULL(OLD.amount, 0) WHERE id = 1;
+  UPDATE category_totals SET tx_count = tx_count - 1, volume = volume - IFNULL(OLD.amount, 0)
+    WHERE category = IFNULL(OLD.category, '') AND is_null = (OLD.category IS NULL);
+  UPDATE daily_totals SET tx_count = tx_count - 1, volume = volume - IFNULL(OLD.amount, 0)
+    WHERE date_iso = OLD.date_iso;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_tx_summary_upd AFTER UPDATE OF date_iso, amount, category ON transactions BEGIN
+  UPDATE kpi_totals SET amount_count = amount_count - (OLD.amount IS NOT NULL) + (NEW.amount IS NOT NULL),
+                        volume = volume - IFNULL(OLD.amount, 0) + IFNULL(NEW.amount, 0) WHERE id = 1;
+  UPDATE category_totals SET tx_count = tx_count - 1, volume = volume - IFNULL(OLD.amount, 0)
+    WHERE category = IFNULL(OLD.category, '') AND is_null = (OLD.category IS NULL);
+  INSERT INTO category_totals (category, is_null, tx_count, volume)
+    VALUES (IFNULL(NEW.category, ''), NEW.category IS NULL, 1, IFNULL(NEW.amount, 0))
+    ON CONFLICT(category, is_null) DO UPDATE SET tx_count = tx_count + 1, volume = volume + excluded.volume;
+  UPDATE daily_totals SET tx_count = tx_count - 1, volume = volume - IFNULL(OLD.amount, 0)
+    WHERE date_iso = OLD.date_iso;
+  INSERT INTO daily_totals (date_iso, tx_count, volume) SELECT NEW.date_iso, 1, IFNULL(NEW.amount, 0) WHERE NEW.date_iso IS NOT NULL
+    ON CONFLICT(date_iso) DO UPDATE SET tx_count = tx_count + 1, volume = volume + excluded.volume;
+END;
+
+-- Full-text index over the SMS text and counterparty (/search). External
+-- content: the text lives only in transactions. Filled per batch by
+-- insert_transactions() like the summary tables; triggers cover the rest.
+CREATE VIRTUAL TABLE IF NOT EXISTS transactions_fts USING fts5(
+  text, counterparty, content='transactions', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+);
+
+CREATE TRIGGER IF NOT EXISTS trg_tx_fts_del AFTER DELETE ON transactions BEGIN
+  INSERT INTO transactions_fts (transactions_fts, rowid, text, counterparty) VALUES ('delete', OLD.id, OLD.text, OLD.counterparty);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_tx_fts_upd AFTER UPDATE OF text, counterparty ON transactions BEGIN
+  INSERT INTO transactions_fts (transactions_fts, rowid, text, counterparty) VALUES ('delete', OLD.id, OLD.text, OLD.counterparty);
+  INSERT INTO transactions_fts (rowid, text, counterparty) VALUES (NEW.id, NEW.text, NEW.counterparty);
+END;
+"""
+
+# Fold rows with id > ? (the batch just inserted) into the summary tables and the search index
+SUMMARY_ADD = [
+    """UPDATE kpi_totals SET (tx_count, amount_count, volume) =
+         (SELECT kpi_totals.tx_count + COUNT(*), kpi_totals.amount_count + COUNT(amount),
+                 kpi_totals.volume + IFNULL(SUM(amount), 0) FROM transactions WHERE id > ?)""",
+    """INSERT INTO category_totals (category, is_null, tx_count, volume)
+         SELECT IFNULL(category, ''), category IS NULL, COUNT(*), IFNULL(SUM(amount), 0) FROM transactions WHERE id > ? GROUP BY 1, 2
+         ON CONFLICT(category, is_null) DO UPDATE SET tx_count = tx_count + excluded.tx_count, volume = volume + excluded.volume""",
+    """INSERT INTO daily_totals (date_iso, tx_count, volume)
+         SELECT date_iso, COUNT(*), IFNULL(SUM(amount), 0) FROM transactions WHERE id > ? AND date_iso IS NOT NULL GROUP BY 1
+         ON CONFLICT(date_iso) DO UPDATE SET tx_count = tx_count + excluded.tx_count, volume = volume + excluded.volume""",
+    "INSERT INTO transactions_fts (rowid, text, counterparty) SELECT id, text, counterparty FROM transactions WHERE id > ?",
+]
+
+# From-scratch versions of the summary tables; rebuild_summaries() writes
+# them, check_summaries() diffs them against what the triggers maintained
+SUMMARY_QUERIES = {
+    "kpi_totals": ("SELECT 1, COUNT(*), COUNT(amount), IFNULL(SUM(amount), 0) FROM transactions",
+                   "SELECT id, tx_count, amount_count, volume FROM kpi_totals"),
+    "category_totals": ("SELECT IFNULL(category, ''), category IS NULL, COUNT(*), IFNULL(SUM(amount), 0) FROM transactions GROUP BY 1, 2",
+                        "SELECT category, is_null, tx_count, volume FROM category_totals WHERE tx_count > 0"),
+    "daily_totals": ("SELECT date_iso, COUNT(*), IFNULL(SUM(amount), 0) FROM transactions WHERE date_iso IS NOT NULL GROUP BY 1",
+                     "SELECT date_iso, tx_count, volume FROM daily_totals WHERE tx_count > 0"),
+}
+SUMMARY_KEY_COLUMNS = {"category_totals": 2} # leading columns that identify a row; 1 for the other tables
+
+# The unique key is what ON CONFLICT targets, so it is never deferred
+DEDUP_INDEX = "CREATE UNIQUE INDEX IF NOT EXISTS idx_tx_dedup ON transactions(dedup_key);"
+
+# Read-side indexes; init_db(defer_indexes=True) skips them so a first bulk
+# load doesn't maintain them row by row, then create_indexes() builds them once
+INDEXES = """
 CREATE INDEX IF NOT EXISTS idx_tx_date ON transactions(date_iso);
 CREATE INDEX IF NOT EXISTS idx_tx_cat  ON transactions(category);
+CREATE INDEX IF NOT EXISTS idx_tx_cat_date ON transactions(category, date_iso, id);
+CREATE INDEX IF NOT EXISTS idx_tx_counterparty ON transactions(counterparty);
+CREATE INDEX IF NOT EXISTS idx_tx_amount ON transactions(amount);
 """
 
+BATCH_SIZE = 10_000 # rows per executemany + commit in insert_transactions
+
+COLUMNS = ["date_iso", "sender", "counterparty", "text", "amount", "category", "dedup_key"]
+_row_values = operator.itemgetter(*COLUMNS[:-1]) # positional params bind much faster than :named ones
+
+TXID_RE = re.compile(r'(?:TxId|Financial Transaction Id):\s*(\d+)', re.IGNORECASE)
+
 def get_conn(db_path: Path | str) -> sqlite3.Connection:
     db_path = Path(db_path)
     db_path.parent.mkdir(parents=True, exist_ok=True)
@@ -28,54 +149,217 @@ def get_conn(db_path: Path | str) -> sqlite3.Connection:
     conn.row_factory = sqlite3.Row
     return conn
 
-def init_db(conn: sqlite3.Connection) -> None:
+def init_db(conn: sqlite3.Connection, defer_indexes: bool = False) -> None:
+    had_fts = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'transactions_fts'").fetchone() is not None
+    stale_categories = _drop_old_category_totals(conn)
     conn.executescript(SCHEMA)
+    _migrate_dedup_key(conn)
+    if stale_categories or conn.execute("SELECT 1 FROM kpi_totals").fetchone() is None: # new table, or rows loaded before it existed
+        rebuild_summaries(conn)
+    if not had_fts:
+        rebuild_search_index(conn)
+    if not defer_indexes:
+        create_indexes(conn)
     conn.commit()
 
-def insert_transactions(conn: sqlite3.Connection, rows: list[dict]) -> int:
+def create_indexes(conn: sqlite3.Connection) -> None:
+    conn.executescript(INDEXES)
+    conn.commit()
+
+def _drop_old_category_totals(conn: sqlite3.Connection) -> bool:
     """
-    Insert parsed+cleaned+categorized rows into the transactions table.
-    For week 1/2 this is a simple INSERT. Later you can switch to UPSERT
-    if you add a unique key (e.g., hash of date+text).
+    category_totals used to key NULL categories as '', merging them with a
+    real '' category. Drop that table and the triggers that fill it so
+    SCHEMA recreates both; True when the caller must rebuild the summaries.
     """
-    if not rows:
-        return 0
-    cur = conn.executemany(
-        """
-        INSERT INTO transactions (date_iso, sender, counterparty, text, amount, category)
-        VALUES (:date_iso, :sender, :counterparty, :text, :amount, :category)
-        """,
-        rows
+    cols = {row[1] for row in conn.execute("PRAGMA table_info(category_totals)")}
+    if not cols or "is_null" in cols:
+        return False
+    conn.executescript("""
+        DROP TRIGGER IF EXISTS trg_tx_summary_del;
+        DROP TRIGGER IF EXISTS trg_tx_summary_upd;
+        DROP TABLE category_totals;
+    """)
+    return True
+
+def _migrate_dedup_key(conn: sqlite3.Connection) -> None:
+    """Add and backfill dedup_key on databases created before it existed"""
+    cols = {row[1] for row in conn.execute("PRAGMA table_info(transactions)")}
+    if "dedup_key" not in cols:
+        conn.execute("ALTER TABLE transactions ADD COLUMN dedup_key TEXT")
+    conn.execute(DEDUP_INDEX)
+    missing = conn.execute("SELECT id, date_iso, text FROM transactions WHERE dedup_key IS NULL ORDER BY id").fetchall()
+    # OR IGNORE: rows that duplicate an earlier one keep a NULL key rather than being deleted
+    conn.executemany(
+        "UPDATE OR IGNORE transactions SET dedup_key = ? WHERE id = ?",
+        [(row_key({"date_iso": r[1], "text": r[2]}), r[0]) for r in missing]
     )
+
+def rebuild_summaries(conn: sqlite3.Connection) -> None:
+    """Recompute the summary tables from transactions (one full scan each)"""
+    for table, (fresh, _) in SUMMARY_QUERIES.items():
+        conn.execute(f"DELETE FROM {table}")
+        conn.execute(f"INSERT INTO {table} {fresh}")
     conn.commit()
-    return cur.rowcount
 
-def export_dashboard_json(db_path: Path | str, out_path: Path | str) -> None:
+def rebuild_search_index(conn: sqlite3.Connection) -> None:
+    """Re-index every transaction for full-text search"""
+    conn.execute("INSERT INTO transactions_fts (transactions_fts) VALUES ('rebuild')")
+    conn.commit()
+
+def check_summaries(conn: sqlite3.Connection, repair: bool = False) -> list[str]:
     """
-    Build the aggregates your frontend reads and write to data/processed/dashboard.json
+    Diff the trigger-maintained summary tables against a from-scratch
+    rebuild; returns one line per mismatching row (empty when consistent).
+    With repair=True the tables are rebuilt afterwards.
     """
-    db_path = Path(db_path)
-    out_path = Path(out_path)
+    problems = []
+    for table, (fresh, stored) in SUMMARY_QUERIES.items():
+        k = SUMMARY_KEY_COLUMNS.get(table, 1)
+        want = {r[:k] if k > 1 else r[0]: tuple(r[k:]) for r in conn.execute(fresh)}
+        have = {r[:k] if k > 1 else r[0]: tuple(r[k:]) for r in conn.execute(stored)}
+        for key in sorted(want.keys() | have.keys()):
+            w, h = want.get(key), have.get(key)
+            # volumes are summed in a different order, so compare them with a tolerance
+            if w is None or h is None or w[:-1] != h[:-1] or abs(w[-1] - h[-1]) > 1e-6 * max(1.0, abs(w[-1])):
+                problems.append(f"{table}[{key!r}]: stored {h}, expected {w}")
+    if repair and problems:
+        rebuild_summaries(conn)
+    return problems
 
-    conn = get_conn(db_path)
+def row_key(row: dict) -> str:
+    """
+    Stable identity of one SMS: its Financial Transaction Id / TxId when the
+    text has one, else a hash of its millisecond timestamp + text. Rows
+    without date_ms fall back to legacy_row_key().
+    """
+    text = row.get("text") or ""
+    match = TXID_RE.search(text)
+    if match:
+        return f"tx:{match.group(1)}"
+    if row.get("date_ms") is None:
+        return legacy_row_key(row)
+    digest = hashlib.sha1(f"{row['date_ms']}\x1f{text}".encode("utf-8")).hexdigest()
+    return f"m:{digest}"
+
+def legacy_row_key(row: dict) -> str:
+    """
+    The key rows got before date_ms was kept: a hash of the day + text, so
+    identical messages on the same day (bundle purchases, OTPs) share it.
+    """
+    text = row.get("text") or ""
+    digest = hashlib.sha1(f"{row.get('date_iso') or ''}\x1f{text}".encode("utf-8")).hexdigest()
+    return f"h:{digest}"
+
+def _has_legacy_keys(conn: sqlite3.Connection) -> bool:
+    return conn.execute("SELECT 1 FROM transactions WHERE dedup_key LIKE 'h:%' LIMIT 1").fetchone() is not None
+
+def _match_legacy_keys(conn: sqlite3.Connection, batch: list[dict], keys: list[str]) -> list[str]:
+    """
+    Swap in the legacy key of rows already stored under one, so re-loading a
+    backup into a database filled before date_ms was kept adds nothing.
+    """
+    legacy = {i: legacy_row_key(r) for i, (r, k) in enumerate(zip(batch, keys)) if k.startswith("m:")}
+    wanted = list(set(legacy.values()))
+    stored = set()
+    for start in range(0, len(wanted), 500): # stay under SQLite's bound-parameter limit
+        chunk = wanted[start:start + 500]
+        stored.update(r[0] for r in conn.execute(
+            f"SELECT dedup_key FROM transactions WHERE dedup_key IN ({', '.join('?' for _ in chunk)})", chunk))
+    return [legacy[i] if legacy.get(i) in stored else k for i, k in enumerate(keys)]
+
+def tune_for_bulk_load(conn: sqlite3.Connection) -> None:
+    """Loader pragmas: WAL-safe NORMAL sync, a big page cache, temp b-trees in RAM"""
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA cache_size=-262144") # negative = KiB, so 256 MiB
+    conn.execute("PRAGMA temp_store=MEMORY")
+
+def _batches(rows: Iterable[dict], size: int) -> Iterator[list[dict]]:
+    it = iter(rows)
+    while batch := list(itertools.islice(it, size)):
+        yield batch
+
+def insert_transactions(conn: sqlite3.Connection, rows: Iterable[dict],
+                        batch_size: int = BATCH_SIZE, on_conflict: str = "ignore") -> int:
+    """
+    Upsert parsed+cleaned+categorized rows into the transactions table.
+
+    rows can be any iterable (e.g. a generator straight off the parser); it
+    is consumed batch_size rows at a time with one commit per batch.
+    Rows are keyed on dedup_key (row_key() unless the row brings its own),
+    so re-loading the same backup is a no-op with on_conflict="ignore", or
+    refreshes the stored columns with on_conflict="update".
+    Returns the number of rows inserted or updated.
+
+    The summary tables and search index are updated in the same transaction
+    as each batch, begun IMMEDIATE so concurrent loaders serialize; code
+    inserting into transactions directly must call rebuild_summaries() and
+    rebuild_search_index().
+    """
+    if on_conflict == "ignore":
+        conflict = "DO NOTHING"
+    elif on_conflict == "update":
+        conflict = "DO UPDATE SET " + ", ".join(f"{c} = excluded.{c}" for c in COLUMNS if c != "dedup_key")
+    else:
+        raise ValueError(f"on_conflict must be 'ignore' or 'update', got {on_conflict!r}")
+    sql = f"""
+        INSERT INTO transactions ({", ".join(COLUMNS)})
+        VALUES ({", ".join("?" for _ in COLUMNS)})
+        ON CONFLICT(dedup_key) {conflict}
+    """
+
+    tune_for_bulk_load(conn)
+    legacy = _has_legacy_keys(conn)
+    written = 0
+    for batch in _batches(rows, batch_size):
+        if not conn.in_transaction:
+            conn.execute("BEGIN IMMEDIATE") # take the write lock first, so no other loader commits between reading last_id and our insert
+        # AUTOINCREMENT ids only grow, so the batch's new rows are exactly id > last_id
+        last_id = conn.execute("SELECT IFNULL(MAX(id), 0) FROM transactions").fetchone()[0]
+        keys = [r.get("dedup_key") or row_key(r) for r in batch]
+        if legacy:
+            keys = _match_legacy_keys(conn, batch, keys)
+        cur = conn.executemany(sql, [(*_row_values(r), k) for r, k in zip(batch, keys)])
+        written += cur.rowcount # rows this statement touched; ignored conflicts count 0
+        for stmt in SUMMARY_ADD:
+            conn.execute(stmt, (last_id,))
+        conn.commit()
+    return written
+
+def get_high_water_mark(conn: sqlite3.Connection, source: str) -> int | None:
+    row = conn.execute("SELECT max_date_ms FROM etl_state WHERE source = ?", (source,)).fetchone()
+    return row[0] if row else None
+
+def set_high_water_mark(conn: sqlite3.Connection, source: str, max_date_ms: int | None,
+                        backup_set: str | None = None, rows_loaded: int = 0) -> None:
+    """Record a finished run; the mark only ever moves forward"""
+    conn.execute(
+        """
+        INSERT INTO etl_state (source, backup_set, max_date_ms, rows_loaded, updated_at)
+        VALUES (?, ?, ?, ?, datetime('now'))
+        ON CONFLICT(source) DO UPDATE SET
+          backup_set  = excluded.backup_set,
+          max_date_ms = MAX(COALESCE(etl_state.max_date_ms, 0), COALESCE(excluded.max_date_ms, 0)),
+          rows_loaded = excluded.rows_loaded,
+          updated_at  = excluded.updated_at
+        """,
+        (source, backup_set, max_date_ms, rows_loaded)
+    )
+    conn.commit()
+
+def build_dashboard(conn: sqlite3.Connection) -> dict:
+    """The aggregates the frontend reads; needs init_db() to have run on the database"""
     cur = conn.cursor()
 
-    # KPIs
-    cur.execute("SELECT COUNT(*), COALESCE(SUM(amount),0), COALESCE(AVG(amount),0) FROM transactions")
-    total_count, total_volume, avg_amount = cur.fetchone()
+    # KPIs, by category and daily trend come from the summary tables
+    cur.execute("SELECT tx_count, volume, amount_count FROM kpi_totals")
+    total_count, total_volume, amount_count = cur.fetchone()
+    avg_amount = total_volume / amount_count if amount_count else 0.0
 
-    # By category
-    cur.execute("SELECT category, COALESCE(SUM(amount),0) FROM transactions GROUP BY category")
-    by_cat = {row[0]: row[1] for row in cur.fetchall()}
+    cur.execute("SELECT category, is_null, volume FROM category_totals WHERE tx_count > 0")
+    by_cat = {None if row[1] else row[0]: row[2] for row in cur.fetchall()}
 
-    # Daily trend
-    cur.execute("""
-        SELECT date_iso, COALESCE(SUM(amount),0) AS vol
-        FROM transactions
-        WHERE date_iso IS NOT NULL
-        GROUP BY date_iso
-        ORDER BY date_iso
-    """)
+    cur.execute("SELECT date_iso, volume FROM daily_totals WHERE tx_count > 0 ORDER BY date_iso")
     daily = [{"date": r[0], "volume": r[1]} for r in cur.fetchall()]
 
     # Recent
@@ -90,7 +374,7 @@ def export_dashboard_json(db_path: Path | str, out_path: Path | str) -> None:
         for r in cur.fetchall()
     ]
 
-    out = {
+    return {
         "kpis": {
             "total_count": int(total_count or 0),
             "total_volume": float(total_volume or 0.0),
@@ -101,5 +385,35 @@ def export_dashboard_json(db_path: Path | str, out_path: Path | str) -> None:
         "recent": recent,
     }
 
+def export_dashboard_json(db_path: Path | str, out_path: Path | str) -> None:
+    """
+    Build the aggregates your frontend reads and write to data/processed/dashboard.json
+    """
+    db_path = Path(db_path)
+    out_path = Path(out_path)
+
+    conn = get_conn(db_path)
+    init_db(conn) # builds the summary tables on databases loaded before they existed
+    out = build_dashboard(conn)
+    conn.close()
+
     out_path.parent.mkdir(parents=True, exist_ok=True)
-    out_path.write_text(json.dumps(out, indent=2), encoding="utf-8")
\ No newline at end of file
+    out_path.write_text(json.dumps(out, indent=2), encoding="utf-8")
+
+if __name__ == "__main__":
+    import argparse
+    from etl.config import DB_PATH
+
+    cli = argparse.ArgumentParser(description="Summary table consistency check")
+    cli.add_argument("command", choices=["check"])
+    cli.add_argument("--db", default=str(DB_PATH))
+    cli.add_argument("--repair", action="store_true", help="rebuild the summary tables if they drifted")
+    args = cli.parse_args()
+
+    conn = get_conn(args.db)
+    init_db(conn)
+    problems = check_summaries(conn, repair=args.repair)
+    for line in problems:
+        print(line)
+    print(f"[check] {len(problems)} mismatching summary rows" + (" (rebuilt)" if problems and args.repair else ""))
+    raise SystemExit(1 if problems and not args.repair else 0)
@@ -0,0 +1,21 @@
+# etl/parse_xml.py
+from __future__ import annotations
+from pathlib import Path
+from typing import Iterator
+
+from dsa.parse_xml import build_transaction, iter_sms_records, read_backup_info
+
+def iter_transactions(xml_path: Path | str, since_ms: int | None = None) -> Iterator[dict]:
+    """
+    Stream parsed transactions for the ETL. Same dicts as dsa.parse_xml,
+    plus the raw `date_ms` (for the high-water mark) and the SMS `address`.
+    Messages older than since_ms are skipped before any regex work.
+    """
+    for idx, body, date, address in iter_sms_records(str(xml_path), min_date_ms=since_ms):
+        tx = build_transaction(idx, body, date)
+        tx["date_ms"] = int(date) if date.isdigit() else None
+        tx["address"] = address
+        yield tx
+
+def backup_set(xml_path: Path | str) -> str | None:
+    return read_backup_info(str(xml_path)).get("backup_set")
@@ -0,0 +1,298 @@
+# etl/run.py
+# Parse -> clean/normalize -> categorize -> load, then export the dashboard JSON.
+#   python -m etl.run --xml data/raw/modified_sms_v2.xml
+#
+# The stages run concurrently, connected by bounded queues:
+#
+#   parser thread --raw_q--> N clean/categorize workers --row_q--> writer (insert_transactions)
+#
+# Items on the queues are chunks of CHUNK_SIZE messages, so the per-item queue
+# overhead is paid once per chunk. A full queue blocks its producer, which
+# bounds memory to about (QUEUE_SIZE * 2 + workers) chunks however big the
+# backup is. Chunks carry a sequence number and the writer re-orders them, so
+# rows get their ids in document order whatever the worker count.
+from __future__ import annotations
+import argparse
+import json
+import logging
+import os
+import queue
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Iterator
+
+if __package__ in (None, ""): # allow `python etl/run.py` as in the README
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from etl import config
+from etl.categorize import categorize
+from etl.clean_normalize import to_row
+from etl.load_db import (
+    BATCH_SIZE,
+    create_indexes,
+    export_dashboard_json,
+    get_conn,
+    get_high_water_mark,
+    init_db,
+    insert_transactions,
+    set_high_water_mark,
+)
+from etl.parse_xml import backup_set, iter_transactions
+
+CHUNK_SIZE = 500 # messages per queue item
+QUEUE_SIZE = 16 # chunks per queue
+WORKERS = min(4, os.cpu_count() or 1)
+
+_DONE = object() # end-of-stream marker, one per consumer
+
+log = logging.getLogger("etl")
+
+class StageStats:
+    """Items through one stage, time spent working (not waiting on queues) and output queue depth"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.items = 0
+        self.busy = 0.0
+        self.depth_max = 0
+        self.depth_total = 0
+        self.depth_samples = 0
+        self._lock = threading.Lock() # workers share one StageStats
+
+    def record(self, items: int, busy: float, out_q: queue.Queue | None = None) -> None:
+        depth = out_q.qsize() if out_q is not None else 0
+        with self._lock:
+            self.items += items
+            self.busy += busy
+            if out_q is not None:
+                self.depth_max = max(self.depth_max, depth)
+                self.depth_total += depth
+                self.depth_samples += 1
+
+    def as_dict(self, wall: float) -> dict:
+        return {
+            "items": self.items,
+            "busy_s": round(self.busy, 3),
+            "items_per_s": round(self.items / self.busy) if self.busy else 0,
+            "utilization": round(self.busy / wall, 2) if wall else 0.0,
+            "queue_max": self.depth_max if self.depth_samples else None, # None: the stage has no output queue
+            "queue_avg": round(self.depth_total / self.depth_samples, 1) if self.depth_samples else None,
+        }
+
+class Pipeline:
+    """One run of the parse -> clean/categorize -> load stages over an XML backup"""
+
+    def __init__(self, xml_path: Path, since_ms: int | None, workers: int = WORKERS,
+                 chunk_size: int = CHUNK_SIZE, queue_size: int = QUEUE_SIZE):
+        self.xml_path = xml_path
+        self.since_ms = since_ms
+        self.workers = max(1, workers)
+        self.chunk_size = chunk_size
+        self.raw_q: queue.Queue = queue.Queue(maxsize=queue_size)
+        self.row_q: queue.Queue = queue.Queue(maxsize=queue_size)
+        # Chunks parsed but not yet yielded to the writer. Parse takes a slot per chunk and the
+        # writer frees it, so one stalled worker can't let later chunks pile up in ordered_rows
+        self.in_flight = threading.BoundedSemaphore(2 * self.workers)
+        self.reorder_max = 0 # most chunks ordered_rows held back waiting for an earlier one
+        self.abort = threading.Event()
+        self.errors: list[BaseException] = []
+        self.max_date_ms = since_ms
+        self.load_wait = 0.0 # writer time spent blocked on row_q
+        self.stats = {name: StageStats(name) for name in ("parse", "transform", "load")}
+
+    def _put(self, q: queue.Queue, item) -> None:
+        # blocking put that still notices another stage failing
+        while not self.abort.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def _get(self, q: queue.Queue):
+        while not self.abort.is_set():
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return _DONE
+
+    def _reserve(self) -> bool:
+        # an in_flight slot for the next chunk; False once another stage failed
+        while not self.abort.is_set():
+            if self.in_flight.acquire(timeout=0.1):
+                return True
+        return False
+
+    def _fail(self, exc: BaseException) -> None:
+        self.errors.append(exc)
+        self.abort.set()
+
+    def parse(self) -> None:
+        stats = self.stats["parse"]
+        try:
+            seq, chunk = 0, []
+            t0 = time.perf_counter()
+            for tx in iter_transactions(self.xml_path, since_ms=self.since_ms):
+                date_ms = tx["date_ms"]
+                if date_ms is not None and (self.max_date_ms is None or date_ms > self.max_date_ms):
+                    self.max_date_ms = date_ms
+                chunk.append(tx)
+                if len(chunk) == self.chunk_size:
+                    stats.record(len(chunk), time.perf_counter() - t0, self.raw_q)
+                    if not self._reserve():
+                        return
+                    self._put(self.raw_q, (seq, chunk))
+                    seq, chunk = seq + 1, []
+                    t0 = time.perf_counter()
+            if chunk and self._reserve():
+                stats.record(len(chunk), time.perf_counter() - t0, self.raw_q)
+                self._put(self.raw_q, (seq, chunk))
+        except BaseException as exc:
+            self._fail(exc)
+        finally:
+            for _ in range(self.workers):
+                self._put(self.raw_q, _DONE)
+
+    def transform(self) -> None:
+        stats = self.stats["transform"]
+        try:
+            while (item := self._get(self.raw_q)) is not _DONE:
+                seq, chunk = item
+                t0 = time.perf_counter()
+                rows = []
+                for tx in chunk:
+                    row = to_row(tx)
+                    row["category"] = categorize(row)
+                    rows.append(row)
+                stats.record(len(rows), time.perf_counter() - t0, self.row_q)
+                self._put(self.row_q, (seq, rows))
+        except BaseException as exc:
+            self._fail(exc)
+        finally:
+            self._put(self.row_q, _DONE)
+
+    def ordered_rows(self) -> Iterator[dict]:
+        """Writer side: rows in document order, re-assembled from the workers' chunks"""
+        pending: dict[int, list[dict]] = {}
+        next_seq, done = 0, 0
+        while done < self.workers:
+            item = self._get(self.row_q)
+            if item is _DONE:
+                done += 1
+                continue
+            seq, rows = item
+            pending[seq] = rows
+            self.reorder_max = max(self.reorder_max, len(pending) - (next_seq in pending))
+            while next_seq in pending:
+                yield from pending.pop(next_seq)
+                self.in_flight.release()
+                next_seq += 1
+
+    def run(self, conn, batch_size: int = BATCH_SIZE) -> tuple[int, dict]:
+        t0 = time.perf_counter()
+        threads = [threading.Thread(target=self.parse, name="etl-parse", daemon=True)]
+        threads += [threading.Thread(target=self.transform, name=f"etl-transform-{i}", daemon=True)
+                    for i in range(self.workers)]
+        for t in threads:
+            t.start()
+
+        load = self.stats["load"]
+        written = 0
+        try:
+            written = insert_transactions(conn, self._waited(self.ordered_rows()), batch_size=batch_size)
+        except BaseException as exc:
+            self._fail(exc)
+        for t in threads:
+            t.join()
+        if self.errors:
+            raise self.errors[0]
+        wall = time.perf_counter() - t0
+        load.busy = max(0.0, wall - self.load_wait)
+        return written, {name: s.as_dict(wall) for name, s in self.stats.items()}
+
+    def _waited(self, rows: Iterator[dict]) -> Iterator[dict]:
+        """Pass rows to the writer, timing how long it waits for each one"""
+        load = self.stats["load"]
+        while True:
+            t0 = time.perf_counter()
+            row = next(rows, _DONE)
+            self.load_wait += time.perf_counter() - t0
+            if row is _DONE:
+                return
+            load.items += 1
+            yield row
+
+def run(xml_path: Path | str, db_path: Path | str, source: str | None = None, full: bool = False,
+        dashboard_path: Path | str | None = None, workers: int = WORKERS) -> dict:
+    """
+    Load xml_path into db_path. Unless full=True only messages at or after
+    the source's high-water mark are parsed, so a nightly run on a growing
+    backup costs O(new messages); the boundary message is re-read and
+    dropped by the dedup key.
+    """
+    xml_path = Path(xml_path)
+    source = source or xml_path.resolve().as_posix()
+    conn = get_conn(db_path)
+    fresh = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'transactions'").fetchone() is None
+    init_db(conn, defer_indexes=fresh) # a first load builds the read indexes once at the end
+
+    since_ms = None if full else get_high_water_mark(conn, source)
+    t0 = time.perf_counter()
+    pipeline = Pipeline(xml_path, since_ms, workers=workers)
+    written, stages = pipeline.run(conn)
+    if fresh:
+        create_indexes(conn)
+    set_high_water_mark(conn, source, pipeline.max_date_ms, backup_set(xml_path), written)
+    conn.close()
+    export_s = None
+    if dashboard_path:
+        t_export = time.perf_counter()
+        export_dashboard_json(db_path, dashboard_path)
+        export_s = round(time.perf_counter() - t_export, 3)
+    return {"source": source, "since_ms": since_ms, "parsed": stages["parse"]["items"], "loaded": written,
+            "max_date_ms": pipeline.max_date_ms, "seconds": time.perf_counter() - t0, "stages": stages,
+            "export_s": export_s}
+
+def record_run(stats: dict, stats_path: Path | str = config.ETL_STATS_PATH) -> None:
+    """Log the run's stage timings and leave them in stats_path, where GET /metrics picks them up"""
+    log.info("run source=%s since_ms=%s parsed=%d loaded=%d seconds=%.3f export_s=%s", stats["source"],
+             stats["since_ms"], stats["parsed"], stats["loaded"], stats["seconds"], stats["export_s"])
+    for name, s in stats["stages"].items():
+        log.info("stage=%s items=%d busy_s=%.3f items_per_s=%d utilization=%.2f queue_max=%s queue_avg=%s",
+                 name, s["items"], s["busy_s"], s["items_per_s"], s["utilization"], s["queue_max"], s["queue_avg"])
+    stats_path = Path(stats_path)
+    stats_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = stats_path.with_name(stats_path.name + ".tmp")
+    tmp.write_text(json.dumps({**stats, "finished": round(time.time(), 3)}), encoding="utf-8")
+    os.replace(tmp, stats_path) # readers never see half a file
+
+def main(argv: list[str] | None = None) -> None:
+    cli = argparse.ArgumentParser(description="Load a MoMo SMS backup into SQLite")
+    cli.add_argument("--xml", default=str(config.XML_PATH))
+    cli.add_argument("--db", default=str(config.DB_PATH))
+    cli.add_argument("--source", help="high-water mark key (default: resolved XML path)")
+    cli.add_argument("--full", action="store_true", help="ignore the high-water mark and re-read everything")
+    cli.add_argument("--dashboard", default=str(config.DASHBOARD_JSON), help="dashboard JSON to export ('' to skip)")
+    cli.add_argument("--workers", type=int, default=WORKERS, help="clean/categorize threads")
+    args = cli.parse_args(argv)
+    config.LOG_PATH.parent.mkdir(parents=True, exist_ok=True)
+    logging.basicConfig(filename=config.LOG_PATH, level=logging.INFO, format="%(asctime)s %(name)s %(message)s")
+
+    stats = run(args.xml, args.db, source=args.source, full=args.full, dashboard_path=args.dashboard or None,
+                workers=args.workers)
+    mode = "full" if stats["since_ms"] is None else f"incremental since {stats['since_ms']}"
+    print(f"[etl] {mode}: parsed {stats['parsed']} new SMS, loaded {stats['loaded']} rows "
+          f"in {stats['seconds']:.2f}s (high-water mark {stats['max_date_ms']})")
+    print(f"[etl] {'stage':10s} {'items':>9s} {'busy s':>8s} {'items/s':>9s} {'util':>5s} {'out q max':>9s} {'out q avg':>9s}")
+    for name, s in stats["stages"].items():
+        depth = "-" if s["queue_max"] is None else f"{s['queue_max']:9d} {s['queue_avg']:9.1f}"
+        print(f"[etl] {name:10s} {s['items']:9d} {s['busy_s']:8.2f} {s['items_per_s']:9d} {s['utilization']:5.2f} {depth:>19s}")
+    if stats["export_s"] is not None:
+        print(f"[etl] export {stats['export_s']:.3f}s")
+    record_run(stats)
+
+if __name__ == "__main__":
+    main()
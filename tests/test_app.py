@@ -0,0 +1,153 @@
+# tests/test_app.py
+import itertools
+import pstats
+import sqlite3
+
+import pytest
+
+pytest.importorskip("httpx") # fastapi.testclient needs it
+from fastapi.testclient import TestClient
+
+import api.app as app_module
+import api.metrics as metrics
+from api.db import ConnectionPool, PoolTimeout, transactions_query
+from api.encoding import TABLE_MEDIA_TYPE, decode_table
+from etl.load_db import get_conn, init_db, insert_transactions
+
+def make_row(i):
+    return {"date_iso": f"2024-05-{i % 28 + 1:02d}", "sender": "M-Money", "counterparty": f"Jane {i}",
+            "text": f"TxId: {1000 + i}. Your payment of {i} RWF has been completed.", "amount": float(i), "category": "PAY"}
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    path = tmp_path / "db.sqlite3"
+    conn = get_conn(path)
+    init_db(conn)
+    insert_transactions(conn, [make_row(i) for i in range(1, 11)])
+    cache = app_module.DashboardCache(path)
+    pool = ConnectionPool(path)
+    monkeypatch.setattr(app_module, "DASHBOARD", cache)
+    monkeypatch.setattr(app_module, "POOL", pool)
+    yield conn, cache
+    pool.close()
+    cache.close()
+    conn.close()
+
+def test_analytics_is_cached_until_the_db_changes(db):
+    conn, cache = db
+    client = TestClient(app_module.app)
+    first = client.get("/analytics")
+    assert first.status_code == 200 and first.json()["kpis"]["total_count"] == 10
+    etag = first.headers["etag"]
+    again = client.get("/analytics", headers={"If-None-Match": etag})
+    assert again.status_code == 304 and again.content == b""
+    assert cache.builds == 1
+
+    insert_transactions(conn, [make_row(11)])
+    changed = client.get("/analytics", headers={"If-None-Match": etag})
+    assert changed.status_code == 200 and changed.headers["etag"] != etag
+    assert changed.json()["kpis"]["total_count"] == 11 and cache.builds == 2
+
+def test_pool_reuses_read_only_connections(db, monkeypatch):
+    conn, cache = db
+    pool = ConnectionPool(cache.db_path, max_size=2, timeout=0.05)
+    monkeypatch.setattr(app_module, "POOL", pool)
+    client = TestClient(app_module.app)
+    for _ in range(5):
+        assert len(client.get("/transactions?limit=3").json()) == 3
+    assert pool.stats() == {"opened": 1, "idle": 1, "max_size": 2}
+    with pool.connection() as ro:
+        with pytest.raises(sqlite3.OperationalError):
+            ro.execute("DELETE FROM transactions")
+    first, second = pool.acquire(), pool.acquire()
+    with pytest.raises(PoolTimeout):
+        pool.acquire()
+    pool.release(first)
+    pool.release(second)
+    pool.close()
+    assert pool.stats()["opened"] == 0
+
+def test_transactions_keyset_paging_and_filters(db):
+    client = TestClient(app_module.app)
+    page = client.get("/transactions?limit=4").json()
+    assert [t["id"] for t in page] == [10, 9, 8, 7]
+    page = client.get(f"/transactions?limit=4&before_id={page[-1]['id']}").json()
+    assert [t["id"] for t in page] == [6, 5, 4, 3]
+    page = client.get("/transactions?date_from=2024-05-03&date_to=2024-05-05&min_amount=3&max_amount=3.5").json()
+    assert [(t["id"], t["date_iso"]) for t in page] == [(3, "2024-05-04")]
+    assert client.get("/transactions?counterparty=Jane%207&category=PAY").json()[0]["id"] == 7
+    assert client.get("/transactions?limit=0").status_code == 422
+
+def test_filtered_queries_never_scan_the_table(db):
+    conn, _ = db
+    filters = {"before_id": 5, "category": "PAY", "date_from": "2024-05-01", "date_to": "2024-05-31",
+               "counterparty": "Jane 1", "min_amount": 1.0, "max_amount": 9.0}
+    for n in range(1, len(filters) + 1):
+        for names in itertools.combinations(filters, n):
+            sql, params = transactions_query(**{k: filters[k] for k in names})
+            plan = [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params)]
+            assert not any(step.startswith("SCAN") for step in plan), (names, plan)
+    # the unfiltered first page walks the primary key backwards and stops after LIMIT rows
+    sql, params = transactions_query()
+    assert [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params)] == ["SCAN transactions"]
+
+def test_search_ranks_and_highlights(db):
+    conn, _ = db
+    insert_transactions(conn, [dict(make_row(20), text="You have received 2000 RWF from Samuel Carter (*********013).",
+                                    counterparty="Samuel Carter")])
+    client = TestClient(app_module.app)
+    hits = client.get("/search?q=samuel carter").json()
+    assert [h["id"] for h in hits] == [11]
+    assert "<mark>Samuel</mark> <mark>Carter</mark>" in hits[0]["snippet"]
+    assert {h["id"] for h in client.get("/search?q=TxId 1007").json()} == {7}
+    assert len(client.get("/search?q=payment&limit=3&offset=8").json()) == 2
+    assert client.get('/search?q=" OR (').json() == []
+    conn.execute("DELETE FROM transactions WHERE id = 11")
+    conn.commit()
+    assert client.get("/search?q=samuel").json() == []
+
+def test_search_snippet_is_html_escaped(db):
+    conn, _ = db
+    insert_transactions(conn, [dict(make_row(20), text='Payment to <img src=x onerror="alert(1)"> & amp <script>x</script>')])
+    client = TestClient(app_module.app)
+    (hit,) = client.get("/search?q=onerror amp").json()
+    assert "<img" not in hit["snippet"] and "<script>" not in hit["snippet"]
+    assert "&lt;img src=x <mark>onerror</mark>=&quot;alert(1)&quot;&gt; &amp; <mark>amp</mark>" in hit["snippet"]
+
+def test_search_past_the_ranked_window(db, monkeypatch):
+    monkeypatch.setattr(app_module, "SEARCH_WINDOW", 4)
+    client = TestClient(app_module.app)
+    resp = client.get("/search?q=payment&limit=100")
+    ids = [h["id"] for h in resp.json()]
+    assert len(ids) == 4 and resp.headers["X-Search-Truncated"] == "true"
+    older = client.get(f"/search?q=payment&limit=100&before={resp.headers['X-Search-Next-Before']}")
+    assert older.json() and max(h["id"] for h in older.json()) < min(ids)
+    last = client.get("/search?q=payment&limit=100&before=3")
+    assert "X-Search-Truncated" not in last.headers
+
+def test_transactions_table_format_and_gzip(db):
+    client = TestClient(app_module.app)
+    rows = client.get("/transactions?limit=5", headers={"Accept-Encoding": "identity"}).json()
+    resp = client.get("/transactions?limit=5", headers={"Accept": TABLE_MEDIA_TYPE, "Accept-Encoding": "identity"})
+    assert resp.headers["content-type"] == TABLE_MEDIA_TYPE and decode_table(resp.json()) == rows
+    resp = client.get("/transactions?limit=10", headers={"Accept-Encoding": "gzip"})
+    assert resp.headers["content-encoding"] == "gzip" and len(resp.json()) == 10
+
+def test_metrics_endpoint_and_per_request_profiling(db, monkeypatch, tmp_path):
+    client = TestClient(app_module.app)
+    before = app_module.REGISTRY.render()
+    for _ in range(3):
+        assert client.get("/transactions?limit=2").status_code == 200
+    assert client.get("/no-such-route").status_code == 404
+    text = client.get("/metrics").text
+    line = 'momo_http_requests_total{method="GET",route="/transactions",status="200"} '
+    count = lambda t: int(next((l for l in t.splitlines() if l.startswith(line)), line + "0").split()[-1])
+    assert count(text) - count(before) == 3
+    assert 'route="unmatched",status="404"' in text
+
+    monkeypatch.setattr(metrics, "PROFILE_ENABLED", True)
+    monkeypatch.setattr(metrics, "PROFILE_DIR", tmp_path)
+    resp = client.get("/transactions?limit=2", headers={"X-Profile": "1"})
+    stats = pstats.Stats(str(tmp_path / f"{resp.headers['x-profile-id']}.prof"))
+    assert any(func[2] == "transactions" for func in stats.stats) # the endpoint ran under the profiler
+    assert "x-profile-id" not in client.get("/transactions?limit=2").headers
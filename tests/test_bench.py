@@ -0,0 +1,36 @@
+# tests/test_bench.py
+import copy
+
+from bench.generate import write_backup
+from bench.run import bench_size, compare
+from dsa.parse_xml import iter_sms_records, parse_momo_xml, read_backup_info
+
+def test_generated_backup_parses_like_the_real_one(tmp_path):
+    xml = write_backup(tmp_path / "sms.xml", 300, seed=1)
+    assert read_backup_info(xml)["count"] == "300"
+    records = list(iter_sms_records(str(xml)))
+    dates = [int(date) for _, _, date, _ in records]
+    assert len(records) == 300 and dates == sorted(set(dates))
+    assert any("<#>" in body for _, body, _, _ in records) # entities round-trip
+    txs = parse_momo_xml(str(xml))
+    assert {"sent", "received", "unknown"} <= {t["type"] for t in txs}
+    assert write_backup(tmp_path / "again.xml", 300, seed=1).read_text().splitlines()[2:] == xml.read_text().splitlines()[2:]
+
+def test_bench_size_without_http(tmp_path):
+    out = bench_size(200, tmp_path, http=False)
+    assert out["messages"] == 200 and out["parse"]["msgs_per_s"] > 0
+    assert 0 < out["etl"]["loaded"] <= 200
+    assert "http_stdlib" not in out
+
+def test_compare_flags_regressions_in_the_right_direction():
+    baseline = {"results": {"1000": {"messages": 1000, "parse": {"seconds": 2.0, "msgs_per_s": 500},
+                                     "http": {"p99_ms": 10.0, "errors": 0}, "export": {"seconds": 0.001}}}}
+    current = copy.deepcopy(baseline)
+    current["results"]["1000"]["parse"] = {"seconds": 1.0, "msgs_per_s": 1000} # twice as fast
+    current["results"]["1000"]["http"]["p99_ms"] = 15.0 # 50% slower
+    current["results"]["1000"]["export"]["seconds"] = 0.01 # 10x, but under the noise floor
+    rows = {r["metric"]: r for r in compare(current, baseline, tolerance=0.2)}
+    assert rows["1000/parse/msgs_per_s"]["change"] == 1.0 and not rows["1000/parse/msgs_per_s"]["regression"]
+    assert rows["1000/parse/seconds"]["change"] == 1.0
+    assert rows["1000/http/p99_ms"]["regression"]
+    assert "1000/export/seconds" not in rows and "1000/http/errors" not in rows
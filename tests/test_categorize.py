@@ -0,0 +1,43 @@
+# tests/test_categorize.py
+from etl.categorize import AhoCorasick, RuleCategorizer, categorize
+
+def test_categorize_by_keyword():
+    assert categorize({"text": "You have received 2000 RWF from Jane Smith."}) == "CASHIN"
+    assert categorize({"text": "You Abebe have via agent: Agent Sophia, withdrawn 20000 RWF"}) == "CASHOUT"
+    assert categorize({"text": "TxId: 1. Your payment of 1,000 RWF to Jane has been completed."}) == "PAY"
+    assert categorize({"text": None}) == "OTHER"
+
+def test_rule_priority_and_regexes():
+    # failed payments and OTPs outrank the money keywords, bundle purchases are payments
+    assert categorize({"text": "Your payment of 2,000 RWF to Jane has failed at 2024-05-10 10:00:00."}) == "OTHER"
+    assert categorize({"text": "Yello!Umaze kugura 2,000FRW (75MB) igura 2,000FRW."}) == "PAY"
+    assert categorize({"text": "Your payment of 1,000 RWF has been completed. Fee was 0 RWF."}) == "PAY"
+    assert categorize({"text": "A bank deposit of 40000 RWF has been added to your mobile money account."}) == "CASHIN"
+
+def test_aho_corasick_overlapping_keywords():
+    ac = AhoCorasick([("he", 1), ("she", 2), ("his", 3), ("hers", 4)])
+    assert ac.best("ushers") == 4
+    assert ac.best("ushe") == 2
+    assert ac.best("ahishe") == 3
+    assert ac.best("xyz") == -1
+
+def test_rule_categorizer_ties_and_many_rules():
+    rules = [{"category": "A", "priority": 1, "keywords": ["abc"]},
+             {"category": "B", "priority": 1, "keywords": ["bc"]}, # same priority: the earlier rule wins
+             {"category": "C", "priority": 2, "regexes": [r"x\d+y"]}]
+    rules += [{"category": f"R{i}", "priority": 0, "keywords": [f"kw{i:04d}"]} for i in range(2000)]
+    c = RuleCategorizer(rules, default="NONE")
+    assert c("..abc..") == "A"
+    assert c("..BC..") == "B"
+    assert c("abc x12y") == "C"
+    assert c("kw1999") == "R1999"
+    assert c("nothing here") == "NONE"
+
+def test_overlapping_regexes_rank_by_priority():
+    rules = [{"category": "LOW", "priority": 1, "regexes": [r"paid \d+", "abc"]},
+             {"category": "HIGH", "priority": 9, "regexes": [r"\d+ rwf", "ab"]}]
+    c = RuleCategorizer(rules, default="NONE")
+    assert c("you paid 500 rwf") == "HIGH"
+    assert c("xxabc") == "HIGH"
+    assert c("you paid 500") == "LOW"
+    assert c("xxac") == "NONE"
@@ -0,0 +1,9 @@
+# tests/test_clean_normalize.py
+from etl.clean_normalize import to_row
+
+def test_to_row_falls_back_to_first_rwf_amount():
+    tx = {"amount": 0.0, "timestamp": "2024-05-11 18:43:49", "sender": None, "receiver": "Samuel Carter",
+          "address": "M-Money", "raw_text": "*165*S*10,000 RWF transferred to Samuel Carter (250791666666)"}
+    row = to_row(tx)
+    assert row["amount"] == 10000.0
+    assert (row["date_iso"], row["sender"], row["counterparty"]) == ("2024-05-11", "M-Money", "Samuel Carter")
@@ -0,0 +1,30 @@
+# tests/test_columnar.py
+import pytest
+
+from dsa.parse_xml import parse_momo_xml
+
+columnar = pytest.importorskip("dsa.columnar")
+
+SAMPLE_XML = "data/raw/modified_sms_v2.xml"
+
+def test_aggregates_match_dict_sums():
+    data = parse_momo_xml(SAMPLE_XML)
+    table = columnar.TransactionTable.from_records(data)
+    totals = table.totals()
+    assert totals["received"] == sum(t["amount"] for t in data if t["type"] == "received")
+    assert totals["sent"] == sum(t["amount"] for t in data if t["type"] == "sent")
+    assert table.group_by_type() == columnar.dict_group_by_type(data)
+    daily = {d["date"]: d["volume"] for d in table.daily_volume()}
+    assert daily == pytest.approx(dict(columnar.dict_daily_volume(data)))
+
+def make_record(i, type):
+    return {"id": i, "type": type, "amount": float(i), "timestamp": "2024-05-10 12:00:00"}
+
+def test_missing_type_counts_as_unknown():
+    table = columnar.TransactionTable.from_records([make_record(1, None), make_record(2, "sent"), {"id": 3, "amount": 3.0}])
+    assert table.group_by_type() == {"sent": {"count": 1, "volume": 2.0}, "unknown": {"count": 2, "volume": 4.0}}
+
+def test_more_types_than_a_byte_holds():
+    records = [make_record(i, f"type {i}") for i in range(1, 301)]
+    by_type = columnar.TransactionTable.from_records(records).group_by_type()
+    assert len(by_type) == 300 and by_type["type 300"] == {"count": 1, "volume": 300.0}
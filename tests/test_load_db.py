@@ -0,0 +1,195 @@
+# tests/test_load_db.py
+import json
+import sqlite3
+import time
+
+import pytest
+
+from etl.load_db import check_summaries, export_dashboard_json, get_conn, init_db, insert_transactions, legacy_row_key
+
+def make_row(i, text=None, **extra):
+    return {"date_iso": "2024-05-10", "sender": "M-Money", "counterparty": f"Jane {i}",
+            "text": text or f"TxId: {1000 + i}. Your payment of {i} RWF has been completed.",
+            "amount": float(i), "category": "PAY", **extra}
+
+@pytest.fixture
+def conn(tmp_path):
+    conn = get_conn(tmp_path / "db.sqlite3")
+    init_db(conn)
+    yield conn
+    conn.close()
+
+def test_reload_is_idempotent(conn):
+    rows = [make_row(i) for i in range(1, 26)]
+    assert insert_transactions(conn, iter(rows), batch_size=10) == 25
+    assert insert_transactions(conn, iter(rows), batch_size=10) == 0
+    assert conn.execute("SELECT COUNT(*) FROM transactions").fetchone()[0] == 25
+
+def test_hash_key_when_text_has_no_txid(conn):
+    row = make_row(1, text="You have received 500 RWF from Jane Smith.")
+    insert_transactions(conn, [row, dict(row)])
+    assert conn.execute("SELECT COUNT(*) FROM transactions").fetchone()[0] == 1
+
+def test_same_day_identical_messages_stay_apart(conn):
+    otp = [dict(make_row(0, text="Your one-time code is 1234"), date_ms=ms) for ms in (1715330000000, 1715333600000)]
+    assert insert_transactions(conn, otp) == 2
+    assert insert_transactions(conn, [dict(r) for r in otp]) == 0
+
+def test_reload_matches_rows_keyed_by_day(conn):
+    row = make_row(0, text="Bundle purchased")
+    conn.execute("INSERT INTO transactions (date_iso, text, amount, dedup_key) VALUES (?, ?, ?, ?)",
+                 (row["date_iso"], row["text"], row["amount"], legacy_row_key(row)))
+    conn.commit()
+    assert insert_transactions(conn, [dict(row, date_ms=1715330000000)]) == 0
+    assert conn.execute("SELECT COUNT(*) FROM transactions").fetchone()[0] == 1
+
+def test_batch_takes_the_write_lock_before_reading_last_id(conn):
+    statements = []
+    conn.set_trace_callback(statements.append)
+    insert_transactions(conn, [make_row(1)])
+    begin = statements.index("BEGIN IMMEDIATE")
+    assert begin < next(i for i, sql in enumerate(statements) if "MAX(id)" in sql)
+
+def test_update_mode_refreshes_columns(conn):
+    insert_transactions(conn, [make_row(1)])
+    assert insert_transactions(conn, [make_row(1, category="FEES")], on_conflict="update") == 1
+    assert conn.execute("SELECT category FROM transactions").fetchone()[0] == "FEES"
+
+def test_migrates_database_without_dedup_key(tmp_path):
+    path = tmp_path / "old.sqlite3"
+    old = sqlite3.connect(path)
+    old.execute("CREATE TABLE transactions (id INTEGER PRIMARY KEY AUTOINCREMENT, date_iso TEXT, sender TEXT, "
+                "counterparty TEXT, text TEXT, amount REAL, category TEXT)")
+    old.executemany("INSERT INTO transactions (date_iso, text, amount, category) VALUES (?, ?, ?, ?)",
+                    [("2024-05-10", "TxId: 1. paid", 1.0, "PAY")] * 2)
+    old.commit()
+    old.close()
+    conn = get_conn(path)
+    init_db(conn)
+    assert insert_transactions(conn, [make_row(0, text="TxId: 1. paid")]) == 0
+    keys = [r[0] for r in conn.execute("SELECT dedup_key FROM transactions ORDER BY id")]
+    assert keys == ["tx:1", None]
+
+def write_backup(path, messages):
+    sms = "\n".join(f'  <sms address="M-Money" date="{date}" body="{body}" />' for date, body in messages)
+    path.write_text(f"<?xml version='1.0' encoding='utf-8'?>\n<smses backup_set=\"b1\">\n{sms}\n</smses>\n", encoding="utf-8")
+
+def test_incremental_run_only_reads_past_high_water_mark(tmp_path):
+    from etl.load_db import get_high_water_mark
+    from etl.run import run
+    xml, db = tmp_path / "sms.xml", tmp_path / "db.sqlite3"
+    old = [(1715351458724, "TxId: 1. Your payment of 100 RWF has been completed."),
+           (1715351459724, "TxId: 2. Your payment of 200 RWF has been completed.")]
+    write_backup(xml, old)
+    assert run(xml, db)["loaded"] == 2
+    stats = run(xml, db)
+    assert (stats["parsed"], stats["loaded"]) == (1, 0) # only the boundary message is re-read
+    write_backup(xml, old + [(1715351460724, "You have received 300 RWF from Jane Smith.")])
+    assert run(xml, db)["loaded"] == 1
+    conn = get_conn(db)
+    assert get_high_water_mark(conn, xml.resolve().as_posix()) == 1715351460724
+    assert conn.execute("SELECT COUNT(*) FROM transactions").fetchone()[0] == 3
+
+def test_summary_tables_follow_writes(conn):
+    insert_transactions(conn, [make_row(i, category="PAY" if i % 3 else None, date_iso=f"2024-05-{i % 4 + 10}")
+                               for i in range(1, 31)])
+    insert_transactions(conn, [make_row(3, category="FEES", amount=None)], on_conflict="update")
+    conn.execute("DELETE FROM transactions WHERE counterparty = 'Jane 4'")
+    conn.commit()
+    assert check_summaries(conn) == []
+    conn.execute("UPDATE daily_totals SET volume = volume + 1 WHERE date_iso = '2024-05-10'")
+    assert check_summaries(conn, repair=True) == ["daily_totals['2024-05-10']: stored (7, 109.0), expected (7, 108.0)"]
+    assert check_summaries(conn) == []
+
+def test_empty_string_category_is_not_merged_with_null(conn, tmp_path):
+    from etl.load_db import build_dashboard
+    insert_transactions(conn, [make_row(1, category=None), make_row(2, category=""), make_row(3, category="")])
+    assert build_dashboard(conn)["by_category"] == {None: 1.0, "": 5.0}
+    conn.execute("UPDATE transactions SET category = '' WHERE category IS NULL")
+    conn.execute("UPDATE transactions SET category = NULL WHERE amount = 3")
+    conn.commit()
+    assert build_dashboard(conn)["by_category"] == {None: 3.0, "": 3.0}
+    assert check_summaries(conn) == []
+
+def test_migrates_category_totals_that_merged_null_and_empty(tmp_path):
+    from etl.load_db import build_dashboard
+    path = tmp_path / "old.sqlite3"
+    conn = get_conn(path)
+    init_db(conn)
+    insert_transactions(conn, [make_row(1, category=None), make_row(2, category="")])
+    conn.executescript("""
+        DROP TRIGGER trg_tx_summary_del; DROP TRIGGER trg_tx_summary_upd; DROP TABLE category_totals;
+        CREATE TABLE category_totals (category TEXT PRIMARY KEY, tx_count INTEGER NOT NULL, volume REAL NOT NULL);
+        INSERT INTO category_totals VALUES ('', 2, 3.0);
+    """) # the old layout, with both rows folded into ''
+    conn.close()
+    conn = get_conn(path)
+    init_db(conn)
+    assert build_dashboard(conn)["by_category"] == {None: 1.0, "": 2.0}
+    conn.execute("DELETE FROM transactions WHERE category IS NULL")
+    conn.commit()
+    assert check_summaries(conn) == [] and build_dashboard(conn)["by_category"] == {"": 2.0}
+
+def test_dashboard_export_matches_full_scan(conn, tmp_path):
+    insert_transactions(conn, [make_row(i, category=("PAY", "CASHIN", None)[i % 3]) for i in range(1, 11)])
+    export_dashboard_json(tmp_path / "db.sqlite3", tmp_path / "dashboard.json")
+    out = json.loads((tmp_path / "dashboard.json").read_text())
+    assert out["kpis"] == {"total_count": 10, "total_volume": 55.0, "avg_amount": 5.5}
+    assert out["by_category"] == {"null": 15.0, "CASHIN": 22.0, "PAY": 18.0}
+    assert out["daily"] == [{"date": "2024-05-10", "volume": 55.0}]
+
+def test_pipeline_keeps_document_order_across_workers(tmp_path):
+    from etl.run import Pipeline
+    xml = tmp_path / "sms.xml"
+    write_backup(xml, [(1715351458724 + i, f"TxId: {i}. Your payment of {i} RWF has been completed.") for i in range(1, 101)])
+    conn = get_conn(tmp_path / "db.sqlite3")
+    init_db(conn)
+    pipeline = Pipeline(xml, since_ms=None, workers=3, chunk_size=7, queue_size=2)
+    written, stages = pipeline.run(conn, batch_size=10)
+    assert written == 100 and stages["transform"]["items"] == 100 and stages["parse"]["queue_max"] <= 2
+    amounts = [r[0] for r in conn.execute("SELECT amount FROM transactions ORDER BY id")]
+    assert amounts == [float(i) for i in range(1, 101)]
+
+def test_pipeline_bounds_chunks_waiting_on_a_stalled_worker(tmp_path, monkeypatch):
+    import etl.run
+    xml = tmp_path / "sms.xml"
+    write_backup(xml, [(1715351458724 + i, f"TxId: {i}. Your payment of {i} RWF has been completed.") for i in range(1, 61)])
+    categorize = etl.run.categorize
+
+    def slow_first(row):
+        if row["amount"] == 1.0: # the worker holding chunk 0 stalls while the others run ahead
+            time.sleep(0.3)
+        return categorize(row)
+    monkeypatch.setattr(etl.run, "categorize", slow_first)
+    conn = get_conn(tmp_path / "db.sqlite3")
+    init_db(conn)
+    pipeline = etl.run.Pipeline(xml, since_ms=None, workers=3, chunk_size=1, queue_size=100)
+    written, _ = pipeline.run(conn, batch_size=10)
+    assert written == 60 and 0 < pipeline.reorder_max <= 2 * 3 - 1
+    assert [r[0] for r in conn.execute("SELECT amount FROM transactions ORDER BY id")] == [float(i) for i in range(1, 61)]
+
+def test_pipeline_surfaces_stage_errors(tmp_path, monkeypatch):
+    import etl.run
+    xml = tmp_path / "sms.xml"
+    write_backup(xml, [(1715351458724, "TxId: 1. Your payment of 1 RWF has been completed.")])
+    monkeypatch.setattr(etl.run, "categorize", lambda row: 1 / 0)
+    conn = get_conn(tmp_path / "db.sqlite3")
+    init_db(conn)
+    with pytest.raises(ZeroDivisionError):
+        etl.run.Pipeline(xml, since_ms=None, workers=2).run(conn)
+
+def test_run_stats_are_logged_and_exported_as_metrics(tmp_path, caplog):
+    import logging
+    from api.metrics import Registry
+    from etl.run import record_run, run
+    xml, db = tmp_path / "sms.xml", tmp_path / "db.sqlite3"
+    write_backup(xml, [(1715351458724 + i, f"TxId: {i}. Your payment of {i} RWF has been completed.") for i in range(50)])
+    stats = run(xml, db, dashboard_path=tmp_path / "dashboard.json")
+    assert stats["export_s"] is not None
+    with caplog.at_level(logging.INFO, logger="etl"):
+        record_run(stats, tmp_path / "last_run.json")
+    assert any(r.getMessage().startswith("stage=load items=50 ") for r in caplog.records)
+    text = Registry().render(etl_stats_path=tmp_path / "last_run.json")
+    assert "momo_etl_rows_loaded 50" in text
+    assert 'momo_etl_stage_seconds{stage="parse"}' in text and 'momo_etl_stage_seconds{stage="export"}' in text
+    assert "momo_etl" not in Registry().render(etl_stats_path=tmp_path / "missing.json")
@@ -0,0 +1,37 @@
+# tests/test_parse_cache.py
+from dsa.parse_cache import load_transactions
+
+def write_xml(tmp_path, bodies):
+    sms = "\n".join(
+        f'  <sms protocol="0" address="M-Money" date="{1715351458724 + i}" type="1" body="{b}" />'
+        for i, b in enumerate(bodies)
+    )
+    path = tmp_path / "sms.xml"
+    path.write_text(f"<?xml version='1.0' encoding='utf-8'?>\n<smses count=\"{len(bodies)}\">\n{sms}\n</smses>\n", encoding="utf-8")
+    return path
+
+def test_parse_cache_hits_until_xml_changes(tmp_path):
+    path = write_xml(tmp_path, ["You have received 2000 RWF from Jane Smith (*********013)."])
+    cache_dir = tmp_path / "cache"
+    first, hit = load_transactions(str(path), cache_dir=str(cache_dir))
+    assert not hit
+    again, hit = load_transactions(str(path), cache_dir=str(cache_dir))
+    assert hit and again == first
+
+    path = write_xml(tmp_path, ["TxId: 1. Your payment of 1,000 RWF to Jane Smith 12845 has been completed."])
+    changed, hit = load_transactions(str(path), cache_dir=str(cache_dir))
+    assert not hit and changed[0]["type"] == "sent"
+
+def test_unreadable_parse_cache_means_reparse(tmp_path):
+    import pickle
+    from dsa.parse_cache import CACHE_VERSION, cache_path_for
+    path = write_xml(tmp_path, ["You have received 2000 RWF from Jane Smith (*********013)."])
+    cache_dir = tmp_path / "cache"
+    expected, _ = load_transactions(str(path), cache_dir=str(cache_dir))
+    cache = cache_path_for(str(path), str(cache_dir))
+    header = pickle.dumps({"version": CACHE_VERSION})
+    for junk in (b"\x80\x09", header + b"cno_such_module\nThing\n.", header + b"garbage", pickle.dumps([1])):
+        with open(cache, "wb") as f: # future protocol (ValueError), missing class (ImportError), ...
+            f.write(junk)
+        rows, hit = load_transactions(str(path), cache_dir=str(cache_dir))
+        assert not hit and rows == expected
@@ -0,0 +1,92 @@
+# tests/test_parse_xml.py
+import os, types
+
+import pytest
+
+from dsa.extract_compare import check_parity, load_bodies
+from dsa.parse_xml import EXTRACTOR, iter_momo_xml, parse_momo_xml
+
+SAMPLE_XML = "data/raw/modified_sms_v2.xml"
+
+def write_xml(tmp_path, bodies):
+    sms = "\n".join(
+        f'  <sms protocol="0" address="M-Money" date="{1715351458724 + i}" type="1" body="{b}" />'
+        for i, b in enumerate(bodies)
+    )
+    path = tmp_path / "sms.xml"
+    path.write_text(f"<?xml version='1.0' encoding='utf-8'?>\n<smses count=\"{len(bodies)}\">\n{sms}\n</smses>\n", encoding="utf-8")
+    return path
+
+def test_iter_momo_xml_is_a_generator():
+    assert isinstance(iter_momo_xml(SAMPLE_XML), types.GeneratorType)
+
+def test_iter_momo_xml_matches_list_wrapper():
+    assert list(iter_momo_xml(SAMPLE_XML)) == parse_momo_xml(SAMPLE_XML)
+
+def test_iter_momo_xml_numbers_ids_in_document_order(tmp_path):
+    path = write_xml(tmp_path, [
+        "You have received 2000 RWF from Jane Smith (*********013) on your mobile money account.",
+        "TxId: 73214484437. Your payment of 1,000 RWF to Jane Smith 12845 has been completed.",
+    ])
+    rows = list(iter_momo_xml(str(path)))
+    assert [r["id"] for r in rows] == [1, 2]
+    assert rows[0]["type"] == "received" and rows[0]["amount"] == 2000.0
+    assert rows[1]["receiver"] == "Jane Smith" and rows[1]["transaction_id"] == "73214484437"
+
+def test_parse_momo_xml_missing_file_returns_empty(tmp_path):
+    assert parse_momo_xml(str(tmp_path / "missing.xml")) == []
+
+def test_extractor_matches_per_field_functions_on_sample():
+    assert check_parity(load_bodies(SAMPLE_XML)) == []
+
+def test_extractor_handles_non_ascii_bodies():
+    fields = EXTRACTOR.extract("You have received 500 RWF from Amélie (*********013). TxId: 42")
+    assert fields["amount"] == 500.0
+    assert fields["transaction_id"] == "42"
+
+def test_parallel_mode_keeps_order_and_ids():
+    serial = list(iter_momo_xml(SAMPLE_XML))
+    parallel = list(iter_momo_xml(SAMPLE_XML, workers=2, chunk_size=100))
+    assert parallel == serial
+
+def test_lazy_raw_text_matches_elementtree(tmp_path):
+    from dsa.parse_cache import load_transactions_lazy
+    from dsa.parse_xml import parse_momo_xml_lazy
+    bodies = ["plain ASCII body of 1,000 RWF", "&lt;#&gt; quotes &quot;x&quot; &amp; &apos;y&apos;",
+              "line&#10;break and &#x1F4B0; Ééè", "tab\tand\nnewline literal", ""]
+    path = write_xml(tmp_path, bodies)
+    with open(path, "a", encoding="utf-8") as f: # single quotes and no body at all are valid XML too
+        f.write("<!-- trailing -->\n")
+    text = path.read_text(encoding="utf-8").replace("</smses>", "  <sms date='1' body='it&apos;s \"quoted\"' />\n  <sms date='2' />\n</smses>")
+    path.write_text(text, encoding="utf-8")
+    full = parse_momo_xml(str(path))
+    rows, index = parse_momo_xml_lazy(str(path))
+    assert [r["id"] for r in rows] == [t["id"] for t in full] == list(range(1, 8))
+    assert all("raw_text" not in r for r in rows)
+    assert [index.get(t["id"]) for t in full[:6]] == [t["raw_text"] for t in full[:6]]
+    assert index.get(7) is None and index.get(99) is None # <sms> without a body, unknown id
+
+    cache_dir = tmp_path / "cache"
+    first_rows, first_index, hit = load_transactions_lazy(str(path), cache_dir=str(cache_dir))
+    assert not hit
+    cached_rows, cached_index, hit = load_transactions_lazy(str(path), cache_dir=str(cache_dir))
+    assert hit and cached_rows == rows and cached_index.get(3) == full[2]["raw_text"]
+    st = os.stat(path)
+    path.write_text(text.replace("plain", "PLAIN"), encoding="utf-8") # same size, new content
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+    with pytest.raises(RuntimeError): # an index not yet mapped refuses a file that changed since
+        first_index.get(1)
+    path.write_text(text, encoding="utf-8") # back to the indexed bytes: only the mtime moved
+    _, touched_index, hit = load_transactions_lazy(str(path), cache_dir=str(cache_dir))
+    assert hit and touched_index.get(1) == full[0]["raw_text"]
+
+def test_lazy_body_span_skips_lookalikes_in_other_attributes(tmp_path):
+    from dsa.parse_xml import parse_momo_xml_lazy
+    path = tmp_path / "sms.xml"
+    path.write_text("<smses count=\"2\">\n"
+                    "  <sms date=\"1\" subject='x body=\"fake\"' body=\"real\"/>\n"
+                    "  <sms\n    date = '2'\n    readable_body=\"nope\" body = 'also real'/>\n"
+                    "</smses>\n", encoding="utf-8")
+    full = parse_momo_xml(str(path))
+    _, index = parse_momo_xml_lazy(str(path))
+    assert [index.get(1), index.get(2)] == [t["raw_text"] for t in full] == ["real", "also real"]
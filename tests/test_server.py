@@ -0,0 +1,315 @@
+# tests/test_server.py
+import base64, http.client, json, threading, time, zlib
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+import api.metrics as metrics
+import api.server as server
+from api.auth import AuthCache, hash_password, parse_password_hash, verify_password
+from api.encoding import TABLE_MEDIA_TYPE, decode_table
+from dsa.transaction_store import TransactionStore
+
+AUTH = {"Authorization": "Basic " + base64.b64encode(f"{server.BASIC_USER}:{server.BASIC_PASS}".encode()).decode()}
+
+def make_rows(n):
+    return [{"id": i, "type": "received" if i % 2 else "sent", "amount": float(i * 100), "currency": "RWF",
+             "sender": "Jane Smith", "receiver": None, "timestamp": f"2024-05-{i % 28 + 1:02d} 10:00:00",
+             "transaction_id": str(70000 + i), "raw_text": f"sms body {i}"} for i in range(1, n + 1)]
+
+class QuietApp(server.App):
+    def log_message(self, format, *args):
+        pass
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(server, "store", TransactionStore(make_rows(1200)))
+    monkeypatch.setattr(server, "REGISTRY", metrics.Registry())
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), QuietApp)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    conn = http.client.HTTPConnection("127.0.0.1", srv.server_address[1], timeout=10)
+
+    def request(method, path, body=None, headers=AUTH):
+        payload = json.dumps(body).encode() if body is not None else None
+        conn.request(method, path, body=payload, headers=headers)
+        resp = conn.getresponse()
+        data = resp.read()
+        if resp.getheader("Content-Encoding"):
+            data = zlib.decompress(data, 47) # 32 + 15: gzip or zlib header
+        if resp.getheader("Content-Type", "").startswith("text/plain"):
+            return resp, data.decode("utf-8")
+        return resp, json.loads(data or b"null")
+
+    yield request
+    conn.close()
+    srv.shutdown()
+    srv.server_close()
+
+def test_requires_auth(client):
+    resp, body = client("GET", "/transactions", headers={})
+    assert resp.status == 401 and body == {"error": "Unauthorized"}
+
+def test_full_list_is_streamed_chunked(client):
+    resp, body = client("GET", "/transactions")
+    assert resp.getheader("Transfer-Encoding") == "chunked"
+    assert body == list(server.store)
+
+def test_limit_offset_and_cursor_paging(client):
+    _, page = client("GET", "/transactions?limit=10&offset=5")
+    assert [t["id"] for t in page] == list(range(6, 16))
+    _, page = client("GET", f"/transactions?limit=3&cursor={page[-1]['id']}")
+    assert [t["id"] for t in page] == [16, 17, 18]
+    _, page = client("GET", "/transactions?cursor=1199")
+    assert [t["id"] for t in page] == [1200]
+
+def test_fields_projection_drops_raw_text(client):
+    _, page = client("GET", "/transactions?limit=2&fields=id,amount")
+    assert page == [{"id": 1, "amount": 100.0}, {"id": 2, "amount": 200.0}]
+
+def test_bad_query_is_rejected(client):
+    resp, _ = client("GET", "/transactions?limit=-1")
+    assert resp.status == 400
+    resp, _ = client("GET", "/transactions?fields=nope")
+    assert resp.status == 400
+
+def test_crud_roundtrip_on_one_connection(client):
+    new = {"type": "sent", "amount": 50, "currency": "RWF", "sender": None, "receiver": "Shop", "timestamp": "2024-06-01 09:00:00"}
+    resp, created = client("POST", "/transactions", new)
+    assert resp.status == 201 and created["id"] == 1201
+    resp, updated = client("PUT", "/transactions/1201", {"amount": 75})
+    assert resp.status == 200 and updated["amount"] == 75.0
+    resp, _ = client("DELETE", "/transactions/1201")
+    assert resp.status == 200
+    resp, _ = client("GET", "/transactions/1201")
+    assert resp.status == 404
+
+def test_delete_keeps_paging_stable(client):
+    for tx_id in (2, 3, 5):
+        client("DELETE", f"/transactions/{tx_id}")
+    _, page = client("GET", "/transactions?limit=3&offset=1")
+    assert [t["id"] for t in page] == [4, 6, 7]
+    _, page = client("GET", "/transactions?limit=2&cursor=2")
+    assert [t["id"] for t in page] == [4, 6]
+
+def test_filters_use_secondary_indexes(client):
+    _, page = client("GET", "/transactions?type=sent&limit=3&fields=id")
+    assert page == [{"id": 2}, {"id": 4}, {"id": 6}]
+    _, page = client("GET", "/transactions?transaction_id=70010")
+    assert [t["id"] for t in page] == [10]
+    _, page = client("GET", "/transactions?from=2024-05-03&to=2024-05-03&limit=2&fields=id,timestamp")
+    assert page == [{"id": 2, "timestamp": "2024-05-03 10:00:00"}, {"id": 30, "timestamp": "2024-05-03 10:00:00"}]
+
+def test_indexes_follow_writes(client):
+    client("PUT", "/transactions/1", {"sender": "Samuel Carter"})
+    _, page = client("GET", "/transactions?sender=Samuel%20Carter")
+    assert [t["id"] for t in page] == [1]
+    client("DELETE", "/transactions/1")
+    _, page = client("GET", "/transactions?sender=Samuel%20Carter")
+    assert page == []
+
+def test_auth_cache_counts_hits_and_rejects_wrong_password(client):
+    server.AUTH_CACHE.clear()
+    before = server.AUTH_CACHE.stats()
+    client("GET", "/transactions/1")
+    client("GET", "/transactions/1")
+    resp, stats = client("GET", "/auth/stats")
+    assert stats["hits"] - before["hits"] == 2 and stats["misses"] - before["misses"] == 1
+    bad = {"Authorization": "Basic " + base64.b64encode(f"{server.BASIC_USER}:wrong".encode()).decode()}
+    resp, _ = client("GET", "/transactions/1", headers=bad)
+    assert resp.status == 401
+
+def test_auth_cache_lru_and_ttl(monkeypatch):
+    cache = AuthCache(max_size=2, ttl=10)
+    cache.put("a", "u1")
+    cache.put("b", "u2")
+    assert cache.get("a") == "u1" # "b" is now least recently used
+    cache.put("c", "u3")
+    assert cache.get("b") is None and cache.stats()["evictions"] == 1
+    monkeypatch.setattr("api.auth.time.monotonic", lambda: 1e12)
+    assert cache.get("a") is None
+
+def test_password_hash_roundtrip():
+    encoded = hash_password("group8", iterations=1000)
+    assert verify_password("group8", encoded)
+    assert not verify_password("group9", encoded)
+
+def test_malformed_password_hash_is_rejected_not_raised():
+    good = hash_password("group8", iterations=1000)
+    algorithm, iterations, salt, digest = good.split("$")
+    for bad in ("", "plain", f"{algorithm}$many${salt}${digest}", f"{algorithm}${iterations}$not*base64${digest}",
+                f"md5${iterations}${salt}${digest}", f"{algorithm}$0${salt}${digest}"):
+        assert not verify_password("group8", bad)
+        with pytest.raises(ValueError):
+            parse_password_hash(bad)
+
+def test_server_refuses_to_start_with_a_malformed_hash():
+    import os, subprocess, sys
+    env = {**os.environ, "API_PASS_HASH": "pbkdf2_sha256$lots$c2FsdA==$aGFzaA=="}
+    proc = subprocess.run([sys.executable, "-c", "import api.server"], env=env, capture_output=True, text=True)
+    assert proc.returncode == 1 and "API_PASS_HASH is not a valid" in proc.stderr
+
+def test_gzip_and_deflate_when_accepted(client):
+    resp, body = client("GET", "/transactions", headers={**AUTH, "Accept-Encoding": "gzip, deflate;q=0.5"})
+    assert resp.getheader("Content-Encoding") == "gzip" and body == list(server.store)
+    resp, body = client("GET", "/transactions/1", headers={**AUTH, "Accept-Encoding": "deflate"})
+    assert resp.getheader("Content-Encoding") is None and body["id"] == 1 # below the size threshold
+    resp, body = client("GET", "/transactions?limit=50", headers={**AUTH, "Accept-Encoding": "gzip;q=0, deflate"})
+    assert resp.getheader("Content-Encoding") == "deflate" and len(body) == 50
+
+def test_table_format_by_accept_header(client):
+    resp, doc = client("GET", "/transactions?limit=3&fields=id,amount", headers={**AUTH, "Accept": TABLE_MEDIA_TYPE})
+    assert resp.getheader("Content-Type").startswith(TABLE_MEDIA_TYPE)
+    assert doc == {"fields": ["id", "amount"], "rows": [[1, 100.0], [2, 200.0], [3, 300.0]]}
+    _, doc = client("GET", "/transactions?type=sent", headers={**AUTH, "Accept": TABLE_MEDIA_TYPE, "Accept-Encoding": "gzip"})
+    assert decode_table(doc) == [r for r in server.store if r["type"] == "sent"]
+
+def test_metrics_count_requests_by_route_template(client):
+    client("GET", "/transactions/5")
+    client("GET", "/transactions/6")
+    client("GET", "/transactions/999999")
+    client("GET", "/nope/1/2")
+    client("GET", "/transactions", headers={**AUTH, "Accept-Encoding": "gzip"})
+    resp, text = client("GET", "/metrics")
+    assert resp.status == 200 and resp.getheader("Content-Type").startswith("text/plain; version=0.0.4")
+    assert 'momo_http_requests_total{method="GET",route="/transactions/{id}",status="200"} 2' in text
+    assert 'momo_http_requests_total{method="GET",route="/transactions/{id}",status="404"} 1' in text
+    assert 'momo_http_requests_total{method="GET",route="unmatched",status="404"} 1' in text
+    assert 'momo_http_request_duration_seconds_count{method="GET",route="/transactions/{id}"} 3' in text
+    assert 'momo_http_request_duration_seconds_bucket{method="GET",route="/transactions",le="+Inf"} 1' in text
+    sent = [line for line in text.splitlines() if line.startswith('momo_http_response_bytes_total{method="GET",route="/transactions"}')]
+    assert int(sent[0].split()[-1]) > 0
+
+def test_profile_header_is_ignored_unless_enabled(client, monkeypatch, tmp_path):
+    monkeypatch.setattr(metrics, "PROFILE_DIR", tmp_path)
+    resp, _ = client("GET", "/transactions/5", headers={**AUTH, "X-Profile": "1"})
+    assert resp.getheader("X-Profile-Id") is None
+    monkeypatch.setattr(metrics, "PROFILE_ENABLED", True)
+    resp, body = client("GET", "/transactions/5", headers={**AUTH, "X-Profile": "1"})
+    assert body["id"] == 5
+    profile = tmp_path / f"{resp.getheader('X-Profile-Id')}.prof"
+    for _ in range(200): # dumped once the response is out, so it can land just after the client reads it
+        if profile.exists():
+            break
+        time.sleep(0.01)
+    assert profile.exists()
+
+def test_lazy_raw_text_is_decoded_only_when_asked_for(client, monkeypatch, tmp_path):
+    from bench.generate import write_backup
+    from dsa.parse_xml import parse_momo_xml, parse_momo_xml_lazy
+    xml = str(write_backup(tmp_path / "sms.xml", 40))
+    full = parse_momo_xml(xml)
+    rows, index = parse_momo_xml_lazy(xml)
+    monkeypatch.setattr(server, "store", TransactionStore(rows))
+    monkeypatch.setattr(server, "raw_texts", index)
+
+    _, page = client("GET", "/transactions?limit=3")
+    assert [set(t) for t in page] == [set(server.TX_FIELDS) - {"raw_text"}] * 3
+    _, page = client("GET", "/transactions?limit=3&fields=id,raw_text")
+    assert page == [{"id": t["id"], "raw_text": t["raw_text"]} for t in full[:3]]
+    _, tx = client("GET", "/transactions/7")
+    assert tx == full[6]
+    resp, table = client("GET", "/transactions?limit=2", headers={**AUTH, "Accept": TABLE_MEDIA_TYPE})
+    assert "raw_text" not in table["fields"] and len(table["rows"]) == 2
+
+    _, tx = client("PUT", "/transactions/7", body={"amount": 1})
+    assert tx["raw_text"] == full[6]["raw_text"] and tx["amount"] == 1.0
+    _, created = client("POST", "/transactions", body={"type": "sent", "amount": 5, "currency": "RWF", "sender": "A",
+                                                       "receiver": "B", "timestamp": "2025-01-01 00:00:00", "raw_text": "typed in"})
+    _, page = client("GET", f"/transactions?cursor={created['id'] - 1}&fields=id,raw_text")
+    assert page == [{"id": created["id"], "raw_text": "typed in"}]
+
+def test_writes_are_replayed_from_the_wal_on_boot(client, monkeypatch, tmp_path):
+    from bench.generate import write_backup
+    xml = write_backup(tmp_path / "sms.xml", 30)
+    monkeypatch.setattr(server, "XML_PATH", str(xml))
+    monkeypatch.setattr(server, "WAL_DIR", str(tmp_path / "wal"))
+    monkeypatch.setattr(server, "WAL_FSYNC", False)
+    monkeypatch.setattr(server, "wal", None)
+    monkeypatch.setattr(server, "store", TransactionStore())
+    load = server.load_transactions
+    monkeypatch.setattr(server, "load_transactions", lambda path: load(path, cache_dir=str(tmp_path / "cache")))
+    server.load_data() # empty WAL dir: imports the XML and snapshots it
+    assert len(server.store) == 30
+
+    resp, created = client("POST", "/transactions", body={"type": "sent", "amount": 5, "currency": "RWF", "sender": "A",
+                                                          "receiver": "B", "timestamp": "2025-01-01 00:00:00"})
+    assert resp.status == 201 and created["id"] == 31
+    client("PUT", "/transactions/2", body={"amount": 1})
+    client("DELETE", "/transactions/3")
+    before = list(server.store)
+    server.wal.close()
+
+    xml.unlink() # the restart must not need the XML
+    monkeypatch.setattr(server, "store", TransactionStore())
+    server.load_data()
+    assert list(server.store) == before
+    server.wal.close()
+
+def wal_boot(monkeypatch, tmp_path, lazy):
+    from bench.generate import write_backup
+    xml = write_backup(tmp_path / "sms.xml", 20)
+    monkeypatch.setattr(server, "XML_PATH", str(xml))
+    monkeypatch.setattr(server, "LAZY_RAW_TEXT", lazy)
+    monkeypatch.setattr(server, "WAL_DIR", str(tmp_path / "wal"))
+    monkeypatch.setattr(server, "WAL_FSYNC", False)
+    monkeypatch.setattr(server, "wal", None)
+    monkeypatch.setattr(server, "raw_texts", None)
+    monkeypatch.setattr(server, "store", TransactionStore())
+    for name in ("load_transactions", "load_transactions_lazy"):
+        load = getattr(server, name)
+        monkeypatch.setattr(server, name, lambda path, load=load: load(path, cache_dir=str(tmp_path / "cache")))
+
+    def boot():
+        monkeypatch.setattr(server, "store", TransactionStore())
+        server.load_data()
+        server.wal.close()
+    boot()
+    return xml, boot
+
+def test_wal_boot_warns_when_the_xml_changed(monkeypatch, tmp_path, capsys):
+    xml, boot = wal_boot(monkeypatch, tmp_path, lazy=False)
+    boot()
+    assert "WARNING" not in capsys.readouterr().out
+    xml.write_text(xml.read_text(encoding="utf-8").replace("RWF", "FRW"), encoding="utf-8")
+    boot()
+    assert f"WARNING: {xml} differs" in capsys.readouterr().out
+    assert len(server.store) == 20
+
+def test_lazy_wal_boot_refuses_a_missing_xml(monkeypatch, tmp_path):
+    xml, boot = wal_boot(monkeypatch, tmp_path, lazy=True)
+    xml.rename(tmp_path / "moved.xml")
+    with pytest.raises(RuntimeError, match="delete .*wal to re-import"):
+        boot()
+
+def test_unreadable_lazy_raw_text_is_a_json_500(client, monkeypatch, tmp_path):
+    from bench.generate import write_backup
+    from dsa.parse_xml import parse_momo_xml_lazy
+    xml = write_backup(tmp_path / "sms.xml", 5)
+    rows, index = parse_momo_xml_lazy(str(xml))
+    monkeypatch.setattr(server, "store", TransactionStore(rows))
+    monkeypatch.setattr(server, "raw_texts", index)
+    xml.unlink()
+    resp, body = client("GET", "/transactions/2")
+    assert resp.status == 500 and body["error"].startswith("raw_text unavailable")
+    resp, body = client("GET", "/transactions?fields=id,raw_text")
+    assert resp.status == 500
+    resp, body = client("PUT", "/transactions/2", body={"amount": 1})
+    assert resp.status == 500 and server.store.get(2)["amount"] != 1.0
+    resp, _ = client("GET", "/transactions?limit=2") # lists without raw_text still work, on the same connection
+    assert resp.status == 200
+
+def test_failed_wal_write_is_a_json_503(client, monkeypatch, tmp_path):
+    from api.wal import DurableStore
+    durable = DurableStore(str(tmp_path / "wal"), server.store, fsync=False)
+    durable.recover()
+    monkeypatch.setattr(server, "wal", durable)
+    durable.log._failed = OSError("disk gone")
+    before = list(server.store)
+    new = {"type": "sent", "amount": 5, "currency": "RWF", "sender": "A", "receiver": "B", "timestamp": "2025-01-01 00:00:00"}
+    for method, path, body in (("POST", "/transactions", new), ("PUT", "/transactions/2", {"amount": 1}),
+                               ("DELETE", "/transactions/3", None)):
+        resp, out = client(method, path, body=body)
+        assert resp.status == 503 and out["error"].startswith("write not saved")
+    assert list(server.store) == before
+    resp, _ = client("GET", "/transactions/3") # same connection still usable
+    assert resp.status == 200
@@ -0,0 +1,25 @@
+# tests/test_transaction_store.py
+from dsa.transaction_store import TransactionStore
+
+def make_rows(n):
+    return [{"id": i, "type": "sent", "sender": f"S{i % 3}", "timestamp": f"2024-05-{i:02d} 10:00:00"} for i in range(1, n + 1)]
+
+def test_delete_compacts_and_keeps_order():
+    store = TransactionStore(make_rows(10))
+    for tx_id in range(1, 8):
+        assert store.delete(tx_id)["id"] == tx_id
+    assert store.delete(1) is None
+    assert [r["id"] for r in store] == [8, 9, 10]
+    assert [r["id"] for r in store.page(cursor=5, limit=2)] == [8, 9]
+    assert store.insert({"type": "received"})["id"] == 11
+
+def test_time_index_skips_stale_entries():
+    store = TransactionStore(make_rows(10))
+    store.update(3, {"timestamp": "2024-06-01 08:00:00"})
+    store.delete(4)
+    assert store.find_ids(ts_from="2024-05-03", ts_to="2024-05-05") == [5]
+    assert store.find_ids(ts_from="2024-06") == [3]
+    assert store.find_ids({"sender": "S0"}, ts_to="2024-05-09") == [6, 9]
+    for tx_id in range(5, 11):
+        store.delete(tx_id) # forces a rebuild of the time index
+    assert store.find_ids(ts_from="2024-05-01") == [1, 2, 3]
@@ -0,0 +1,134 @@
+# tests/test_wal.py
+import os, threading
+
+import pytest
+
+from api.wal import DurableStore, MutationLog, WalCorrupt, read_segment, replay
+from dsa.transaction_store import TransactionStore
+
+def make_rows(n):
+    return [{"id": i, "type": "sent", "amount": float(i), "sender": "A", "receiver": "B",
+             "timestamp": f"2024-05-01 10:00:{i % 60:02d}", "transaction_id": str(i)} for i in range(1, n + 1)]
+
+def reopen(directory):
+    store = TransactionStore()
+    durable = DurableStore(str(directory), store, fsync=False)
+    durable.recover()
+    return store, durable
+
+def test_writes_survive_a_restart(tmp_path):
+    store, durable = reopen(tmp_path)
+    store.load(make_rows(3))
+    durable.snapshot()
+    durable.insert({"type": "received", "amount": 9.0})
+    durable.update(2, {"amount": 20.0})
+    durable.delete(3)
+    durable.delete(4) # the row just inserted: its id must never be handed out again
+    durable.close()
+
+    store, durable = reopen(tmp_path)
+    assert [row["id"] for row in store] == [1, 2]
+    assert store.get(2)["amount"] == 20.0 and store.get(2)["sender"] == "A"
+    assert durable.insert({"type": "sent"})["id"] == 5
+    durable.close()
+
+def test_snapshot_drops_the_segments_it_covers(tmp_path):
+    store, durable = reopen(tmp_path)
+    for i in range(5):
+        durable.insert({"n": i})
+    durable.snapshot()
+    durable.insert({"n": 5})
+    durable.close()
+    names = sorted(os.listdir(tmp_path))
+    assert names == ["snapshot-0000000000000005.pickle", "wal-0000000000000006.log"]
+    lsn, next_id, rows, _ = replay(str(tmp_path))
+    assert lsn == 6 and next_id == 7 and [row["n"] for row in rows] == list(range(6))
+
+def test_automatic_snapshot_every_n_records(tmp_path):
+    store = TransactionStore()
+    durable = DurableStore(str(tmp_path), store, fsync=False, snapshot_every=10)
+    durable.recover()
+    for i in range(25):
+        durable.insert({"n": i})
+    with durable._snapshotting: # wait for the background snapshot
+        pass
+    assert durable.snapshot_lsn >= 10
+    durable.close()
+    assert [row["n"] for row in reopen(tmp_path)[0]] == list(range(25))
+
+def test_torn_tail_is_cut_off(tmp_path):
+    store, durable = reopen(tmp_path)
+    durable.insert({"n": 0})
+    durable.insert({"n": 1})
+    durable.close()
+    (segment,) = [tmp_path / name for name in os.listdir(tmp_path)]
+    size = segment.stat().st_size
+    with open(segment, "ab") as f:
+        f.write(b"\x40\x00\x00\x00\x00\x00") # header of a frame whose payload never made it to disk
+    store, durable = reopen(tmp_path)
+    assert [row["n"] for row in store] == [0, 1]
+    assert segment.stat().st_size == size
+    durable.insert({"n": 2})
+    durable.close()
+    assert [row["n"] for row in reopen(tmp_path)[0]] == [0, 1, 2]
+
+def test_damage_before_the_last_segment_raises(tmp_path):
+    log = MutationLog(str(tmp_path), fsync=False)
+    log.append({"op": "insert", "row": {"id": 1}})
+    log.rotate()
+    log.append({"op": "insert", "row": {"id": 2}})
+    log.close()
+    first = tmp_path / "wal-0000000000000001.log"
+    data = bytearray(first.read_bytes())
+    data[-2] ^= 0xFF
+    first.write_bytes(bytes(data))
+    with pytest.raises(WalCorrupt):
+        replay(str(tmp_path))
+
+def test_group_commit_batches_concurrent_writers(tmp_path):
+    log = MutationLog(str(tmp_path), fsync=True)
+    threads = [threading.Thread(target=lambda: [log.append({"op": "delete", "id": i}) for i in range(50)]) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    log.close()
+    records, _, clean = read_segment(str(tmp_path / "wal-0000000000000001.log"))
+    assert clean and [r["lsn"] for r in records] == list(range(1, 401))
+    assert log.durable_lsn == 400 and log.flushes < 400
+
+def test_one_flush_per_record_without_group_commit(tmp_path):
+    log = MutationLog(str(tmp_path), fsync=False, group_commit=False)
+    lsns = [log.submit({"op": "delete", "id": i}) for i in range(5)]
+    log.wait(lsns[-1])
+    assert log.flushes == 5
+    log.close()
+
+def test_nothing_is_acknowledged_after_a_failed_write(tmp_path, monkeypatch):
+    log = MutationLog(str(tmp_path), fsync=True)
+    log.append({"op": "delete", "id": 1})
+    def broken(fd):
+        raise OSError("disk gone")
+    monkeypatch.setattr(os, "fsync", broken)
+    with pytest.raises(OSError):
+        log.append({"op": "delete", "id": 2})
+    monkeypatch.undo()
+    with pytest.raises(OSError, match="failed earlier"):
+        log.append({"op": "delete", "id": 3})
+    assert log.durable_lsn == 1
+
+def test_store_is_unchanged_after_a_failed_log_write(tmp_path, monkeypatch):
+    store = TransactionStore(make_rows(1))
+    durable = DurableStore(str(tmp_path), store, fsync=True)
+    durable.recover()
+    def broken(fd):
+        raise OSError("disk gone")
+    monkeypatch.setattr(os, "fsync", broken)
+    with pytest.raises(OSError):
+        durable.insert({"n": 1}) # applied, then its fsync fails: visible, never acknowledged
+    monkeypatch.undo()
+    before, next_id = list(store), store.next_id
+    for write in (lambda: durable.insert({"n": 2}), lambda: durable.update(1, {"amount": 0.0}), lambda: durable.delete(1)):
+        with pytest.raises(OSError, match="failed earlier"):
+            write()
+    assert list(store) == before and store.next_id == next_id